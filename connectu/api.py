@@ -0,0 +1,293 @@
+# api.py
+# Read-only JSON API, mounted at /api/v1.
+#
+#   GET /api/v1/courses?q=&cursor=&limit=
+#   GET /api/v1/courses/<code>
+#   GET /api/v1/courses/<code>/questions      (answers included)
+#   GET /api/v1/courses/<code>/enrollments
+#   GET /api/v1/courses/<code>/documents
+#   GET /api/v1/courses/<code>/search?q=      (full-text, within the course)
+#   GET /api/v1/search?q=                     (full-text, all courses)
+#   GET /api/v1/conversations                 (logged-in user's inbox)
+#   GET /api/v1/conversations/<user_id>/messages
+#
+# Lists return {"data": [...], "next_cursor": "..." | null}; pass next_cursor
+# back as ?cursor= for the next page. ?fields=a,b,c trims each item to those
+# fields. Responses are brotli- (if installed) or gzip-compressed when the
+# client accepts it.
+#
+# Handlers are short, self-contained reads that build the whole body before
+# returning and hold no locks or global state, so they scale with worker
+# threads/greenlets (e.g. gunicorn -k gthread --threads 32, or -k gevent):
+# a slow client ties up one cheap thread, not a worker process. Flask's
+# `async def` views would not help here, since under WSGI each one still
+# occupies a thread while SQLAlchemy's session blocks.
+import gzip
+
+from flask import Blueprint, request, jsonify, abort
+from werkzeug.exceptions import HTTPException
+from models import db, Course, Document, UserCourse, User
+from course_queries import load_questions
+from post_search import search_posts
+from course_search import current_course_index
+from conversations import find_conversation, load_messages, load_inbox
+from current_user import get_current_user
+from pagination import before_clause, make_cursor
+from sqlalchemy.orm import joinedload
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+COMPRESS_MIN_BYTES = 512
+
+
+# ===== Serializers: field name -> getter =====
+def _iso(dt):
+    return dt.isoformat() if dt else None
+
+
+def _user_ref(user):
+    return {"id": user.id, "username": user.username}
+
+
+COURSE_FIELDS = {
+    "id": lambda c: c.id,
+    "course_code": lambda c: c.course_code,
+    "title": lambda c: c.title,
+    "description": lambda c: c.description,
+}
+
+ANSWER_FIELDS = {
+    "id": lambda a: a.id,
+    "content": lambda a: a.content,
+    "timestamp": lambda a: _iso(a.timestamp),
+    "user": lambda a: _user_ref(a.user),
+}
+
+QUESTION_FIELDS = {
+    "id": lambda q: q.id,
+    "content": lambda q: q.content,
+    "timestamp": lambda q: _iso(q.timestamp),
+    "user": lambda q: _user_ref(q.user),
+    "answers": lambda q: [serialize(a, ANSWER_FIELDS) for a in q.answers],
+}
+
+ENROLLMENT_FIELDS = {
+    "user": lambda uc: _user_ref(uc.user),
+    "status": lambda uc: uc.status,
+    "term": lambda uc: uc.term,
+}
+
+DOCUMENT_FIELDS = {
+    "id": lambda d: d.id,
+    "filename": lambda d: d.filename,
+    "size": lambda d: d.size,
+    "status": lambda d: d.status,
+    "page_count": lambda d: d.page_count,
+    "uploaded_at": lambda d: _iso(d.uploaded_at),
+    "user": lambda d: _user_ref(d.user),
+}
+
+MESSAGE_FIELDS = {
+    "id": lambda m: m.id,
+    "sender_id": lambda m: m.sender_id,
+    "recipient_id": lambda m: m.recipient_id,
+    "content": lambda m: m.content,
+    "timestamp": lambda m: _iso(m.timestamp),
+}
+
+
+# (conversation, contact, viewer_id) tuples from load_inbox
+CONVERSATION_FIELDS = {
+    "id": lambda row: row[0].id,
+    "contact": lambda row: _user_ref(row[1]),
+    "last_message_at": lambda row: _iso(row[0].last_message_at),
+    "last_snippet": lambda row: row[0].last_snippet,
+    "unread": lambda row: row[0].unread_for(row[2]),
+}
+
+SEARCH_HIT_FIELDS = {
+    "kind": lambda h: h.kind,
+    "id": lambda h: h.id,
+    "course_code": lambda h: h.course_code,
+    "question_id": lambda h: h.question_id,
+    "filename": lambda h: h.filename,
+    "snippet_html": lambda h: str(h.snippet),
+    "score": lambda h: round(h.score, 4),
+}
+
+
+def serialize(obj, fields, only=None):
+    return {name: get(obj) for name, get in fields.items() if only is None or name in only}
+
+
+def requested_fields(fields):
+    """The ?fields= subset (None for all); 400 on names the resource doesn't have."""
+    raw = request.args.get("fields")
+    if not raw:
+        return None
+    only = {f.strip() for f in raw.split(",") if f.strip()}
+    unknown = only - fields.keys()
+    if unknown:
+        abort(400, description=f"unknown fields: {', '.join(sorted(unknown))}")
+    return only
+
+
+def page_limit():
+    return max(1, min(request.args.get("limit", DEFAULT_LIMIT, type=int), MAX_LIMIT))
+
+
+def listing(rows, fields, next_cursor):
+    only = requested_fields(fields)
+    return jsonify(data=[serialize(r, fields, only) for r in rows], next_cursor=next_cursor)
+
+
+def course_or_404(course_code):
+    return Course.query.filter_by(course_code=course_code).first_or_404()
+
+
+def login_required_user():
+    user = get_current_user()
+    if not user:
+        abort(401, description="login required")
+    return user
+
+
+# ===== Courses =====
+@api_bp.route('/courses')
+def courses():
+    limit = page_limit()
+    query = request.args.get("q", "").strip()
+    if query:
+        # Ranked search results: the cursor is the next page number
+        page_num = max(request.args.get("cursor", 1, type=int), 1)
+        page = current_course_index().search(query, page=page_num, per_page=limit)
+        by_id = {c.id: c for c in Course.query.filter(Course.id.in_(page.ids))} if page.ids else {}
+        rows = [by_id[i] for i in page.ids if i in by_id]
+        return listing(rows, COURSE_FIELDS, str(page_num + 1) if page.has_next else None)
+
+    # Whole catalogue in id order: the cursor is the last id seen
+    after = request.args.get("cursor", 0, type=int)
+    rows = Course.query.filter(Course.id > after).order_by(Course.id).limit(limit + 1).all()
+    next_cursor = str(rows[limit - 1].id) if len(rows) > limit else None
+    return listing(rows[:limit], COURSE_FIELDS, next_cursor)
+
+
+@api_bp.route('/courses/<course_code>')
+def course(course_code):
+    course = course_or_404(course_code)
+    return jsonify(data=serialize(course, COURSE_FIELDS, requested_fields(COURSE_FIELDS)))
+
+
+@api_bp.route('/courses/<course_code>/questions')
+def questions(course_code):
+    course = course_or_404(course_code)
+    rows, next_cursor = load_questions(course.id, before=request.args.get("cursor"), limit=page_limit())
+    return listing(rows, QUESTION_FIELDS, next_cursor)
+
+
+@api_bp.route('/courses/<course_code>/enrollments')
+def enrollments(course_code):
+    course = course_or_404(course_code)
+    limit = page_limit()
+    after = request.args.get("cursor", 0, type=int)
+    rows = (UserCourse.query.options(joinedload(UserCourse.user))
+            .filter(UserCourse.course_id == course.id, UserCourse.user_id > after)
+            .order_by(UserCourse.user_id).limit(limit + 1).all())
+    next_cursor = str(rows[limit - 1].user_id) if len(rows) > limit else None
+    return listing(rows[:limit], ENROLLMENT_FIELDS, next_cursor)
+
+
+@api_bp.route('/courses/<course_code>/documents')
+def documents(course_code):
+    course = course_or_404(course_code)
+    limit = page_limit()
+    query = Document.query.options(joinedload(Document.user)).filter(Document.course_id == course.id)
+    clause = before_clause(Document.uploaded_at, Document.id, request.args.get("cursor"))
+    if clause is not None:
+        query = query.filter(clause)
+    rows = query.order_by(Document.uploaded_at.desc(), Document.id.desc()).limit(limit + 1).all()
+    next_cursor = make_cursor(rows[limit - 1].uploaded_at, rows[limit - 1].id) if len(rows) > limit else None
+    return listing(rows[:limit], DOCUMENT_FIELDS, next_cursor)
+
+
+# ===== Full-text search (cursor: the next page number) =====
+def post_search_listing(course_id=None):
+    query = request.args.get("q", "").strip()
+    if not query:
+        abort(400, description="q is required")
+    page_num = max(request.args.get("cursor", 1, type=int), 1)
+    page = search_posts(query, course_id=course_id, page=page_num, per_page=page_limit())
+    if page is None:
+        abort(501, description="full-text search is not available on this database")
+    return listing(page.hits, SEARCH_HIT_FIELDS, str(page_num + 1) if page.has_next else None)
+
+
+@api_bp.route('/search')
+def post_search():
+    return post_search_listing()
+
+
+@api_bp.route('/courses/<course_code>/search')
+def course_post_search(course_code):
+    return post_search_listing(course_or_404(course_code).id)
+
+
+# ===== Conversations =====
+@api_bp.route('/conversations')
+def conversations():
+    user = login_required_user()
+    only = requested_fields(CONVERSATION_FIELDS)
+    rows, next_cursor = load_inbox(user.id, before=request.args.get("cursor"), limit=page_limit())
+    data = [serialize((conversation, contact, user.id), CONVERSATION_FIELDS, only)
+            for conversation, contact in rows]
+    return jsonify(data=data, next_cursor=next_cursor)
+
+
+
+@api_bp.route('/conversations/<int:user_id>/messages')
+def messages(user_id):
+    user = login_required_user()
+    db.get_or_404(User, user_id)
+    conversation = find_conversation(user.id, user_id)
+    if conversation is None:
+        return listing([], MESSAGE_FIELDS, None)
+    # Newest first, like every other list here (load_messages returns display order)
+    rows, older_cursor = load_messages(conversation.id, before=request.args.get("cursor"), limit=page_limit())
+    rows.reverse()
+    return listing(rows, MESSAGE_FIELDS, older_cursor)
+
+
+# ===== Errors and compression =====
+@api_bp.errorhandler(HTTPException)
+def api_error(e):
+    return jsonify(error=e.description), e.code
+
+
+@api_bp.after_request
+def compress(response):
+    if (response.direct_passthrough or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    offered = ['br', 'gzip'] if brotli else ['gzip']
+    encoding = request.accept_encodings.best_match(offered)
+    if encoding == 'br':
+        body = brotli.compress(body, quality=5)
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=6)
+    else:
+        return response
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,33 @@
+# availability.py
+# Weekly availability as a 28-bit mask: one bit per (day, period) slot,
+# bit index = day * len(PERIODS) + period.
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+PERIODS = ["Morning", "Afternoon", "Evening", "Midnight"]
+SLOT_BITS = len(DAYS) * len(PERIODS)
+
+
+def to_mask(available_times):
+    """{'Monday': ['Morning', ...], ...} -> int. Unknown days/periods are ignored."""
+    mask = 0
+    for day, periods in (available_times or {}).items():
+        if day not in DAYS:
+            continue
+        for period in periods or ():
+            if period in PERIODS:
+                mask |= 1 << (DAYS.index(day) * len(PERIODS) + PERIODS.index(period))
+    return mask
+
+
+def from_mask(mask):
+    """int -> {'Monday': [...], ...} for every day, or {} when nothing is set."""
+    if not mask:
+        return {}
+    return {
+        day: [p for j, p in enumerate(PERIODS) if mask >> (i * len(PERIODS) + j) & 1]
+        for i, day in enumerate(DAYS)
+    }
+
+
+def overlap(mask_a, mask_b):
+    return (mask_a & mask_b).bit_count()
+
@@ -0,0 +1,333 @@
+# backup.py
+# Backups, exports and restores of the app database, run through
+# `flask --app app backup ...` (see cli.py):
+#
+#   snapshot DEST.db        consistent copy of the live SQLite file (online backup API)
+#   export DIR [--full]     gzip'd NDJSON per table; incremental after the first run
+#   restore DIR DEST.db     build a fresh SQLite database from an export
+#
+# snapshot copies PAGES_PER_STEP pages per step and sleeps between steps, so
+# each read lock is short: with the rollback journal a writer waits for one
+# step at most, and in WAL mode (the default, see database.py) writers never
+# wait and checkpoints aren't held back for the whole copy. A write from
+# another connection restarts the copy; after MAX_RESTARTS the remainder is
+# copied in a single step.
+#
+# export writes one generation per run, read in a single transaction so each
+# generation is a consistent snapshot:
+#   DIR/manifest.json                       generations, watermarks, schema version
+#   DIR/<gen>/<table>.<n>.ndjson.gz         one JSON array per row, CHUNK_ROWS rows per file
+# Tables in WATERMARKS are incremental: a later generation only holds rows
+# whose watermark columns (the id, plus a change timestamp where the table
+# has one) are past the previous run's maxima, and restore upserts them by
+# primary key. The other, small tables are exported whole each time.
+# Deletes and untimestamped edits of incremental tables aren't captured, so
+# take a --full generation periodically; restore starts from the latest one.
+# Works against PostgreSQL too, which makes it the way to move data between
+# the two.
+#
+# restore decodes chunks in worker processes, each into its own scratch
+# SQLite file, and merges those into the new database with INSERT ... SELECT.
+# Secondary indexes and the full-text index are built once, at the end.
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+from models import db
+
+PAGES_PER_STEP = 1024   # 4 MB per step with SQLite's default 4 KB pages
+STEP_SLEEP = 0.005
+MAX_RESTARTS = 5
+CHUNK_ROWS = 50000      # a multiple of FETCH_ROWS
+FETCH_ROWS = 5000
+COMPRESS_LEVEL = 3      # most of gzip -9's ratio on this data at a fraction of the CPU
+
+# table -> columns whose maxima mark how far the last export got
+WATERMARKS = {
+    "question": ("id",),
+    "answer": ("id",),
+    "direct_message": ("id",),
+    "document": ("id", "processed_at"),
+    "conversation": ("id", "last_message_at"),
+    "job": ("id", "updated_at"),
+}
+
+
+class BackupError(Exception):
+    pass
+
+
+# ===== Online snapshot =====
+class _TooManyRestarts(Exception):
+    pass
+
+
+def snapshot(source_path, dest_path, pages=PAGES_PER_STEP, sleep=STEP_SLEEP):
+    """Copy the SQLite database at source_path to dest_path. Returns bytes, seconds and restarts."""
+    started = time.perf_counter()
+    partial = dest_path + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    state = {"remaining": None, "restarts": 0}
+
+    def progress(status, remaining, total):
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        state["remaining"] = remaining
+
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(partial)
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress, sleep=sleep)
+        except _TooManyRestarts:
+            source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    os.replace(partial, dest_path)
+    return {"bytes": os.path.getsize(dest_path), "seconds": time.perf_counter() - started,
+            "restarts": state["restarts"]}
+
+
+# ===== Export =====
+def read_manifest(out_dir):
+    path = os.path.join(out_dir, "manifest.json")
+    if not os.path.exists(path):
+        return {"schema_version": None, "generations": [], "watermarks": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, "manifest.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _begin_snapshot(conn):
+    """Start the transaction every table is read in, so they're all read at one point in time."""
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN")  # pysqlite doesn't open one for reads by itself
+    else:
+        conn.execution_options(isolation_level="REPEATABLE READ")
+
+
+def _write_chunks(result, prefix, watermark_idx, marks):
+    """Stream rows into prefix.<n>.ndjson.gz files; advance marks[i] to the max of column watermark_idx[i]."""
+    encode = json.JSONEncoder(separators=(",", ":"), default=str).encode
+    chunks, count, out = [], 0, None
+    try:
+        for batch in result.partitions(FETCH_ROWS):
+            if out is None or count % CHUNK_ROWS == 0:
+                if out is not None:
+                    out.close()
+                chunks.append(f"{os.path.basename(prefix)}.{len(chunks)}.ndjson.gz")
+                out = gzip.open(os.path.join(os.path.dirname(prefix), chunks[-1]), "wt",
+                                compresslevel=COMPRESS_LEVEL, encoding="utf-8")
+            out.write("\n".join(map(encode, map(list, batch))) + "\n")
+            count += len(batch)
+            for i, idx in enumerate(watermark_idx):
+                latest = max((row[idx] for row in batch if row[idx] is not None), default=None)
+                if isinstance(latest, datetime):
+                    latest = str(latest)  # as the rows are written, and as SQLite returns it
+                if latest is not None and (marks[i] is None or latest > marks[i]):
+                    marks[i] = latest
+    finally:
+        if out is not None:
+            out.close()
+    return chunks, count
+
+
+def export(engine, out_dir, full=False):
+    """
+    Write the next generation of an export to out_dir (a full one if it's
+    the first or full=True). Returns the generation's manifest entry.
+    """
+    from migrations import current_version
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = read_manifest(out_dir)
+    full = full or not manifest["generations"]
+    generation = {"id": f"{len(manifest['generations']) + 1:04d}", "full": full,
+                  "exported_at": datetime.utcnow().isoformat(timespec="seconds"), "tables": {}}
+    gen_dir = os.path.join(out_dir, generation["id"])
+    watermarks = {} if full else dict(manifest["watermarks"])
+    started = time.perf_counter()
+
+    with engine.connect() as conn:
+        schema_version = current_version(conn)
+        conn.rollback()
+        if manifest["generations"] and manifest["schema_version"] != schema_version:
+            raise BackupError(f"database is at schema {schema_version} but this export is at "
+                              f"{manifest['schema_version']}; start a new export directory")
+        os.makedirs(gen_dir, exist_ok=True)  # a failed run's leftovers are overwritten
+        _begin_snapshot(conn)
+        quote = conn.dialect.identifier_preparer.quote
+        for table in db.metadata.sorted_tables:
+            columns = [c.name for c in table.columns]
+            sql = f"SELECT {', '.join(quote(c) for c in columns)} FROM {quote(table.name)}"
+            mark_columns = WATERMARKS.get(table.name, ())
+            previous = watermarks.get(table.name)
+            params = {f"w{i}": previous[c] for i, c in enumerate(mark_columns)
+                      if previous and previous[c] is not None}
+            if params:
+                sql += " WHERE " + " OR ".join(f"{quote(c)} > :w{i}" for i, c in enumerate(mark_columns)
+                                               if f"w{i}" in params)
+            marks = [previous[c] if previous else None for c in mark_columns]
+            rows = conn.execution_options(stream_results=True).execute(text(sql), params)
+            chunks, count = _write_chunks(rows, os.path.join(gen_dir, table.name),
+                                          [columns.index(c) for c in mark_columns], marks)
+            if mark_columns:
+                watermarks[table.name] = dict(zip(mark_columns, marks))
+            generation["tables"][table.name] = {
+                "columns": columns, "rows": count, "chunks": chunks,
+                "mode": "incremental" if previous else "full",
+            }
+        conn.rollback()
+
+    generation["seconds"] = round(time.perf_counter() - started, 3)
+    generation["bytes"] = sum(os.path.getsize(os.path.join(gen_dir, name)) for name in os.listdir(gen_dir))
+    manifest["schema_version"] = schema_version
+    manifest["watermarks"] = watermarks
+    manifest["generations"].append(generation)
+    _write_manifest(out_dir, manifest)
+    return generation
+
+
+# ===== Restore =====
+def _decode_chunk(chunk_path):
+    """All rows of a chunk, parsed in one call: raw newlines only ever separate rows in JSON lines."""
+    with gzip.open(chunk_path, "rt", encoding="utf-8") as f:
+        data = f.read().rstrip("\n")
+    return json.loads("[" + data.replace("\n", ",") + "]") if data else []
+
+
+def _load_part(chunk_path, columns, part_path):
+    """Worker: decode one chunk into a scratch SQLite file. Returns (part_path, rows)."""
+    conn = sqlite3.connect(part_path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute(f"CREATE TABLE part ({', '.join(_quote(c) for c in columns)})")
+    conn.execute("BEGIN")
+    cursor = conn.executemany(f"INSERT INTO part VALUES ({', '.join('?' * len(columns))})",
+                              _decode_chunk(chunk_path))
+    rows = cursor.rowcount
+    conn.execute("COMMIT")
+    conn.close()
+    return part_path, rows
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def restore(export_dir, dest_path, workers=None):
+    """
+    Build a new SQLite database at dest_path from export_dir: the latest full
+    generation plus the incremental ones after it. workers > 1 decodes chunks
+    in that many processes. Returns rows, bytes and seconds.
+    """
+    from migrations import LATEST_VERSION, current_version
+    import post_search
+
+    manifest = read_manifest(export_dir)
+    if not manifest["generations"]:
+        raise BackupError(f"no export in {export_dir}")
+    if manifest["schema_version"] != LATEST_VERSION:
+        raise BackupError(f"export is at schema {manifest['schema_version']}, this code expects "
+                          f"{LATEST_VERSION}; restore with the matching version of the app")
+    if os.path.exists(dest_path):
+        raise BackupError(f"{dest_path} exists; restore only writes fresh databases")
+    last_full = max(i for i, g in enumerate(manifest["generations"]) if g["full"])
+    generations = manifest["generations"][last_full:]
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    partial = dest_path + ".partial"
+    scratch = tempfile.mkdtemp(prefix="restore-", dir=os.path.dirname(os.path.abspath(dest_path)))
+    for path in (partial, partial + "-wal", partial + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    engine = create_engine("sqlite:///" + partial)
+    target = None
+    try:
+        with engine.begin() as conn:
+            for table in db.metadata.sorted_tables:
+                conn.execute(CreateTable(table))  # indexes come after the data
+        engine.dispose()
+
+        target = sqlite3.connect(partial, isolation_level=None)
+        target.execute("PRAGMA journal_mode = OFF")  # a failed restore is thrown away anyway
+        target.execute("PRAGMA synchronous = OFF")
+        total = 0
+        pool = ProcessPoolExecutor(workers) if workers > 1 else None
+        try:
+            for generation in generations:
+                gen_dir = os.path.join(export_dir, generation["id"])
+                tasks = []
+                for name, info in generation["tables"].items():
+                    if info["mode"] == "full":
+                        target.execute(f"DELETE FROM {_quote(name)}")
+                    columns = ", ".join(_quote(c) for c in info["columns"])
+                    for chunk in info["chunks"]:
+                        tasks.append((name, columns, info["columns"], os.path.join(gen_dir, chunk)))
+
+                if pool is None:
+                    for name, columns, column_list, chunk_path in tasks:
+                        target.execute("BEGIN")
+                        cursor = target.executemany(
+                            f"INSERT OR REPLACE INTO {_quote(name)} ({columns}) "
+                            f"VALUES ({', '.join('?' * len(column_list))})", _decode_chunk(chunk_path))
+                        target.execute("COMMIT")
+                        total += cursor.rowcount
+                else:
+                    # Merge each part as soon as its worker finishes; the others keep decoding
+                    futures = {pool.submit(_load_part, chunk_path, column_list,
+                                           os.path.join(scratch, f"{generation['id']}-{n}.db")): (name, columns)
+                               for n, (name, columns, column_list, chunk_path) in enumerate(tasks)}
+                    for future in as_completed(futures):
+                        name, columns = futures[future]
+                        part_path, rows = future.result()
+                        target.execute("ATTACH DATABASE ? AS part", (part_path,))
+                        target.execute("BEGIN")
+                        target.execute(f"INSERT OR REPLACE INTO main.{_quote(name)} ({columns}) "
+                                       f"SELECT {columns} FROM part.part")
+                        target.execute("COMMIT")
+                        target.execute("DETACH DATABASE part")
+                        os.remove(part_path)
+                        total += rows
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        target.close()
+        target = None
+
+        engine = create_engine("sqlite:///" + partial)
+        with engine.begin() as conn:
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    conn.execute(CreateIndex(index))
+            current_version(conn)
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": LATEST_VERSION})
+            post_search.install(conn)
+        engine.dispose()
+        os.replace(partial, dest_path)
+    finally:
+        if target is not None:
+            target.close()
+        shutil.rmtree(scratch, ignore_errors=True)
+        if os.path.exists(partial):
+            os.remove(partial)
+    return {"rows": total, "bytes": os.path.getsize(dest_path), "seconds": time.perf_counter() - started}
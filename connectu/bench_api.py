@@ -0,0 +1,79 @@
+# bench_api.py
+# Requests/second and bytes on the wire for the JSON API against the HTML
+# routes it replaces, served by a threaded local server and hit by N
+# concurrent clients for a fixed duration each. Runs against the local
+# instance database, anonymously (no session cookie).
+# Usage: python bench_api.py [seconds per route] [concurrency]   (default: 5 16)
+import logging
+import sys
+import threading
+import time
+import urllib.request
+
+from werkzeug.serving import make_server
+
+from app import create_app
+from models import db, Course, Question
+from course_search import build_course_index
+from page_cache import page_cache
+
+
+def hammer(base, path, seconds, concurrency):
+    counts, sizes, errors = [0] * concurrency, [0] * concurrency, [0] * concurrency
+    deadline = time.perf_counter() + seconds
+
+    def client(i):
+        req = urllib.request.Request(base + path, headers={"Accept-Encoding": "br, gzip"})
+        while time.perf_counter() < deadline:
+            try:
+                with urllib.request.urlopen(req) as r:
+                    sizes[i] += len(r.read())
+                counts[i] += 1
+            except Exception:
+                errors[i] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    done = sum(counts)
+    return done / seconds, (sum(sizes) / done if done else 0), sum(errors)
+
+
+def main(seconds, concurrency):
+    app = create_app()
+    with app.app_context():
+        # Busiest course, so the Q&A routes have something to render
+        busiest = (db.session.query(Question.course_id).group_by(Question.course_id)
+                   .order_by(db.func.count().desc()).limit(1).scalar())
+        course = db.session.get(Course, busiest) if busiest else Course.query.first()
+        if course is None:
+            sys.exit("need at least one course in instance/connectu.db")
+        code = course.course_code
+        build_course_index()  # not part of any route's timing
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no per-request access log
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    pairs = [
+        (f"/course/{code}", f"/api/v1/courses/{code}/questions"),
+        ("/search?q=COMPSCI", "/api/v1/courses?q=COMPSCI&limit=25"),
+        ("/search?q=COMPSCI", "/api/v1/courses?q=COMPSCI&limit=25&fields=id,course_code"),
+    ]
+    for cache_bytes, label in ((0, "page cache off"), (page_cache.max_bytes, "page cache on")):
+        page_cache.clear()
+        page_cache.max_bytes = cache_bytes
+        print(f"--- {label}, {concurrency} clients ---")
+        for html, api in pairs:
+            for path in (html, api):
+                rps, size, errors = hammer(base, path, seconds, concurrency)
+                print(f"{path:60} {rps:8.1f} req/s  {size:8.0f} B/resp" + (f"  {errors} errors" if errors else ""))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args[0] if args else 5, args[1] if len(args) > 1 else 16)
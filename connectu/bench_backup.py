@@ -0,0 +1,154 @@
+# bench_backup.py
+# Backup / export / restore throughput on a multi-GB synthetic database:
+# synthetic_data.py's default dataset, with direct messages duplicated until
+# the file reaches --size-gb. A separate writer process keeps committing
+# messages during the snapshot and the first export, and reports how long
+# its commits took, i.e. whether the backup got in the app's way.
+#
+#   python bench_backup.py [--size-gb 2] [--workers N]
+import argparse
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from app import create_app
+from models import db
+from migrations import upgrade
+from synthetic_data import generate
+import backup
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def inflate(path, size_bytes):
+    """Duplicate direct_message rows (new ids) until the database file is size_bytes."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    while os.path.getsize(path) < size_bytes:
+        n = conn.execute("SELECT max(id) FROM direct_message").fetchone()[0]
+        batch = min(n, 2_000_000)
+        conn.execute("BEGIN")
+        conn.execute("INSERT INTO direct_message (conversation_id, sender_id, recipient_id, content, timestamp) "
+                     "SELECT conversation_id, sender_id, recipient_id, content, timestamp "
+                     "FROM direct_message WHERE id <= ?", (batch,))
+        conn.execute("COMMIT")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    rows = conn.execute("SELECT count(*) FROM direct_message").fetchone()[0]
+    conn.close()
+    return rows
+
+
+def writer(path, stop, results, interval=0.02):
+    """Commit one message every `interval` seconds until stopped; report commit latencies (ms)."""
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        conn.execute("INSERT INTO direct_message (conversation_id, sender_id, recipient_id, content, timestamp) "
+                     "VALUES (1, 1, 2, 'during backup', datetime('now'))")
+        conn.commit()
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(interval)
+    conn.close()
+    results.put(latencies)
+
+
+class Writer:
+    def __init__(self, path):
+        self.stop = multiprocessing.Event()
+        self.results = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=writer, args=(path, self.stop, self.results))
+
+    def __enter__(self):
+        self.process.start()
+        time.sleep(0.2)
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        self.latencies = sorted(self.results.get())
+        self.process.join()
+
+    def report(self):
+        lat = self.latencies
+        return (f"writer: {len(lat)} commits meanwhile, p50 {percentile(lat, 50):.1f} ms, "
+                f"p99 {percentile(lat, 99):.1f} ms, max {lat[-1]:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backup, export and restore throughput")
+    parser.add_argument("--size-gb", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=max(2, os.cpu_count() or 1),
+                        help="restore decoding processes for the parallel run")
+    parser.add_argument("--dir", help="scratch directory (default: a temporary one)")
+    args = parser.parse_args()
+
+    tmp = args.dir or tempfile.mkdtemp(prefix="bench-backup-")
+    os.makedirs(tmp, exist_ok=True)
+    source = os.path.join(tmp, "source.db")
+    try:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + source,
+            "SESSION_SQLITE_PATH": os.path.join(tmp, "sessions.db"),
+            "DOCUMENT_STORE": os.path.join(tmp, "documents"),
+        })
+        with app.app_context():
+            db.create_all()
+            upgrade(db.engine)
+            generate(app.config["COURSES_SITEMAP"])
+            db.engine.dispose()
+        start = time.perf_counter()
+        messages = inflate(source, int(args.size_gb * 2**30))
+        size = os.path.getsize(source)
+        print(f"source: {size / 2**30:.2f} GB, {messages} messages (built in {time.perf_counter() - start:.0f}s)\n")
+
+        # ===== Online snapshot, with the app writing =====
+        with Writer(source) as w:
+            stats = backup.snapshot(source, os.path.join(tmp, "snapshot.db"))
+        print(f"snapshot: {stats['bytes'] / 2**20:.0f} MB in {stats['seconds']:.1f}s "
+              f"({stats['bytes'] / 2**20 / stats['seconds']:.0f} MB/s), {stats['restarts']} restarts")
+        print("  " + w.report())
+        stats = backup.snapshot(os.path.join(tmp, "snapshot.db"), os.path.join(tmp, "snapshot2.db"))
+        print(f"snapshot of an idle copy: {stats['bytes'] / 2**20 / stats['seconds']:.0f} MB/s, "
+              f"{stats['restarts']} restarts")
+        os.remove(os.path.join(tmp, "snapshot2.db"))
+
+        # ===== Export: full, then incremental =====
+        with app.app_context():
+            out = os.path.join(tmp, "export")
+            with Writer(source) as w:
+                gen = backup.export(db.engine, out)
+            rows = sum(t["rows"] for t in gen["tables"].values())
+            print(f"\nexport (full): {rows} rows in {gen['seconds']:.1f}s ({rows / gen['seconds']:.0f} rows/s, "
+                  f"{size / 2**20 / gen['seconds']:.0f} MB/s of database) -> {gen['bytes'] / 2**20:.0f} MB gzip'd "
+                  f"({size / gen['bytes']:.1f}x smaller)")
+            print("  " + w.report())
+            gen = backup.export(db.engine, out)
+            rows = sum(t["rows"] for t in gen["tables"].values())
+            print(f"export (incremental): {rows} rows in {gen['seconds']:.1f}s, {gen['bytes'] / 2**20:.1f} MB")
+            db.engine.dispose()
+
+        # ===== Restore, single process and parallel =====
+        for workers in (1, args.workers):
+            dest = os.path.join(tmp, f"restored-{workers}.db")
+            stats = backup.restore(out, dest, workers=workers)
+            print(f"\nrestore ({workers} worker{'s' if workers > 1 else ''}): {stats['rows']} rows in "
+                  f"{stats['seconds']:.1f}s ({stats['rows'] / stats['seconds']:.0f} rows/s, "
+                  f"{stats['bytes'] / 2**20 / stats['seconds']:.0f} MB/s written)")
+            os.remove(dest)
+        print(f"\n({os.cpu_count()} CPU{'s' if os.cpu_count() != 1 else ''} available)")
+    finally:
+        if not args.dir:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# bench_jobs.py
+# Throughput of the document-processing worker pool on a batch of synthetic
+# txt/docx/pptx/pdf uploads.
+# Usage: python bench_jobs.py [documents] [concurrency...]   (default: 1000 1 2 4)
+import io
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+from flask import Flask
+from models import db, User, Course, Document, Job
+from document_store import DocumentStore
+from jobs import enqueue, run_pool
+from migrations import upgrade
+
+WORDS = "lecture notes midterm review dynamic programming graph flows reductions".split()
+
+
+def sample_text(i, lines=60):
+    return "\n".join(" ".join(WORDS[(i + j + k) % len(WORDS)] for k in range(12)) for j in range(lines))
+
+
+def make_docx(text):
+    body = "".join(f"<w:p><w:r><w:t>{line}</w:t></w:r></w:p>" for line in text.splitlines())
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("word/document.xml", f"<w:document><w:body>{body}</w:body></w:document>")
+        z.writestr("docProps/app.xml", "<Properties><Pages>3</Pages></Properties>")
+    return buf.getvalue()
+
+
+def make_pptx(text):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for n, chunk in enumerate(text.splitlines()[::10], start=1):
+            z.writestr(f"ppt/slides/slide{n}.xml", f"<p:sld><a:p><a:t>{chunk}</a:t></a:p></p:sld>")
+    return buf.getvalue()
+
+
+def make_pdf(text):
+    pages = text.splitlines()[::20]
+    objs = [f"<< /Type /Page >>\nstream\nBT ({line}) Tj ET\nendstream" for line in pages]
+    body = "\n".join(f"{i + 3} 0 obj {o} endobj" for i, o in enumerate(objs))
+    return f"%PDF-1.4\n1 0 obj << /Type /Catalog >> endobj\n2 0 obj << /Type /Pages >> endobj\n{body}\n%%EOF".encode()
+
+
+MAKERS = {
+    "txt": lambda t: t.encode(),
+    "docx": make_docx,
+    "pptx": make_pptx,
+    "pdf": make_pdf,
+}
+
+
+def make_app(tmp):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['DOCUMENT_STORE'] = os.path.join(tmp, 'documents')
+    app.config['THUMBNAIL_DIR'] = os.path.join(tmp, 'documents', 'thumbs')
+    db.init_app(app)
+    return app
+
+
+def seed(store, n):
+    user = User(auth0_id="bench|1", username="bench")
+    course = Course(course_code="BENCH_100")
+    db.session.add_all([user, course])
+    db.session.flush()
+    kinds = list(MAKERS)
+    for i in range(n):
+        ext = kinds[i % len(kinds)]
+        digest, size = store.save(io.BytesIO(MAKERS[ext](sample_text(i))))
+        doc = Document(filename=f"doc{i}.{ext}", filepath=store.path_for(digest), content_hash=digest,
+                       size=size, course_id=course.id, user_id=user.id)
+        db.session.add(doc)
+        db.session.flush()
+        enqueue('process_document', {'document_id': doc.id})
+    db.session.commit()
+
+
+def run(n, concurrency):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(tmp)
+        with app.app_context():
+            db.create_all()
+            upgrade(db.engine)
+            store = DocumentStore()
+            store.init_app(app)
+            seed(store, n)
+            db.session.remove()
+
+        start = time.perf_counter()
+        run_pool(app, concurrency, stop_when_idle=True)
+        elapsed = time.perf_counter() - start
+
+        with app.app_context():
+            ready = Document.query.filter_by(status='ready').count()
+            failed = Job.query.filter_by(status='failed').count()
+            db.engine.dispose()
+    print(f"{n} docs | {concurrency} workers | {elapsed:6.2f}s | {n / elapsed:7.1f} docs/s | "
+          f"ready {ready}, failed jobs {failed}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    n = args[0] if args else 1000
+    for c in (args[1:] or [1, 2, 4]):
+        run(n, c)
@@ -0,0 +1,61 @@
+# bench_matching.py
+# Latency of find_study_partners (top-K by availability overlap) for a course
+# with N enrollees.
+# Usage: python bench_matching.py [sizes...]   (default: 1000 10000 100000)
+import random
+import sys
+import time
+
+from flask import Flask
+from models import db, User, Course, UserCourse
+from availability import SLOT_BITS
+from course_queries import find_study_partners
+
+RUNS = 20
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(n, rng):
+    db.session.execute(Course.__table__.insert(), [{"id": 1, "course_code": "COMPSCI_577"}])
+    db.session.execute(User.__table__.insert(), [
+        # ~6 free slots a week each; a few users never set availability
+        {"id": i, "auth0_id": f"bench|{i}", "username": f"user{i}",
+         "availability_mask": 0 if i % 10 == 0 else sum(1 << rng.randrange(SLOT_BITS) for _ in range(6))}
+        for i in range(1, n + 2)
+    ])
+    db.session.execute(UserCourse.__table__.insert(), [
+        {"user_id": i, "course_id": 1, "status": "Student", "term": "Fall 2025"} for i in range(1, n + 2)
+    ])
+    db.session.commit()
+
+
+def run(n):
+    app = make_app()
+    rng = random.Random(n)
+    with app.app_context():
+        db.create_all()
+        seed(n, rng)
+        me = db.session.get(User, 1)
+        me.availability_mask = (1 << SLOT_BITS) - 1 if not me.availability_mask else me.availability_mask
+        samples = []
+        for _ in range(RUNS):
+            t0 = time.perf_counter()
+            partners = find_study_partners(1, me, k=10)
+            samples.append((time.perf_counter() - t0) * 1000)
+        samples.sort()
+        print(f"{n:>7} enrollees | top-10 p50 {samples[len(samples) // 2]:7.2f}ms "
+              f"max {samples[-1]:7.2f}ms | best overlap {partners[0]['shared_slots'] if partners else 0}")
+        db.drop_all()
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1:]] or [1000, 10_000, 100_000]
+    for size in sizes:
+        run(size)
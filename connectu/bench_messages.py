@@ -0,0 +1,91 @@
+# bench_messages.py
+# Page-load latency for a direct_message thread of N messages: the old
+# full-history OR query vs. the keyset-paginated conversation page.
+# Usage: python bench_messages.py [sizes...]   (default: 100 10000 100000)
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask, render_template_string
+from models import db, User, Conversation, DirectMessage
+from conversations import load_messages
+from migrations import upgrade
+
+RUNS = 30
+
+# Same per-message markup as messages.html, without the site chrome
+PAGE = """{% for msg in messages %}<li class="{% if msg.sender_id == 2 %}chat-left{% else %}chat-right{% endif %}">
+{{ msg.content }}<span data-iso-time="{{ msg.timestamp.isoformat() }}Z"></span></li>{% endfor %}"""
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(n):
+    db.session.add_all([User(id=1, auth0_id="bench|1", username="tutor"),
+                        User(id=2, auth0_id="bench|2", username="student"),
+                        User(id=3, auth0_id="bench|3", username="other")])
+    db.session.add_all([Conversation(id=1, low_user_id=1, high_user_id=2),
+                        Conversation(id=2, low_user_id=1, high_user_id=3)])
+    db.session.commit()
+    start = datetime(2025, 1, 1)
+    rows = []
+    for i in range(n):
+        # Interleave noise from another conversation so the thread isn't contiguous
+        sender, recipient, conv = ((1, 2, 1), (2, 1, 1), (1, 3, 2))[i % 3]
+        rows.append({"conversation_id": conv, "sender_id": sender, "recipient_id": recipient,
+                     "content": f"message {i}", "timestamp": start + timedelta(seconds=i)})
+    db.session.execute(DirectMessage.__table__.insert(), rows)
+    db.session.commit()
+
+
+def legacy_page():
+    messages = DirectMessage.query.filter(
+        ((DirectMessage.sender_id == 1) & (DirectMessage.recipient_id == 2)) |
+        ((DirectMessage.sender_id == 2) & (DirectMessage.recipient_id == 1))
+    ).order_by(DirectMessage.timestamp).all()
+    return render_template_string(PAGE, messages=messages)
+
+
+def paged_page():
+    messages, _ = load_messages(1)
+    return render_template_string(PAGE, messages=messages)
+
+
+def timed(fn):
+    samples = []
+    for _ in range(RUNS):
+        db.session.expunge_all()
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.95)]
+
+
+def run(n):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, "bench.db"))
+        with app.app_context():
+            db.create_all()
+            upgrade(db.engine)
+            seed(n)
+            old = timed(legacy_page)
+            new = timed(paged_page)
+            db.session.remove()
+            db.engine.dispose()
+    print(f"{n:>7} msgs | full history p50 {old[0]:8.2f}ms p95 {old[1]:8.2f}ms | "
+          f"latest page p50 {new[0]:6.2f}ms p95 {new[1]:6.2f}ms")
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1:]] or [100, 10_000, 100_000]
+    for size in sizes:
+        run(size)
@@ -0,0 +1,126 @@
+# bench_page_weight.py
+# Bytes on the wire for index, course_detail and profile, with the original
+# static files ("before") and after `flask assets build` ("after"), on a
+# small synthetic database. A client that accepts br/gzip and WebP at 1x
+# fetches each page and its /static subresources (stylesheets, <img>, and
+# the 1x candidate of <picture>/srcset), as transferred. The repeat view then
+# revalidates whatever isn't cached for good: before, that's every asset
+# (Flask's default no-cache); after, nothing but the HTML.
+#
+#   python bench_page_weight.py
+import argparse
+import os
+import tempfile
+from html.parser import HTMLParser
+
+from app import create_app
+from models import db, User, Course
+from migrations import upgrade
+from page_cache import page_cache
+from synthetic_data import generate
+import static_assets
+
+
+class Subresources(HTMLParser):
+    """/static URLs a WebP-capable, 1x-density browser would load."""
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+        self.in_picture = False
+        self.picked = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "link" and attrs.get("rel") == "stylesheet":
+            self.add(attrs.get("href"))
+        elif tag == "picture":
+            self.in_picture, self.picked = True, False
+        elif tag == "source" and self.in_picture and attrs.get("type") == "image/webp" and not self.picked:
+            self.picked = self.add(first_candidate(attrs.get("srcset")))
+        elif tag == "img" and not (self.in_picture and self.picked):
+            self.add(first_candidate(attrs.get("srcset")) or attrs.get("src"))
+
+    def handle_endtag(self, tag):
+        if tag == "picture":
+            self.in_picture = False
+
+    def add(self, url):
+        if url and url.startswith("/static/") and url not in self.urls:
+            self.urls.append(url)
+        return bool(url)
+
+
+def first_candidate(srcset):
+    return srcset.split(",")[0].split()[0] if srcset else None
+
+
+def page_weight(client, url):
+    """(first-view bytes, requests), (repeat-view bytes, requests)."""
+    accept = {"Accept-Encoding": "br, gzip"}
+    page = client.get(url, headers=accept)
+    assert page.status_code == 200, (url, page.status_code)
+    parser = Subresources()
+    parser.feed(page.get_data(as_text=True))
+
+    first, repeat = [len(page.data)], [len(page.data)]
+    for asset in parser.urls:
+        r = client.get(asset, headers=accept)
+        assert r.status_code == 200, (asset, r.status_code)
+        first.append(len(r.data))
+        if not r.cache_control.immutable:
+            again = client.get(asset, headers=dict(accept, **{"If-None-Match": r.headers.get("ETag", "")}))
+            repeat.append(len(again.data))
+    return (sum(first), len(first)), (sum(repeat), len(repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Page weight before/after the static asset build")
+    parser.add_argument("--avatar", default="avatar1.png", help="static/ avatar the profile shows")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = {
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "bench.db"),
+            "SESSION_SQLITE_PATH": os.path.join(tmp, "sessions.db"),
+            "DOCUMENT_STORE": os.path.join(tmp, "documents"),
+        }
+        before = create_app(dict(config, ASSET_DIR=os.path.join(tmp, "no-build")))
+        with before.app_context():
+            db.create_all()
+            upgrade(db.engine)
+            summary = generate(before.config["COURSES_SITEMAP"], users=200, courses=200, questions=2000,
+                               threads=50)
+            user = db.session.get(User, 1)
+            user.avatar_url = f"{before.static_url_path}/{args.avatar}"
+            db.session.commit()
+            auth0_id = user.auth0_id
+            course = Course.query.filter_by(course_code=summary["popular_courses"][0]).one()
+            urls = {"index": "/", "course_detail": f"/course/{course.course_code}", "profile": "/profile"}
+
+        manifest = static_assets.build(before.static_folder, os.path.join(tmp, "dist"))
+        after = create_app(dict(config, ASSET_DIR=os.path.join(tmp, "dist")))
+        if not manifest["pillow"] or not manifest["brotli"]:
+            print("note: built without " + " and ".join(
+                name for name in ("pillow", "brotli") if not manifest[name]) + "\n")
+
+        results = {}
+        for label, app in (("before", before), ("after", after)):
+            page_cache.clear()  # process-wide: don't serve "after" the pages rendered "before"
+            client = app.test_client()
+            with client.session_transaction() as s:
+                s["user"] = {"auth0_id": auth0_id, "name": "bench", "email": "bench@example.com"}
+            results[label] = {page: page_weight(client, url) for page, url in urls.items()}
+
+        print(f"{'page':14} {'first view: before':>20} {'after':>16} {'saved':>7}   "
+              f"{'repeat view: before':>21} {'after':>16}")
+        for page in urls:
+            (b_bytes, b_reqs), (rb_bytes, rb_reqs) = results["before"][page]
+            (a_bytes, a_reqs), (ra_bytes, ra_reqs) = results["after"][page]
+            print(f"{page:14} {b_bytes / 1024:9.1f} KB, {b_reqs:2d} req {a_bytes / 1024:6.1f} KB, {a_reqs:2d} req "
+                  f"{1 - a_bytes / b_bytes:6.0%}   {rb_bytes / 1024:10.1f} KB, {rb_reqs:2d} req "
+                  f"{ra_bytes / 1024:6.1f} KB, {ra_reqs:2d} req")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# bench_pages.py
+# Latency of course_detail / search / profile_view through the app with the
+# page cache cold (every request renders) and warm (hits and 304s), against
+# the local instance database.
+# Usage: python bench_pages.py [requests per route]   (default: 500)
+import statistics
+import sys
+import time
+
+from app import create_app
+from models import User, Course
+from page_cache import page_cache
+
+
+def timed(client, url, n, headers=None, clear=False):
+    samples = []
+    for _ in range(n):
+        if clear:
+            page_cache.clear()
+        start = time.perf_counter()
+        r = client.get(url, headers=headers or {})
+        samples.append((time.perf_counter() - start) * 1000)
+        assert r.status_code in (200, 304), (url, r.status_code)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main(n):
+    app = create_app()
+    with app.app_context():
+        user = User.query.first()
+        course = Course.query.first()
+        if user is None or course is None:
+            sys.exit("need at least one user and one course in instance/connectu.db")
+        urls = [f"/course/{course.course_code}", "/search?q=COMPSCI", f"/profile/{user.id}"]
+        auth0_id = user.auth0_id
+
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s["user"] = {"auth0_id": auth0_id, "name": "bench", "email": "bench@example.com"}
+
+    for url in urls:
+        cold = timed(client, url, n, clear=True)
+        warm = timed(client, url, n)
+        etag = client.get(url).headers["ETag"]
+        revalidate = timed(client, url, n, headers={"If-None-Match": etag})
+        print(f"{url:32} cold p50 {cold[0]:6.2f}ms p95 {cold[1]:6.2f}ms | hit p50 {warm[0]:6.2f}ms "
+              f"p95 {warm[1]:6.2f}ms | 304 p50 {revalidate[0]:6.2f}ms")
+    print(page_cache.stats())
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,123 @@
+# bench_post_search.py
+# Full-text search latency at scale: fills a scratch SQLite database with
+# ~1M questions + answers from synthetic_data.py (with a long-tail
+# vocabulary, so there are rare terms as well as very common ones), letting
+# the post_search triggers index them as they load, then times search_posts()
+# for global and course-scoped queries, a deep page, `flask search rebuild`'s
+# rebuild(), the JSON endpoint end to end, and one LIKE scan for comparison.
+#
+#   python bench_post_search.py [--posts 1000000] [-n 50]
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import text
+from app import create_app
+from models import db, Course
+from migrations import upgrade
+from synthetic_data import generate, pseudo_word, WORDS
+import post_search
+
+ANSWERS_PER_QUESTION = 1.54  # mean of int(expovariate(1 / 2)), synthetic_data's default
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def timed(fn, n):
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return result, times
+
+
+def index_bytes():
+    try:
+        return db.session.execute(text(
+            "SELECT sum(pgsize) FROM dbstat WHERE name LIKE 'post_search%'")).scalar()
+    except Exception:
+        return None  # SQLite built without dbstat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search benchmark")
+    parser.add_argument("--posts", type=int, default=1_000_000, help="questions + answers to load (approx.)")
+    parser.add_argument("--vocabulary", type=int, default=20000, help="long-tail words mixed into posts")
+    parser.add_argument("-n", "--repeat", type=int, default=50, help="runs per query")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + path,
+            "SESSION_SQLITE_PATH": os.path.join(tmp, "sessions.db"),
+            "DOCUMENT_STORE": os.path.join(tmp, "documents"),
+        })
+        with app.app_context():
+            db.create_all()
+            upgrade(db.engine)
+            summary = generate(app.config["COURSES_SITEMAP"], seed=args.seed, vocabulary=args.vocabulary,
+                               questions=int(args.posts / (1 + ANSWERS_PER_QUESTION)), threads=10)
+            counts = summary["counts"]
+            posts = counts["questions"] + counts["answers"]
+            print(f"loaded {posts} posts ({counts['questions']} questions, {counts['answers']} answers) "
+                  f"in {summary['seconds']:.1f}s, indexed by the triggers as they went")
+            size = index_bytes()
+            print(f"database {os.path.getsize(path) / 2**20:.0f} MB"
+                  + (f", search index {size / 2**20:.0f} MB" if size else ""))
+
+            popular = db.session.query(Course.id).filter_by(course_code=summary["popular_courses"][0]).scalar()
+            quiet = db.session.query(Course.id).filter_by(course_code=summary["popular_courses"][200]).scalar()
+            queries = [
+                ("common word", WORDS[5], None),
+                ("two common words", f"{WORDS[14]} {WORDS[15]}", None),
+                ("mid-tail word", pseudo_word(100), None),
+                ("rare word", pseudo_word(10000), None),
+                ("common, busiest course", WORDS[5], popular),
+                ("common, quiet course", WORDS[5], quiet),
+                ("mid-tail, busiest course", pseudo_word(100), popular),
+            ]
+
+            print(f"\n{'query':26} {'matches':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+            for label, query, course_id in queries:
+                matches = db.session.execute(
+                    text("SELECT count(*) FROM post_search WHERE post_search MATCH :e"),
+                    {"e": post_search.match_expression(query, course_id)}).scalar()
+                page, times = timed(lambda: post_search.search_posts(query, course_id=course_id), args.repeat)
+                assert page.hits or not matches
+                print(f"{label:26} {matches:8d} {percentile(times, 50):8.2f} {percentile(times, 90):8.2f} "
+                      f"{percentile(times, 99):8.2f}")
+
+            _, times = timed(lambda: post_search.search_posts(WORDS[5], page=10), args.repeat)
+            print(f"{'common word, page 10':26} {'':8} {percentile(times, 50):8.2f} {percentile(times, 90):8.2f} "
+                  f"{percentile(times, 99):8.2f}")
+
+            # What it would cost without the index
+            rare = f"%{pseudo_word(10000)}%"
+            start = time.perf_counter()
+            db.session.execute(text("SELECT count(*) FROM question WHERE content LIKE :p"), {"p": rare}).scalar()
+            db.session.execute(text("SELECT count(*) FROM answer WHERE content LIKE :p"), {"p": rare}).scalar()
+            print(f"\nLIKE scan of questions + answers for the rare word: "
+                  f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+            db.session.remove()
+            start = time.perf_counter()
+            with db.engine.begin() as conn:
+                rows = post_search.rebuild(conn)
+            print(f"rebuild: {rows} rows in {time.perf_counter() - start:.1f}s")
+
+        # Outside the app context, so each request gets its own (as in production)
+        client = app.test_client()
+        _, times = timed(lambda: client.get(f"/api/v1/search?q={pseudo_word(100)}"), args.repeat)
+        print(f"GET /api/v1/search, mid-tail word: p50 {percentile(times, 50):.2f} ms, "
+              f"p99 {percentile(times, 99):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# bench_push.py
+# Local SSE load test: holds N idle /stream connections open against a
+# threaded werkzeug server, then publishes messages to random users and
+# measures publish -> client-receive latency.
+# Usage: python bench_push.py [connections] [messages]   (default: 2000 500)
+import json
+import logging
+import random
+import resource
+import selectors
+import socket
+import sys
+import threading
+import time
+
+from flask import Flask, Response
+from werkzeug.serving import make_server
+from push_hub import PushHub
+
+
+def make_app(hub):
+    app = Flask(__name__)
+
+    # Same generator as messaging.stream, minus the session lookup
+    @app.route("/stream/<int:user_id>")
+    def stream(user_id):
+        return Response(hub.stream(user_id, heartbeat=30), mimetype="text/event-stream")
+
+    return app
+
+
+def open_clients(port, n):
+    sel = selectors.DefaultSelector()
+    for user_id in range(n):
+        sock = socket.create_connection(("127.0.0.1", port))
+        sock.sendall(f"GET /stream/{user_id} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        sock.setblocking(False)
+        sel.register(sock, selectors.EVENT_READ, data={"user": user_id, "buf": b""})
+    return sel
+
+
+def read_events(sel, timeout, on_event):
+    for key, _ in sel.select(timeout):
+        try:
+            chunk = key.fileobj.recv(65536)
+        except BlockingIOError:
+            continue
+        buf = key.data["buf"] + chunk
+        while b"\n\n" in buf:
+            frame, buf = buf.split(b"\n\n", 1)
+            for line in frame.split(b"\n"):
+                # chunked transfer framing lines are ignored; only data: lines matter
+                if line.startswith(b"data: "):
+                    on_event(key.data["user"], json.loads(line[6:]))
+        key.data["buf"] = buf
+
+
+def main(n_conns, n_messages):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, n_conns * 2 + 100)), hard))
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    hub = PushHub()
+    server = make_server("127.0.0.1", 0, make_app(hub), threaded=True)
+    server.socket.listen(n_conns)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    t0 = time.perf_counter()
+    sel = open_clients(server.server_port, n_conns)
+    while hub.backend.connection_count() < n_conns:
+        read_events(sel, 0.05, lambda *_: None)
+    print(f"{n_conns} idle connections subscribed in {time.perf_counter() - t0:.2f}s")
+
+    latencies = []
+    pending = {}
+
+    def on_event(user_id, payload):
+        sent = pending.pop(payload["id"], None)
+        if sent is not None:
+            latencies.append((time.perf_counter() - sent) * 1000)
+
+    rng = random.Random(0)
+    for msg_id in range(n_messages):
+        user_id = rng.randrange(n_conns)
+        pending[msg_id] = time.perf_counter()
+        hub.backend.publish(hub.user_channel(user_id), json.dumps({"id": msg_id}))
+        read_events(sel, 0, on_event)
+    deadline = time.time() + 10
+    while pending and time.time() < deadline:
+        read_events(sel, 0.05, on_event)
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+    print(f"delivered {len(latencies)}/{n_messages} messages | "
+          f"p50 {pct(50):.2f}ms  p95 {pct(95):.2f}ms  p99 {pct(99):.2f}ms  max {latencies[-1]:.2f}ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args[0] if args else 2000, args[1] if len(args) > 1 else 500)
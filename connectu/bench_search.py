@@ -0,0 +1,75 @@
+# bench_search.py
+# Usage: python bench_search.py [sizes...]   (default: 10000 100000 1000000)
+import random
+import re
+import sys
+import time
+import os
+
+from course_search import CourseSearchIndex
+
+SITEMAP = os.path.join(os.path.dirname(__file__), "courses_sitemap.xml")
+QUERIES_PER_SIZE = 500
+
+
+def synthetic_codes(n, seed=0):
+    """Real subjects from the sitemap, with numbers/cross-listings made up to reach n codes."""
+    with open(SITEMAP, encoding="utf-8") as f:
+        real = re.findall(r'/courses/([^<]+)</loc>', f.read())
+    subjects = sorted({s for code in real for s in code.split('_') if not s.isdigit()})
+    rng = random.Random(seed)
+    codes = list(real[:n])
+    seen = set(codes)
+    while len(codes) < n:
+        subj = '_'.join(rng.sample(subjects, rng.choice((1, 1, 1, 2, 3))))
+        code = f"{subj}_{rng.randint(100, 99999)}"
+        if code not in seen:
+            seen.add(code)
+            codes.append(code)
+    return codes
+
+
+def make_queries(codes, rng):
+    queries = []
+    for _ in range(QUERIES_PER_SIZE):
+        code = rng.choice(codes)
+        subj, num = code.rsplit('_', 1)
+        first = subj.split('_')[0]
+        queries.append(rng.choice([
+            code,                                # exact
+            f"{first} {num}",                    # "COMPSCI 577"
+            first[:3],                           # prefix while typing
+            f"{first[0]}{first[-1]} {num[:2]}",  # abbreviation-ish "CI 57"
+            first[:-1] + " " + num,              # typo'd subject
+        ]))
+    return queries
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def run(size):
+    rng = random.Random(size)
+    codes = synthetic_codes(size)
+    index = CourseSearchIndex()
+    start = time.perf_counter()
+    index.rebuild((i, c, '', '') for i, c in enumerate(codes))
+    build_s = time.perf_counter() - start
+
+    timings = []
+    for q in make_queries(codes, rng):
+        t0 = time.perf_counter()
+        index.search(q, page=1, per_page=25)
+        timings.append((time.perf_counter() - t0) * 1000)
+
+    print(f"{size:>9} courses | build {build_s:6.2f}s | "
+          f"p50 {percentile(timings, 50):7.2f}ms  p95 {percentile(timings, 95):7.2f}ms  "
+          f"p99 {percentile(timings, 99):7.2f}ms")
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for size in sizes:
+        run(size)
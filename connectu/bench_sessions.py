@@ -0,0 +1,97 @@
+# bench_sessions.py
+# Session read/write latency and on-disk footprint after N logins, for the
+# SQLite (WAL) store with and without the LRU tier, and for the old
+# Flask-Session filesystem layout (pickle file per session) when cachelib is
+# installed.
+# Usage: python bench_sessions.py [logins]   (default: 100000)
+import os
+import random
+import secrets
+import sys
+import tempfile
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from session_store import SQLiteSessionBackend, LRUSessionCache
+
+READS = 20_000
+serializer = TaggedJSONSerializer()
+
+
+def login_payload(i):
+    return {"user": {"auth0_id": f"google-oauth2|{10**17 + i}", "name": f"Student {i}",
+                     "email": f"student{i}@wisc.edu"}}
+
+
+def dir_size(path):
+    # Allocated blocks, not apparent size: a 200-byte session file still takes a whole block
+    return sum(os.stat(os.path.join(root, f)).st_blocks * 512 for root, _, files in os.walk(path) for f in files)
+
+
+def pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1e6
+
+
+def report(name, writes, reads, footprint):
+    print(f"{name:<22} write p50 {pct(writes, 50):7.1f}us p99 {pct(writes, 99):8.1f}us | "
+          f"read p50 {pct(reads, 50):6.1f}us p99 {pct(reads, 99):7.1f}us | disk {footprint / 1e6:7.1f} MB")
+
+
+def bench_store(name, tmp, n, lru_size):
+    store = LRUSessionCache(SQLiteSessionBackend(os.path.join(tmp, "sessions.db"), sweep_interval=0), lru_size)
+    sids, versions, writes = [], [], []
+    for i in range(n):
+        sid = secrets.token_urlsafe(32)
+        data = serializer.dumps(login_payload(i))
+        t0 = time.perf_counter()
+        version, _ = store.set(sid, data, 7 * 24 * 3600)
+        writes.append(time.perf_counter() - t0)
+        sids.append(sid)
+        versions.append(version)
+
+    # Skewed reads: recently active users are far more likely to come back
+    rng = random.Random(0)
+    reads = []
+    for _ in range(READS):
+        i = n - 1 - min(int(rng.expovariate(1 / 2000)), n - 1)
+        t0 = time.perf_counter()
+        serializer.loads(store.get(sids[i], versions[i])[0])
+        reads.append(time.perf_counter() - t0)
+    store.backend._conn().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    report(name, writes, reads, dir_size(tmp))
+
+
+def bench_filesystem(tmp, n):
+    try:
+        from cachelib import FileSystemCache
+    except ImportError:
+        print("filesystem (old)       skipped: cachelib not installed")
+        return
+    cache = FileSystemCache(tmp, threshold=0)
+    sids, writes = [], []
+    for i in range(n):
+        sid = secrets.token_hex(16)
+        t0 = time.perf_counter()
+        cache.set(sid, login_payload(i), timeout=7 * 24 * 3600)
+        writes.append(time.perf_counter() - t0)
+        sids.append(sid)
+    rng = random.Random(0)
+    reads = []
+    for _ in range(READS):
+        sid = sids[n - 1 - min(int(rng.expovariate(1 / 2000)), n - 1)]
+        t0 = time.perf_counter()
+        cache.get(sid)
+        reads.append(time.perf_counter() - t0)
+    report("filesystem (old)", writes, reads, dir_size(tmp))
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"{n} logins, {READS} reads")
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_store("sqlite wal", tmp, n, lru_size=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_store("sqlite wal + lru", tmp, n, lru_size=10_000)
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_filesystem(tmp, n)
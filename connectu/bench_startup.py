@@ -0,0 +1,61 @@
+# bench_startup.py
+# Worker boot cost: wall time to import the app module, build the app with
+# create_app() and serve a first request, each in a fresh interpreter, plus
+# the slowest imports reported by `python -X importtime`.
+# Usage: python bench_startup.py [runs]   (default: 5)
+import statistics
+import subprocess
+import sys
+
+BOOT = """
+import time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+app = create_app()
+t2 = time.perf_counter()
+app.test_client().get('/')
+t3 = time.perf_counter()
+print(t1 - t0, t2 - t1, t3 - t2)
+"""
+
+
+def boot_times(runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", BOOT], capture_output=True, text=True, check=True).stdout
+        samples.append([float(x) * 1000 for x in out.split()[-3:]])
+    return [statistics.median(col) for col in zip(*samples)]
+
+
+def slowest_imports(n=10):
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "from app import create_app; create_app()"],
+                         capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in err.splitlines():
+        # "import time: <self us> | <cumulative us> | <two spaces per nesting level><module>"
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2][1:]
+        if not name.startswith(" "):  # top level only; nested imports are inside these totals
+            rows.append((int(parts[1]), name))
+    return sorted(rows, reverse=True)[:n], sum(us for us, _ in rows)
+
+
+def main(runs):
+    imports, create, first = boot_times(runs)
+    print(f"median of {runs} fresh processes: import {imports:.0f}ms | create_app {create:.0f}ms | "
+          f"first request {first:.0f}ms | total {imports + create + first:.0f}ms")
+    top, total = slowest_imports()
+    print(f"-X importtime, top-level modules: {total / 1000:.0f}ms total")
+    for us, name in top:
+        print(f"  {us / 1000:7.1f}ms  {name}")
+    loaded = subprocess.run([sys.executable, "-c", "import sys; from app import create_app; create_app(); "
+                             "print(any(m.startswith('authlib') for m in sys.modules))"],
+                            capture_output=True, text=True, check=True).stdout.strip()
+    print(f"authlib imported before first login: {loaded}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,147 @@
+# bench_suite.py
+# Latency percentiles and SQL query counts for the hot routes, on a fresh
+# scratch database filled by synthetic_data.py (same seed -> same data), via
+# the Flask test client, logged in as users who have conversations.
+#
+#   python bench_suite.py                          run and print
+#   python bench_suite.py --save bench_baseline.json
+#   python bench_suite.py --compare bench_baseline.json   exit 1 on regressions
+#
+# The page cache is off unless --page-cache, so the numbers reflect the
+# queries and rendering each route actually does.
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from app import create_app
+from models import db, Conversation
+from migrations import upgrade
+from synthetic_data import generate, DEFAULT_SIZES
+from course_search import build_course_index
+from page_cache import page_cache
+from query_counter import count_queries
+
+REGRESSION_RATIO = 1.25  # p50 this much slower than the baseline counts as a regression
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def pick_urls(rng, summary, viewers, n):
+    """(route, url, viewer auth0_id) triples; targets follow the data's popularity skew."""
+    popular = summary["popular_courses"]
+    subjects = sorted({code.split("_")[0] for code in popular[:200]})
+    plan = []
+    for _ in range(n):
+        viewer, partner = rng.choice(viewers)
+        auth0_id = f"synthetic|{viewer}"
+        code = popular[min(int(rng.paretovariate(1.2)) - 1, len(popular) - 1)]
+        plan += [
+            ("/search", f"/search?q={rng.choice(subjects)}", auth0_id),
+            ("/course/<code>", f"/course/{code}", auth0_id),
+            ("/messages", "/messages", auth0_id),
+            ("/messages/<id>", f"/messages/{partner}", auth0_id),
+            ("/profile/<id>", f"/profile/{rng.randrange(1, summary['counts']['users'] + 1)}", auth0_id),
+        ]
+    return plan
+
+
+def run(requests_per_route, seed, use_page_cache):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "bench.db"),
+            "SESSION_SQLITE_PATH": os.path.join(tmp, "sessions.db"),
+            "DOCUMENT_STORE": os.path.join(tmp, "documents"),
+        })
+        with app.app_context():
+            db.create_all()
+            upgrade(db.engine)
+            summary = generate(app.config["COURSES_SITEMAP"], seed=seed)
+            build_course_index()
+            viewers = [(c.low_user_id, c.high_user_id) for c in Conversation.query.limit(500)]
+            engine = db.engine
+        print(f"data: {summary['counts']} loaded in {summary['seconds']:.1f}s "
+              f"({summary['rows_per_sec']:.0f} rows/s)", file=sys.stderr)
+
+        if not use_page_cache:
+            page_cache.max_bytes = 0
+        rng = random.Random(seed)
+        client = app.test_client()
+        current = None
+        samples = {}
+        for route, url, auth0_id in pick_urls(rng, summary, viewers, requests_per_route):
+            if auth0_id != current:
+                with client.session_transaction() as s:
+                    s["user"] = {"auth0_id": auth0_id, "name": auth0_id, "email": "bench@example.edu"}
+                current = auth0_id
+            with count_queries(engine) as counter:
+                start = time.perf_counter()
+                r = client.get(url)
+                elapsed = (time.perf_counter() - start) * 1000
+            assert r.status_code == 200, (url, r.status_code)
+            samples.setdefault(route, []).append((elapsed, counter.count))
+
+    results = {}
+    for route, rows in samples.items():
+        times = sorted(t for t, _ in rows)
+        queries = [q for _, q in rows]
+        results[route] = {
+            "p50_ms": round(percentile(times, 50), 2),
+            "p90_ms": round(percentile(times, 90), 2),
+            "p99_ms": round(percentile(times, 99), 2),
+            "mean_queries": round(statistics.mean(queries), 2),
+            "max_queries": max(queries),
+        }
+    return {"seed": seed, "requests_per_route": requests_per_route, "page_cache": use_page_cache,
+            "sizes": DEFAULT_SIZES, "routes": results}
+
+
+def report(result, baseline=None):
+    regressions = []
+    print(f"{'route':16} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'queries':>8} {'max q':>6}")
+    for route, r in result["routes"].items():
+        line = (f"{route:16} {r['p50_ms']:8.2f} {r['p90_ms']:8.2f} {r['p99_ms']:8.2f} "
+                f"{r['mean_queries']:8.2f} {r['max_queries']:6d}")
+        base = (baseline or {}).get("routes", {}).get(route)
+        if base:
+            line += f"   vs baseline p50 {base['p50_ms']:.2f}ms, max q {base['max_queries']}"
+            if r["p50_ms"] > base["p50_ms"] * REGRESSION_RATIO:
+                regressions.append(f"{route}: p50 {base['p50_ms']:.2f} -> {r['p50_ms']:.2f} ms")
+            if r["max_queries"] > base["max_queries"]:
+                regressions.append(f"{route}: max queries {base['max_queries']} -> {r['max_queries']}")
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-route benchmark on synthetic data")
+    parser.add_argument("-n", "--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--page-cache", action="store_true", help="leave the rendered-page cache on")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    args = parser.parse_args()
+
+    result = run(args.requests, args.seed, args.page_cache)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    regressions = report(result, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+    if regressions:
+        print("REGRESSIONS:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# bench_writes.py
+# Write throughput with N processes (like N gunicorn workers) posting
+# questions to course_detail while R processes read the same course page,
+# on a scratch SQLite database in rollback-journal mode vs WAL, and on
+# Postgres when BENCH_DATABASE_URL is set (use a throwaway database).
+# Usage: python bench_writes.py [seconds] [posters...]   (default: 5 1 4 8)
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+READERS = 2
+
+
+def worker(app, kind, seconds, results):
+    from models import db, User, Course
+
+    with app.app_context():
+        db.engine.dispose(close=False)  # don't share the parent's connections across fork()
+        user = User.query.filter_by(auth0_id="bench|writer").first()
+        code = Course.query.filter_by(course_code="BENCH_WRITE_100").first().course_code
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s["user"] = {"auth0_id": user.auth0_id, "name": "bench", "email": "bench@example.com"}
+
+    ok = failed = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if kind == "post":
+            r = client.post(f"/course/{code}", data={"question": "1", "content": f"q{os.getpid()}-{ok}"})
+            good = r.status_code == 302
+        else:
+            r = client.get(f"/course/{code}")
+            good = r.status_code == 200
+        ok, failed = (ok + 1, failed) if good else (ok, failed + 1)
+    results.put((kind, ok, failed))
+
+
+def child(seconds, posters):
+    from app import create_app
+    from models import db, User, Course
+    from migrations import upgrade
+
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        upgrade(db.engine)
+        if not User.query.filter_by(auth0_id="bench|writer").first():
+            db.session.add_all([User(auth0_id="bench|writer", username="bench"),
+                                Course(course_code="BENCH_WRITE_100")])
+            db.session.commit()
+        db.engine.dispose()
+
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(app, "post", seconds, results)) for _ in range(posters)]
+    procs += [ctx.Process(target=worker, args=(app, "read", seconds, results)) for _ in range(READERS)]
+    for p in procs:
+        p.start()
+    totals = {"post": [0, 0], "read": [0, 0]}
+    for _ in procs:
+        kind, ok, failed = results.get()
+        totals[kind][0] += ok
+        totals[kind][1] += failed
+    for p in procs:
+        p.join()
+    (posts, post_errors), (reads, read_errors) = totals["post"], totals["read"]
+    print(f"{posters:2d} posters | {posts / seconds:7.1f} writes/s ({post_errors} failed) | "
+          f"{reads / seconds:7.1f} reads/s ({read_errors} failed)")
+
+
+def main(seconds, poster_counts):
+    modes = [("sqlite, rollback journal", {"SQLITE_WAL": "0"}), ("sqlite, WAL", {"SQLITE_WAL": "1"})]
+    if os.getenv("BENCH_DATABASE_URL"):
+        modes.append(("server database", {"DATABASE_URL": os.environ["BENCH_DATABASE_URL"]}))
+
+    for label, env in modes:
+        print(f"--- {label} ---")
+        for posters in poster_counts:
+            with tempfile.TemporaryDirectory() as tmp:
+                # Fresh file per run: a database that was ever put in WAL mode stays in it
+                child_env = dict(os.environ, DATABASE_URL="sqlite:///" + os.path.join(tmp, "bench.db"))
+                child_env.update(env)
+                out = subprocess.run([sys.executable, __file__, "--child", str(seconds), str(posters)],
+                                     env=child_env, check=True, capture_output=True, text=True).stdout
+                print(out.strip().splitlines()[-1])  # skip the migration log
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        child(int(sys.argv[2]), int(sys.argv[3]))
+    else:
+        args = [int(a) for a in sys.argv[1:]]
+        main(args[0] if args else 5, args[1:] or [1, 4, 8])
@@ -0,0 +1,121 @@
+# check_course_queries.py
+# Seeds a throwaway DB and fails if the course page stops being a fixed
+# number of queries: the query layer on its own, and the whole
+# /course/<code> request (view and template) through the test client.
+# Run: python check_course_queries.py, or python -m pytest
+import os
+import tempfile
+
+from flask import Flask
+from models import db, User, Course, Question, Answer, UserCourse, Document
+from course_queries import load_course, load_questions
+from query_counter import assert_max_queries
+
+# course + enrollments(+users) + documents(+users), then questions(+authors) + answers(+authors)
+COURSE_QUERIES = 3
+QUESTION_QUERIES = 2
+# A page-cache miss: the global cache version before the view, the loaders,
+# then the rendered page's tag versions (see page_cache.py)
+PAGE_QUERIES = 1 + COURSE_QUERIES + QUESTION_QUERIES + 1
+CURRENT_USER_QUERIES = 1
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(n_users=40, n_questions=60, answers_per_question=5):
+    users = [User(auth0_id=f"seed|{i}", username=f"user{i}", email=f"u{i}@example.com") for i in range(n_users)]
+    course = Course(course_code="COMPSCI_577", title="Algorithms", description="")
+    db.session.add_all(users + [course])
+    db.session.flush()
+    for i, u in enumerate(users):
+        db.session.add(UserCourse(user_id=u.id, course_id=course.id, status="Student", term="Fall 2025"))
+        db.session.add(Document(filename=f"notes{i}.pdf", filepath=f"/tmp/notes{i}.pdf", course_id=course.id, user_id=u.id))
+    for i in range(n_questions):
+        q = Question(course_id=course.id, user_id=users[i % n_users].id, content=f"Question {i}")
+        db.session.add(q)
+        db.session.flush()
+        for j in range(answers_per_question):
+            db.session.add(Answer(question_id=q.id, user_id=users[(i + j) % n_users].id, content=f"Answer {j}"))
+    db.session.commit()
+    return course.course_code
+
+
+def check(app):
+    with app.app_context():
+        db.create_all()
+        code = seed()
+        db.session.expunge_all()
+
+        # Loading and then touching every relationship the template reads must not lazy-load
+        with assert_max_queries(db.engine, COURSE_QUERIES + QUESTION_QUERIES) as counter:
+            course = load_course(code)
+            questions, cursor = load_questions(course.id)
+            for q in questions:
+                q.user.username
+                for a in q.answers:
+                    a.user.username
+            for uc in course.students:
+                uc.user.username
+            for doc in course.documents:
+                doc.user.username
+        print(f"first page: {counter.count} queries, {len(questions)} questions")
+
+        seen = {q.id for q in questions}
+        while cursor:
+            with assert_max_queries(db.engine, QUESTION_QUERIES):
+                questions, cursor = load_questions(course.id, before=cursor)
+                for q in questions:
+                    [a.user.username for a in q.answers]
+            assert not seen & {q.id for q in questions}, "keyset pages overlap"
+            seen |= {q.id for q in questions}
+        assert len(seen) == Question.query.count(), "keyset pagination skipped rows"
+        print(f"paged through {len(seen)} questions without overlap")
+
+
+def check_page(tmp_dir):
+    from app import create_app
+    from page_cache import page_cache
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp_dir, "check.db"),
+        "SESSION_SQLITE_PATH": os.path.join(tmp_dir, "sessions.db"),
+        "DOCUMENT_STORE": os.path.join(tmp_dir, "documents"),
+    })
+    with app.app_context():
+        db.create_all()
+        code = seed()
+        auth0_id = User.query.first().auth0_id
+        db.session.remove()
+
+        client = app.test_client()
+        for signed_in, limit in ((False, PAGE_QUERIES), (True, PAGE_QUERIES + CURRENT_USER_QUERIES)):
+            if signed_in:
+                with client.session_transaction() as s:
+                    s["user"] = {"auth0_id": auth0_id, "name": "seed", "email": "seed@example.com"}
+            page_cache.clear()  # process-wide: count a full render, not a hit
+            with assert_max_queries(db.engine, limit) as counter:
+                response = client.get(f"/course/{code}")
+            assert response.status_code == 200, response.status_code
+            print(f"/course/{code} {'signed in' if signed_in else 'anonymous'}: {counter.count} queries")
+
+
+def test_course_queries():
+    check(make_app())
+
+
+def test_course_page():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        check_page(tmp_dir)
+
+
+if __name__ == "__main__":
+    check(make_app())
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        check_page(tmp_dir)
+    print("OK")
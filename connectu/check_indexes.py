@@ -0,0 +1,130 @@
+# check_indexes.py
+# Builds the schema the app started from (before migration 1), runs upgrade()
+# on it, and fails if any index the models declare is missing or different,
+# or if a hot query's EXPLAIN QUERY PLAN falls back to a full table scan.
+# Starting from the old schema, not create_all(), is what exercises the
+# migrations' own DDL.
+# Run: python check_indexes.py, or python -m pytest (test_indexes)
+from flask import Flask
+from sqlalchemy import (MetaData, Table, Column, Integer, String, Text, DateTime, LargeBinary, ForeignKey,
+                        inspect, text)
+from models import db, User, Conversation, DirectMessage, Question, Answer, Document, UserCourse
+from migrations import upgrade
+from conversations import inbox_query
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def baseline_schema():
+    """The tables as they were before migration 1: no secondary indexes, no later tables or columns."""
+    m = MetaData()
+    Table("user", m, Column("id", Integer, primary_key=True), Column("auth0_id", String(50), unique=True),
+          Column("username", String(80)), Column("email", String(120)), Column("bio", Text),
+          Column("available_times", LargeBinary), Column("personal_links", Text), Column("avatar_url", String(200)))
+    Table("direct_message", m, Column("id", Integer, primary_key=True),
+          Column("sender_id", Integer, ForeignKey("user.id"), nullable=False),
+          Column("recipient_id", Integer, ForeignKey("user.id"), nullable=False),
+          Column("content", Text, nullable=False), Column("timestamp", DateTime))
+    Table("course", m, Column("id", Integer, primary_key=True),
+          Column("course_code", String(200), unique=True, nullable=False),
+          Column("title", String(200)), Column("description", Text))
+    Table("question", m, Column("id", Integer, primary_key=True),
+          Column("course_id", Integer, ForeignKey("course.id"), nullable=False),
+          Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+          Column("content", Text, nullable=False), Column("timestamp", DateTime))
+    Table("answer", m, Column("id", Integer, primary_key=True),
+          Column("question_id", Integer, ForeignKey("question.id"), nullable=False),
+          Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+          Column("content", Text, nullable=False), Column("timestamp", DateTime))
+    Table("user_courses", m, Column("user_id", Integer, ForeignKey("user.id"), primary_key=True),
+          Column("course_id", Integer, ForeignKey("course.id"), primary_key=True),
+          Column("status", String(20), nullable=False), Column("term", String(20), nullable=False))
+    Table("document", m, Column("id", Integer, primary_key=True), Column("filename", String(200), nullable=False),
+          Column("filepath", String(300), nullable=False),
+          Column("course_id", Integer, ForeignKey("course.id"), nullable=False),
+          Column("user_id", Integer, ForeignKey("user.id"), nullable=False), Column("uploaded_at", DateTime))
+    return m
+
+
+def index_differences(conn):
+    """Model-declared indexes the database lacks or has on other columns, as "table.index" strings."""
+    inspector = inspect(conn)
+    problems = []
+    for table in db.metadata.sorted_tables:
+        if not table.indexes:
+            continue
+        actual = {ix["name"]: ix["column_names"] for ix in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            expected = [c.name for c in index.columns]
+            if index.name not in actual:
+                problems.append(f"{table.name}.{index.name} missing")
+            elif actual[index.name] != expected:
+                problems.append(f"{table.name}.{index.name} on {actual[index.name]}, models say {expected}")
+    return problems
+
+
+def hot_queries():
+    """(name, query) for each query issued by course_detail, direct_message and inbox."""
+    me, them, course_id = 1, 2, 1
+    return [
+        ("course_detail questions page", Question.query
+            .filter(Question.course_id == course_id)
+            .order_by(Question.timestamp.desc(), Question.id.desc()).limit(21)),
+        ("course_detail answers", Answer.query.filter(Answer.question_id.in_([1, 2, 3]))),
+        ("course_detail documents", Document.query.filter(Document.course_id.in_([course_id]))),
+        ("course_detail enrollments", UserCourse.query.filter(UserCourse.course_id.in_([course_id]))),
+        ("direct_message conversation", Conversation.query.filter_by(low_user_id=me, high_user_id=them)),
+        ("direct_message history page", DirectMessage.query
+            .filter(DirectMessage.conversation_id == 1)
+            .order_by(DirectMessage.timestamp.desc(), DirectMessage.id.desc()).limit(51)),
+        ("inbox conversations", inbox_query(me)
+            .order_by(Conversation.last_message_at.desc(), Conversation.id.desc()).limit(21)),
+        ("current user", User.query.filter_by(auth0_id="auth0|x")),
+    ]
+
+
+def plan_for(query):
+    stmt = query.statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+    rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {stmt}")).all()
+    return [row[-1] for row in rows]
+
+
+def uses_index(plan):
+    # "SCAN question" is a full scan; "SCAN ... USING INDEX" / "SEARCH ..." are fine
+    return not any(step.startswith("SCAN") and "INDEX" not in step for step in plan)
+
+
+def check(app):
+    failures = []
+    with app.app_context():
+        baseline_schema().create_all(db.engine)
+        upgrade(db.engine)
+        with db.engine.connect() as conn:
+            problems = index_differences(conn)
+        for problem in problems:
+            print(f"INDEX {problem}")
+        assert not problems, f"Migrated schema doesn't match the models' indexes: {', '.join(problems)}"
+
+        db.session.execute(text("ANALYZE"))
+        for name, query in hot_queries():
+            plan = plan_for(query)
+            ok = uses_index(plan)
+            print(f"{'ok  ' if ok else 'SCAN'} {name}: {' | '.join(plan)}")
+            if not ok:
+                failures.append(name)
+    assert not failures, f"Full table scans in: {', '.join(failures)}"
+
+
+def test_indexes():
+    check(make_app())
+
+
+if __name__ == "__main__":
+    check(make_app())
+    print("OK")
@@ -0,0 +1,137 @@
+# cli.py
+# Maintenance commands, run through the app factory:
+#   flask --app app courses import [--sitemap PATH] [--force]
+#   flask --app app courses reconcile
+#   flask --app app search rebuild
+#   flask --app app backup snapshot DEST.db
+#   flask --app app backup export DIR [--full]
+#   flask --app app backup restore DIR DEST.db [--workers N]
+#   flask --app app assets build
+import hashlib
+import os
+import time
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from models import db, ImportState
+from populate_courses import populate_courses
+import backup
+import post_search
+import static_assets
+from course_stats import reconcile
+
+courses_cli = AppGroup('courses', help="Course catalogue maintenance.")
+search_cli = AppGroup('search', help="Full-text search index maintenance.")
+backup_cli = AppGroup('backup', help="Database snapshots, exports and restores (see backup.py).")
+assets_cli = AppGroup('assets', help="Fingerprinted static files (see static_assets.py).")
+
+
+def file_fingerprint(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+@courses_cli.command('import')
+@click.option('--sitemap', type=click.Path(exists=True, dir_okay=False),
+              help="Sitemap XML to import (default: COURSES_SITEMAP).")
+@click.option('--force', is_flag=True, help="Import even if the sitemap is unchanged since the last import.")
+def import_courses(sitemap, force):
+    """Import courses from the sitemap, if it changed since the last import."""
+    path = sitemap or current_app.config['COURSES_SITEMAP']
+    fingerprint = file_fingerprint(path)
+    state = db.session.get(ImportState, 'courses_sitemap')
+    if state and state.fingerprint == fingerprint and not force:
+        click.echo(f"Sitemap unchanged since {state.imported_at:%Y-%m-%d %H:%M}; nothing to do (use --force).")
+        return
+
+    populate_courses(current_app, path)
+
+    state = state or ImportState(source='courses_sitemap')
+    state.fingerprint = fingerprint
+    state.imported_at = datetime.utcnow()
+    db.session.add(state)
+    db.session.commit()
+
+
+@courses_cli.command('reconcile')
+def reconcile_counters():
+    """Recompute the per-course activity counters and repair any drift."""
+    with db.engine.begin() as conn:
+        repaired = reconcile(conn)
+    drifted = {counter: n for counter, n in repaired.items() if n}
+    if not drifted:
+        click.echo("All course counters match.")
+    for counter, n in drifted.items():
+        click.echo(f"Repaired {counter} on {n} course{'s' if n != 1 else ''}.")
+
+
+@search_cli.command('rebuild')
+def rebuild_search():
+    """Rebuild the question/answer/document full-text index from scratch."""
+    with db.engine.begin() as conn:
+        if not post_search.is_supported(conn):
+            raise click.ClickException("Full-text search needs SQLite (FTS5).")
+        started = time.perf_counter()
+        rows = post_search.rebuild(conn)
+    click.echo(f"Indexed {rows} posts in {time.perf_counter() - started:.1f}s.")
+
+
+@backup_cli.command('snapshot')
+@click.argument('dest', type=click.Path(dir_okay=False))
+@click.option('--pages', default=backup.PAGES_PER_STEP, show_default=True, help="Pages copied per step.")
+def snapshot_database(dest, pages):
+    """Copy the live SQLite database to DEST without blocking the app."""
+    url = db.engine.url
+    if url.get_backend_name() != 'sqlite':
+        raise click.ClickException("snapshot copies SQLite files; use pg_dump, or `backup export`.")
+    stats = backup.snapshot(url.database, dest, pages=pages)
+    mb = stats['bytes'] / 2**20
+    click.echo(f"Copied {mb:.0f} MB in {stats['seconds']:.1f}s ({mb / stats['seconds']:.0f} MB/s, "
+               f"{stats['restarts']} restarts) to {dest}.")
+
+
+@backup_cli.command('export')
+@click.argument('out_dir', type=click.Path(file_okay=False))
+@click.option('--full', is_flag=True, help="Export every row, not just what changed since the last run.")
+def export_database(out_dir, full):
+    """Write the next (incremental) NDJSON export generation to OUT_DIR."""
+    generation = backup.export(db.engine, out_dir, full=full)
+    rows = sum(t['rows'] for t in generation['tables'].values())
+    kind = "full" if generation['full'] else "incremental"
+    click.echo(f"Generation {generation['id']} ({kind}): {rows} rows, "
+               f"{generation['bytes'] / 2**20:.1f} MB in {generation['seconds']:.1f}s.")
+
+
+@backup_cli.command('restore')
+@click.argument('export_dir', type=click.Path(exists=True, file_okay=False))
+@click.argument('dest', type=click.Path(dir_okay=False))
+@click.option('--workers', type=int, help="Decoding processes (default: one per CPU).")
+def restore_database(export_dir, dest, workers):
+    """Build a fresh SQLite database at DEST from an export."""
+    try:
+        stats = backup.restore(export_dir, dest, workers=workers)
+    except backup.BackupError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Restored {stats['rows']} rows in {stats['seconds']:.1f}s "
+               f"({stats['rows'] / stats['seconds']:.0f} rows/s) to {dest}.")
+
+
+@assets_cli.command('build')
+def build_assets():
+    """Hash, precompress and resize static/ into ASSET_DIR. Restart the app afterwards."""
+    started = time.perf_counter()
+    manifest = static_assets.build(current_app.static_folder, current_app.config['ASSET_DIR'])
+    source = sum(os.path.getsize(os.path.join(current_app.static_folder, name)) for name in manifest['files'])
+    built = sum(entry['bytes'] for entry in manifest['files'].values())
+    click.echo(f"Built {len(manifest['files'])} files ({source / 1024:.0f} KB -> {built / 1024:.0f} KB) and "
+               f"{sum(len(v) for v in manifest['variants'].values())} avatar sizes "
+               f"in {time.perf_counter() - started:.1f}s.")
+    if not manifest['pillow']:
+        click.echo("Pillow isn't installed: images copied as-is, no avatar variants.")
+    if not manifest['brotli']:
+        click.echo("brotli isn't installed: gzip only.")
@@ -0,0 +1,106 @@
+# conversations.py
+from sqlalchemy import case, or_
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Conversation, DirectMessage
+from pagination import page_before, before_clause, make_cursor
+
+MESSAGES_PER_PAGE = 50
+CONVERSATIONS_PER_PAGE = 20
+SNIPPET_LENGTH = 140
+
+
+def find_conversation(user_a_id, user_b_id):
+    low, high = Conversation.key(user_a_id, user_b_id)
+    return Conversation.query.filter_by(low_user_id=low, high_user_id=high).first()
+
+
+def get_or_create_conversation(user_a_id, user_b_id):
+    conversation = find_conversation(user_a_id, user_b_id)
+    if conversation:
+        return conversation
+    low, high = Conversation.key(user_a_id, user_b_id)
+    try:
+        with db.session.begin_nested():
+            conversation = Conversation(low_user_id=low, high_user_id=high)
+            db.session.add(conversation)
+    except IntegrityError:
+        # Another request created the pair first
+        conversation = find_conversation(user_a_id, user_b_id)
+    return conversation
+
+
+def send_message(sender_id, recipient_id, content):
+    """
+    Insert a DirectMessage and update its conversation's inbox summary
+    (last message, snippet, recipient's unread count) in the same transaction.
+    The caller commits.
+    """
+    conversation = get_or_create_conversation(sender_id, recipient_id)
+    msg = DirectMessage(conversation_id=conversation.id, sender_id=sender_id,
+                        recipient_id=recipient_id, content=content)
+    db.session.add(msg)
+    db.session.flush()
+
+    summary = {
+        Conversation.last_message_id: msg.id,
+        Conversation.last_message_at: msg.timestamp,
+        Conversation.last_snippet: content[:SNIPPET_LENGTH],
+    }
+    if sender_id != recipient_id:
+        # Increment in SQL so concurrent senders don't lose counts
+        unread = Conversation.high_unread if recipient_id == conversation.high_user_id else Conversation.low_unread
+        summary[unread] = unread + 1
+    Conversation.query.filter_by(id=conversation.id).update(summary, synchronize_session=False)
+    db.session.expire(conversation)
+    return msg
+
+
+def mark_read(conversation, user_id):
+    if not conversation.unread_for(user_id):
+        return
+    unread = Conversation.low_unread if user_id == conversation.low_user_id else Conversation.high_unread
+    Conversation.query.filter_by(id=conversation.id).update({unread: 0}, synchronize_session=False)
+    db.session.commit()
+
+
+def load_messages(conversation_id, before=None, limit=MESSAGES_PER_PAGE):
+    """
+    The `limit` messages just before the `before` cursor (latest messages when
+    no cursor), oldest first for display. Returns (messages, older_cursor).
+    """
+    query = DirectMessage.query.filter(DirectMessage.conversation_id == conversation_id)
+    rows, older_cursor = page_before(query, DirectMessage, before, limit)
+    rows.reverse()
+    return rows, older_cursor
+
+
+def inbox_query(user_id):
+    """(Conversation, contact User) rows for every conversation `user_id` has messages in."""
+    contact_id = case((Conversation.low_user_id == user_id, Conversation.high_user_id),
+                      else_=Conversation.low_user_id)
+    return (
+        db.session.query(Conversation, User)
+        .join(User, User.id == contact_id)
+        .filter(or_(Conversation.low_user_id == user_id, Conversation.high_user_id == user_id))
+        .filter(Conversation.last_message_at.isnot(None))
+    )
+
+
+def load_inbox(user_id, before=None, limit=CONVERSATIONS_PER_PAGE):
+    """
+    One page of `user_id`'s conversations with their other participant, most
+    recent first, in a single query over the conversation summaries (cost
+    does not grow with message volume). Returns ([(conversation, contact)], next_cursor).
+    """
+    query = inbox_query(user_id)
+    clause = before_clause(Conversation.last_message_at, Conversation.id, before)
+    if clause is not None:
+        query = query.filter(clause)
+    rows = (query.order_by(Conversation.last_message_at.desc(), Conversation.id.desc())
+            .limit(limit + 1).all())
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1].Conversation
+        next_cursor = make_cursor(last.last_message_at, last.id)
+    return rows[:limit], next_cursor
@@ -0,0 +1,121 @@
+# course_queries.py
+from collections import Counter
+
+from sqlalchemy import and_, select, union
+from sqlalchemy.orm import joinedload, selectinload
+from models import db, User, Course, Question, Answer, UserCourse, Document, CourseEnrollmentCount
+from pagination import page_before
+from availability import from_mask
+
+QUESTIONS_PER_PAGE = 20
+
+
+def load_course(course_code):
+    """Course plus its enrollments (with users) and documents (with uploaders): 3 queries."""
+    return (
+        Course.query
+        .options(
+            selectinload(Course.students).joinedload(UserCourse.user),
+            selectinload(Course.documents).joinedload(Document.user),
+        )
+        .filter_by(course_code=course_code)
+        .first_or_404()
+    )
+
+
+def load_questions(course_id, before=None, limit=QUESTIONS_PER_PAGE):
+    """
+    One page of a course's questions, newest first, keyset-paginated on
+    (timestamp, id). Authors and answers (with their authors) are eager-loaded,
+    so rendering the page costs 2 queries no matter how many rows it shows.
+    Returns (questions, next_cursor).
+    """
+    query = (
+        Question.query
+        .options(
+            joinedload(Question.user),
+            selectinload(Question.answers).joinedload(Answer.user),
+        )
+        .filter(Question.course_id == course_id)
+    )
+    return page_before(query, Question, before, limit)
+
+
+def courses_showing_user(user_id):
+    """Ids of the courses whose page shows `user_id`'s name: joined, asked, answered or uploaded there."""
+    return db.session.scalars(union(
+        select(UserCourse.course_id).where(UserCourse.user_id == user_id),
+        select(Question.course_id).where(Question.user_id == user_id),
+        select(Question.course_id).join(Answer, Answer.question_id == Question.id).where(Answer.user_id == user_id),
+        select(Document.course_id).where(Document.user_id == user_id),
+    )).all()
+
+
+def load_enrollments(user_id):
+    """A user's UserCourse rows with their courses, in one query (profile pages)."""
+    return UserCourse.query.options(joinedload(UserCourse.course)).filter_by(user_id=user_id).all()
+
+
+def load_dashboard(user_id):
+    """
+    The home page: each course the user joined with its activity counters
+    (see course_stats.py), members by status and how many share the user's
+    term. One query however many courses, most recently active first.
+    """
+    rows = (db.session.query(UserCourse.status, UserCourse.term, Course, CourseEnrollmentCount)
+            .join(Course, Course.id == UserCourse.course_id)
+            .outerjoin(CourseEnrollmentCount, and_(CourseEnrollmentCount.course_id == Course.id,
+                                                   CourseEnrollmentCount.count > 0))
+            .filter(UserCourse.user_id == user_id)
+            .order_by(Course.last_activity_at.desc().nulls_last(), Course.course_code)
+            .all())
+    dashboard = {}
+    for status, term, course, breakdown in rows:
+        entry = dashboard.setdefault(course.id, {"course": course, "status": status, "term": term,
+                                                 "by_status": Counter(), "in_term": 0})
+        if breakdown is not None:
+            entry["by_status"][breakdown.status] += breakdown.count
+            if breakdown.term == term:
+                entry["in_term"] += breakdown.count
+    return list(dashboard.values())
+
+
+def shared_slots_expr(mask_col, my_mask):
+    """
+    SQL popcount(mask_col & my_mask): one ((mask >> i) & 1) term per bit set in
+    my_mask, so the database scores every member without handing rows to Python.
+    """
+    terms = [mask_col.op('>>')(i).op('&')(1) for i in range(my_mask.bit_length()) if my_mask >> i & 1]
+    return sum(terms[1:], terms[0])
+
+
+def find_study_partners(course_id, user, k=10):
+    """
+    The k members of a course whose weekly availability overlaps most with
+    `user`'s, scored and ranked inside a single query over the course's
+    enrollments.
+    """
+    if not user.availability_mask:
+        return []
+    shared = shared_slots_expr(User.availability_mask, user.availability_mask).label("shared")
+    rows = (
+        db.session.query(shared, User.availability_mask, User.id, User.username, UserCourse.status, UserCourse.term)
+        .join(UserCourse, UserCourse.user_id == User.id)
+        .filter(UserCourse.course_id == course_id, User.id != user.id,
+                User.availability_mask.op('&')(user.availability_mask) != 0)
+        .order_by(shared.desc(), User.id)
+        .limit(k)
+        .all()
+    )
+    return [
+        {
+            "user_id": user_id,
+            "username": username,
+            "status": status,
+            "term": term,
+            "shared_slots": shared_count,
+            "shared_times": {day: periods for day, periods in
+                             from_mask(mask & user.availability_mask).items() if periods},
+        }
+        for shared_count, mask, user_id, username, status, term in rows
+    ]
@@ -0,0 +1,282 @@
+# course_search.py
+import re
+import heapq
+import threading
+from bisect import bisect_left
+
+# Match weights, highest wins per query token
+EXACT_CODE = 4.0
+PREFIX_CODE = 3.0
+ABBREV_CODE = 2.0
+FUZZY_CODE = 1.5
+TITLE_WORD = 1.2
+DESCRIPTION_WORD = 1.0
+
+MIN_FUZZY_SIMILARITY = 0.4
+
+_token_re = re.compile(r'[A-Z]+|\d+')
+
+
+def tokenize(text):
+    """Split text into upper-cased alpha and numeric runs ("CS300" -> CS, 300)."""
+    if not text:
+        return []
+    return _token_re.findall(text.upper())
+
+
+def code_tokens(course_code):
+    """
+    Tokens indexed for a course code.
+    BMI_COMPSCI_567 -> BMI, COMPSCI, 567, BMICOMPSCI
+    """
+    parts = tokenize(course_code)
+    tokens = set(parts)
+    subjects = [p for p in parts if not p.isdigit()]
+    if len(subjects) > 1:
+        tokens.add(''.join(subjects))
+    return tokens
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def is_abbreviation(short, token):
+    """True if `short` is an in-order subsequence of `token` sharing its first letter (CS -> COMPSCI)."""
+    if len(short) < 2 or short.isdigit() or short[0] != token[0] or len(short) >= len(token):
+        return False
+    it = iter(token)
+    return all(ch in it for ch in short)
+
+
+def join_subject_tokens(tokens):
+    """Merge runs of adjacent alpha tokens: [COMP, SCI, 300] -> [COMPSCI, 300]."""
+    joined = []
+    for tok in tokens:
+        if joined and not tok.isdigit() and not joined[-1].isdigit():
+            joined[-1] += tok
+        else:
+            joined.append(tok)
+    return joined
+
+
+class SearchPage:
+    def __init__(self, ids, total, page, per_page):
+        self.ids = ids
+        self.total = total
+        self.page = page
+        self.per_page = per_page
+
+    @property
+    def pages(self):
+        return max(1, -(-self.total // self.per_page))
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+
+class CourseSearchIndex:
+    """
+    In-memory inverted index over course_code, title and description.
+    Prefix lookups go through a sorted vocabulary (bisect), so no query ever
+    scans the course table.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self.ready = False
+        self.version = None        # catalogue version the index was built from (see current_course_index)
+        self._docs = {}            # course_id -> (course_code, {token: weight})
+        self._postings = {}        # token -> {course_id: weight}
+        self._vocab = []           # sorted tokens, for prefix search
+        self._vocab_dirty = False
+        self._code_vocab = set()   # tokens that come from course codes (fuzzy candidates)
+        self._trigrams = {}        # trigram -> set of code tokens
+
+    # ===== Building / incremental updates =====
+    def rebuild(self, courses, version=None):
+        """Replace the index with `courses`, an iterable of (id, course_code, title, description)."""
+        with self._lock:
+            self._clear()
+            for course_id, course_code, title, description in courses:
+                self._add(course_id, course_code, title, description)
+            self.version = version
+            self.ready = True
+
+    def upsert(self, course_id, course_code, title='', description=''):
+        with self._lock:
+            self._remove(course_id)
+            self._add(course_id, course_code, title, description)
+
+    def remove(self, course_id):
+        with self._lock:
+            self._remove(course_id)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _add(self, course_id, course_code, title, description):
+        weights = {}
+        for tok in tokenize(description):
+            weights[tok] = DESCRIPTION_WORD
+        for tok in tokenize(title):
+            weights[tok] = TITLE_WORD
+        for tok in code_tokens(course_code):
+            weights[tok] = EXACT_CODE
+            if not tok.isdigit() and tok not in self._code_vocab:
+                self._code_vocab.add(tok)
+                for tri in trigrams(tok):
+                    self._trigrams.setdefault(tri, set()).add(tok)
+
+        for tok, weight in weights.items():
+            posting = self._postings.get(tok)
+            if posting is None:
+                posting = self._postings[tok] = {}
+                self._vocab_dirty = True
+            posting[course_id] = weight
+        self._docs[course_id] = (course_code, weights)
+
+    def _remove(self, course_id):
+        doc = self._docs.pop(course_id, None)
+        if doc is None:
+            return
+        for tok in doc[1]:
+            posting = self._postings.get(tok)
+            if posting is None:
+                continue
+            posting.pop(course_id, None)
+            if not posting:
+                del self._postings[tok]
+                self._vocab_dirty = True
+                if tok in self._code_vocab:
+                    self._code_vocab.discard(tok)
+                    for tri in trigrams(tok):
+                        bucket = self._trigrams.get(tri)
+                        if bucket:
+                            bucket.discard(tok)
+
+    def _sorted_vocab(self):
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+        return self._vocab
+
+    # ===== Querying =====
+    def _match_token(self, qtok):
+        """Return {course_id: score} for every course matching a single query token."""
+        scores = {}
+
+        def merge(posting, code_weight):
+            for course_id, weight in posting.items():
+                score = code_weight if weight == EXACT_CODE else weight
+                if score > scores.get(course_id, 0):
+                    scores[course_id] = score
+
+        exact = self._postings.get(qtok)
+        if exact:
+            merge(exact, EXACT_CODE)
+
+        vocab = self._sorted_vocab()
+        i = bisect_left(vocab, qtok)
+        while i < len(vocab) and vocab[i].startswith(qtok):
+            if vocab[i] != qtok:
+                merge(self._postings[vocab[i]], PREFIX_CODE)
+            i += 1
+
+        if not qtok.isdigit():
+            # "CS" -> COMPSCI, "COMPSC" typo -> COMPSCI
+            for tok in self._fuzzy_code_tokens(qtok):
+                weight = ABBREV_CODE if is_abbreviation(qtok, tok) else FUZZY_CODE
+                for course_id, w in self._postings[tok].items():
+                    if w == EXACT_CODE and weight > scores.get(course_id, 0):
+                        scores[course_id] = weight
+        return scores
+
+    def _fuzzy_code_tokens(self, qtok):
+        matches = {tok for tok in self._code_vocab
+                   if tok[0] == qtok[0] and is_abbreviation(qtok, tok)}
+        if len(qtok) >= 3:
+            q_tris = trigrams(qtok)
+            counts = {}
+            for tri in q_tris:
+                for tok in self._trigrams.get(tri, ()):
+                    counts[tok] = counts.get(tok, 0) + 1
+            for tok, shared in counts.items():
+                similarity = shared / (len(q_tris) + len(tok) + 1 - shared)
+                if similarity >= MIN_FUZZY_SIMILARITY:
+                    matches.add(tok)
+        matches.discard(qtok)
+        return matches
+
+    def _score(self, qtoks):
+        # Match rarest tokens first so the intersection shrinks quickly
+        per_token = sorted((self._match_token(t) for t in qtoks), key=len)
+        totals = dict(per_token[0])
+        for scores in per_token[1:]:
+            if not totals:
+                break
+            totals = {cid: s + scores[cid] for cid, s in totals.items() if cid in scores}
+        return totals
+
+    def search(self, query, page=1, per_page=25):
+        """
+        Ranked, paginated search. Every query token must match (exact, prefix,
+        abbreviation or fuzzy) for a course to be returned.
+        """
+        page = max(1, page)
+        qtoks = list(dict.fromkeys(tokenize(query)))
+        if not qtoks:
+            return SearchPage([], 0, page, per_page)
+
+        with self._lock:
+            totals = self._score(qtoks)
+            joined = join_subject_tokens(qtoks)
+            if not totals and joined != qtoks:
+                # "COMP SCI 300" -> COMPSCI 300
+                totals = self._score(joined)
+
+            end = page * per_page
+            ranked = heapq.nsmallest(
+                end, totals.items(),
+                key=lambda item: (-item[1], len(self._docs[item[0]][0]), self._docs[item[0]][0]),
+            )
+        ids = [course_id for course_id, _ in ranked[end - per_page:end]]
+        return SearchPage(ids, len(totals), page, per_page)
+
+
+course_index = CourseSearchIndex()
+
+# `flask courses import` runs in its own process and invalidate()s this page
+# cache tag with every batch it writes; its version in the cache_tag table is
+# how each web process learns that its index is out of date.
+CATALOGUE_TAG = "courses"
+
+
+def _catalogue_version():
+    from page_cache import tag_versions
+    return tag_versions([CATALOGUE_TAG])[CATALOGUE_TAG]
+
+
+def build_course_index(index=course_index):
+    """(Re)build the search index from the Course table. Needs an app context."""
+    from models import db, Course
+    version = _catalogue_version()  # before the rows: an import in between means one more rebuild, not a missed one
+    rows = db.session.query(Course.id, Course.course_code, Course.title, Course.description)
+    index.rebuild(rows.yield_per(5000), version)
+    return index
+
+
+def current_course_index(index=course_index):
+    """The search index, rebuilt first if it was never built or a course import has run since (one query)."""
+    if not index.ready or index.version != _catalogue_version():
+        build_course_index(index)
+    return index
@@ -0,0 +1,117 @@
+# course_stats.py
+# Denormalized per-course activity counters: Course.member_count,
+# question_count, answer_count, document_count and last_activity_at, plus a
+# CourseEnrollmentCount row per (course, status, term).
+#
+# The write routes call record_activity() / record_enrollment() before they
+# commit, so the counters change in the same transaction as the rows they
+# count, and the increments are done in SQL so concurrent writers don't lose
+# updates. reconcile() (`flask courses reconcile`) recomputes everything from
+# the source tables and repairs any drift.
+from datetime import datetime
+
+from sqlalchemy import func, null, select
+from models import db, Course, CourseEnrollmentCount, UserCourse, Question, Answer, Document
+
+COUNTERS = ("member_count", "question_count", "answer_count", "document_count")
+
+
+def record_activity(course_id, questions=0, answers=0, documents=0):
+    """Adjust a course's post/document counters; additions also mark it active now. The caller commits."""
+    values = {
+        Course.question_count: Course.question_count + questions,
+        Course.answer_count: Course.answer_count + answers,
+        Course.document_count: Course.document_count + documents,
+    }
+    if max(questions, answers, documents) > 0:
+        values[Course.last_activity_at] = datetime.utcnow()
+    Course.query.filter_by(id=course_id).update(values, synchronize_session=False)
+
+
+def record_enrollment(course_id, status, term, delta):
+    """A user joined (+1) or left (-1) a course as `status` for `term`. The caller commits."""
+    values = {Course.member_count: Course.member_count + delta}
+    if delta > 0:
+        values[Course.last_activity_at] = datetime.utcnow()
+    Course.query.filter_by(id=course_id).update(values, synchronize_session=False)
+    db.session.execute(_upsert_enrollment_count(), {"course_id": course_id, "status": status, "term": term,
+                                                    "count": delta})
+
+
+def _upsert_enrollment_count():
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(CourseEnrollmentCount.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=['course_id', 'status', 'term'],
+        set_={'count': CourseEnrollmentCount.__table__.c.count + stmt.excluded.count})
+
+
+# ===== Reconciliation =====
+def actual_counts(conn):
+    """
+    Counters as the source tables have them: ({course_id: {counter: n,
+    "last_activity_at": t}}, {(course_id, status, term): n}).
+    """
+    courses = {}
+
+    def merge(rows, counter):
+        for course_id, n, latest in rows:
+            entry = courses.setdefault(course_id, {})
+            entry[counter] = n
+            if latest is not None and (entry.get("last_activity_at") is None or latest > entry["last_activity_at"]):
+                entry["last_activity_at"] = latest
+
+    merge(conn.execute(select(UserCourse.course_id, func.count(), null())
+                       .group_by(UserCourse.course_id)), "member_count")
+    merge(conn.execute(select(Question.course_id, func.count(), func.max(Question.timestamp))
+                       .group_by(Question.course_id)), "question_count")
+    merge(conn.execute(select(Question.course_id, func.count(), func.max(Answer.timestamp))
+                       .select_from(Answer).join(Question, Question.id == Answer.question_id)
+                       .group_by(Question.course_id)), "answer_count")
+    merge(conn.execute(select(Document.course_id, func.count(), func.max(Document.uploaded_at))
+                       .group_by(Document.course_id)), "document_count")
+
+    enrollments = {(course_id, status, term): n for course_id, status, term, n in conn.execute(
+        select(UserCourse.course_id, UserCourse.status, UserCourse.term, func.count())
+        .group_by(UserCourse.course_id, UserCourse.status, UserCourse.term))}
+    return courses, enrollments
+
+
+def reconcile(conn):
+    """
+    Recompute every course's counters from the source tables, write back
+    the ones that drifted, and return {counter: courses repaired}.
+    last_activity_at is only ever moved forward: joins bump it too, and
+    enrollments don't record when they happened.
+    Run it when writes are quiet; an increment that lands between the
+    recount and the write-back is overwritten (and caught by the next run).
+    """
+    actual, enrollments = actual_counts(conn)
+    course_table = Course.__table__
+    repaired = dict.fromkeys(COUNTERS + ("last_activity_at", "enrollment_breakdown"), 0)
+
+    for row in conn.execute(select(course_table.c.id, *(course_table.c[c] for c in COUNTERS),
+                                   course_table.c.last_activity_at)).mappings():
+        want = actual.get(row["id"], {})
+        changes = {c: want.get(c, 0) for c in COUNTERS if row[c] != want.get(c, 0)}
+        latest = want.get("last_activity_at")
+        if latest is not None and (row["last_activity_at"] is None or latest > row["last_activity_at"]):
+            changes["last_activity_at"] = latest
+        if changes:
+            conn.execute(course_table.update().where(course_table.c.id == row["id"]).values(**changes))
+            for counter in changes:
+                repaired[counter] += 1
+
+    table = CourseEnrollmentCount.__table__
+    stored = {(r.course_id, r.status, r.term): r.count for r in conn.execute(select(table)) if r.count}
+    if stored != enrollments:
+        repaired["enrollment_breakdown"] = len({key[0] for key in stored.keys() | enrollments.keys()
+                                                if stored.get(key) != enrollments.get(key)})
+        conn.execute(table.delete())
+        if enrollments:
+            conn.execute(table.insert(), [{"course_id": c, "status": s, "term": t, "count": n}
+                                          for (c, s, t), n in enrollments.items()])
+    return repaired
@@ -0,0 +1,139 @@
+# current_user.py
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, session
+from sqlalchemy import String, cast, literal
+from sqlalchemy.orm import make_transient_to_detached
+from models import db, User, CacheTag
+
+_MISSING = object()
+
+
+class UserCache:
+    """
+    Bounded, TTL-evicting cache of User column values keyed by auth0_id.
+    Shared by every request in the process; least recently used entries are
+    dropped once `maxsize` is reached. Each entry keeps the version its
+    user's "user:<id>" page-cache tag had when it was read, so a profile
+    edit in any process (which bumps that tag) retires it everywhere.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._data = OrderedDict()  # auth0_id -> (expires_at, tag version, column values)
+        self._lock = threading.Lock()
+
+    def get(self, auth0_id):
+        """(tag version, column values), or None. The caller checks the version, then calls hit()."""
+        with self._lock:
+            entry = self._data.get(auth0_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[auth0_id]
+                self.misses += 1
+                return None
+            self._data.move_to_end(auth0_id)
+            return entry[1], entry[2]
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def set(self, auth0_id, version, values):
+        with self._lock:
+            self._data[auth0_id] = (time.monotonic() + self.ttl, version, values)
+            self._data.move_to_end(auth0_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, auth0_id, stale=False):
+        with self._lock:
+            self._data.pop(auth0_id, None)
+            if stale:
+                self.stale += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+user_cache = UserCache()
+
+_USER_COLUMNS = [c.key for c in User.__table__.columns]
+
+
+def _user_from_values(values):
+    # Rebuild a persistent User from cached columns without touching the DB
+    user = User(**copy.deepcopy(values))
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def _user_tag_version(user_id):
+    version = db.session.query(CacheTag.version).filter(CacheTag.tag == f"user:{user_id}").scalar()
+    return version or 0
+
+
+def load_user(auth0_id):
+    """
+    The User for auth0_id: from the process cache if its tag version is
+    still current (one primary-key lookup on cache_tag, no User row),
+    else the user and its version in one query.
+    """
+    cached = user_cache.get(auth0_id)
+    if cached is not None:
+        version, values = cached
+        if _user_tag_version(values["id"]) == version:
+            user_cache.hit()
+            return _user_from_values(values)
+        user_cache.invalidate(auth0_id, stale=True)
+
+    row = (db.session.query(User, CacheTag.version)
+           .outerjoin(CacheTag, CacheTag.tag == literal("user:") + cast(User.id, String))
+           .filter(User.auth0_id == auth0_id)
+           .first())
+    if row is None:
+        return None
+    user, version = row
+    user_cache.set(auth0_id, version or 0, {k: copy.deepcopy(getattr(user, k)) for k in _USER_COLUMNS})
+    return user
+
+
+def get_current_user():
+    """The logged-in User (or None), resolved at most once per request and kept on flask.g."""
+    user = g.get("_current_user", _MISSING)
+    if user is _MISSING:
+        user_session = session.get("user")
+        user = load_user(user_session["auth0_id"]) if user_session else None
+        g._current_user = user
+    return user
+
+
+def invalidate_user(auth0_id):
+    """
+    Drop a user from this process's cache and this request's g, e.g. after a
+    profile edit. Other processes see the invalidate("user:<id>") the edit
+    made; writes to a user's columns must make one.
+    """
+    user_cache.invalidate(auth0_id)
+    g.pop("_current_user", None)
@@ -0,0 +1,81 @@
+# database.py
+# Engine configuration from the environment.
+#
+#   DATABASE_URL          postgresql://... (postgres:// is accepted too; postgresql+psycopg://
+#                         for psycopg 3 instead of psycopg2); unset -> SQLite file
+#   DB_POOL_SIZE          server databases: persistent connections per process (default 5)
+#   DB_MAX_OVERFLOW       extra connections allowed under burst load (default 10)
+#   DB_POOL_TIMEOUT       seconds to wait for a free connection (default 30)
+#   DB_POOL_RECYCLE       reconnect connections older than this many seconds (default 1800)
+#   SQLITE_BUSY_TIMEOUT   ms a writer waits for the lock before "database is locked" (default 5000)
+#   SQLITE_MMAP_SIZE      bytes of the file memory-mapped for reads (default 256 MB)
+#   SQLITE_WAL            set to 0 to keep the rollback journal (e.g. database on a network filesystem)
+#
+# For SQLite every new connection gets WAL + synchronous=NORMAL: readers no
+# longer block the writer (or vice versa), and commits only fsync at
+# checkpoints. Writers still take turns, but wait up to busy_timeout for
+# each other instead of failing.
+import os
+
+from sqlalchemy import event
+from models import db
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+def database_url(default_sqlite_path):
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        return 'sqlite:///' + default_sqlite_path
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]  # Heroku/Railway style
+    return url
+
+
+def engine_options(url):
+    if url.startswith("sqlite"):
+        # pysqlite's own timeout is the same busy handler, in seconds
+        return {"connect_args": {"timeout": _env_int("SQLITE_BUSY_TIMEOUT", 5000) / 1000}}
+    return {
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": True,  # drop connections the server closed while idle
+    }
+
+
+def sqlite_pragmas():
+    pragmas = [
+        f"PRAGMA busy_timeout = {_env_int('SQLITE_BUSY_TIMEOUT', 5000)}",
+        f"PRAGMA mmap_size = {_env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)}",
+    ]
+    if os.getenv("SQLITE_WAL", "1") != "0":
+        pragmas += ["PRAGMA journal_mode = WAL", "PRAGMA synchronous = NORMAL"]
+    return pragmas
+
+
+def init_database(app, default_sqlite_path):
+    """
+    Point Flask-SQLAlchemy at SQLALCHEMY_DATABASE_URI if the app config sets
+    one, else DATABASE_URL, else the SQLite file; and tune the engine.
+    """
+    url = app.config.get('SQLALCHEMY_DATABASE_URI') or database_url(default_sqlite_path)
+    if url.startswith("sqlite:///"):
+        os.makedirs(os.path.dirname(os.path.abspath(url[len("sqlite:///"):])), exist_ok=True)
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    if url.startswith("sqlite"):
+        pragmas = sqlite_pragmas()
+        with app.app_context():
+            @event.listens_for(db.engine, "connect")
+            def set_sqlite_pragmas(dbapi_conn, _):
+                cursor = dbapi_conn.cursor()
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+                cursor.close()
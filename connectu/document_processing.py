@@ -0,0 +1,133 @@
+# document_processing.py
+# Text extraction, page counts and preview thumbnails for uploaded documents.
+# Runs inside the background workers (jobs.py), never in a request.
+import os
+import re
+import zipfile
+from datetime import datetime
+from html import unescape
+
+from flask import current_app
+from models import db, Document
+from page_cache import invalidate
+
+MAX_TEXT_CHARS = 200_000
+THUMBNAIL_SIZE = (240, 320)
+
+_xml_tag = re.compile(r'<[^>]+>')
+_pdf_page = re.compile(rb'/Type\s*/Page(?!s)')
+_pdf_text = re.compile(rb'\(((?:[^()\\]|\\.)*)\)\s*Tj')
+
+
+def _xml_text(xml):
+    # Paragraph / line-break tags become newlines, everything else is dropped
+    xml = re.sub(r'</(w:p|a:p)>|<(w:br|a:br)[^>]*/>', '\n', xml)
+    return unescape(_xml_tag.sub('', xml))
+
+
+def extract_txt(path):
+    with open(path, 'rb') as f:
+        text = f.read(MAX_TEXT_CHARS * 4).decode('utf-8', errors='replace')
+    return text, None
+
+
+def extract_docx(path):
+    with zipfile.ZipFile(path) as z:
+        text = _xml_text(z.read('word/document.xml').decode('utf-8', errors='replace'))
+        pages = None
+        if 'docProps/app.xml' in z.namelist():
+            m = re.search(r'<Pages>(\d+)</Pages>', z.read('docProps/app.xml').decode('utf-8', errors='replace'))
+            pages = int(m.group(1)) if m else None
+    return text, pages
+
+
+def extract_pptx(path):
+    with zipfile.ZipFile(path) as z:
+        slides = sorted(
+            (n for n in z.namelist() if re.fullmatch(r'ppt/slides/slide\d+\.xml', n)),
+            key=lambda n: int(re.search(r'\d+', n.rsplit('/', 1)[1]).group()),
+        )
+        text = '\n\n'.join(_xml_text(z.read(n).decode('utf-8', errors='replace')) for n in slides)
+    return text, len(slides)
+
+
+def extract_pdf(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        PdfReader = None
+    if PdfReader:
+        reader = PdfReader(path)
+        text = '\n'.join((page.extract_text() or '') for page in reader.pages)
+        return text, len(reader.pages)
+
+    # No pypdf: count page objects and pull literal strings from uncompressed content streams
+    with open(path, 'rb') as f:
+        raw = f.read()
+    text = b'\n'.join(_pdf_text.findall(raw)).decode('latin-1', errors='replace')
+    return text, len(_pdf_page.findall(raw)) or None
+
+
+EXTRACTORS = {
+    'txt': extract_txt,
+    'docx': extract_docx,
+    'pptx': extract_pptx,
+    'pdf': extract_pdf,
+}
+
+
+def make_thumbnail(text, out_path):
+    """
+    Render the first lines of the document's text onto a page-shaped PNG.
+    Needs Pillow; returns None (no thumbnail) without it.
+    """
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        return None
+    img = Image.new('RGB', THUMBNAIL_SIZE, 'white')
+    draw = ImageDraw.Draw(img)
+    lines = [line.strip() for line in text.splitlines() if line.strip()][:28]
+    for i, line in enumerate(lines):
+        draw.text((10, 10 + i * 11), line[:40], fill=(40, 40, 40))
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    img.save(out_path, 'PNG', optimize=True)
+    return out_path
+
+
+def process_document(payload):
+    """
+    Job handler: extract text/page count, build a thumbnail, mark the Document
+    ready. The queue commits these changes together with the job's status.
+    """
+    doc = db.session.get(Document, payload['document_id'])
+    if doc is None:
+        return  # deleted before we got to it
+
+    ext = doc.filename.rsplit('.', 1)[-1].lower()
+    extractor = EXTRACTORS.get(ext)
+    text, pages = extractor(doc.filepath) if extractor else ('', None)
+    text = (text or '')[:MAX_TEXT_CHARS]
+
+    thumbnail = None
+    thumbnail_dir = current_app.config.get('THUMBNAIL_DIR')
+    if thumbnail_dir and text:
+        key = doc.content_hash or f"doc{doc.id}"
+        thumbnail = make_thumbnail(text, os.path.join(thumbnail_dir, key[:2], f"{key}.png"))
+
+    doc.text_content = text
+    doc.page_count = pages
+    doc.thumbnail_path = thumbnail
+    doc.status = 'ready'
+    doc.processed_at = datetime.utcnow()
+    invalidate(f"course:{doc.course_id}")  # page shows status, page count and thumbnail
+
+
+def document_failed(payload, error):
+    """Called by the queue once a process_document job has used up its retries."""
+    doc = db.session.get(Document, payload['document_id'])
+    if doc is not None:
+        doc.status = 'failed'
+        doc.processed_at = datetime.utcnow()
+        invalidate(f"course:{doc.course_id}")
+
@@ -0,0 +1,143 @@
+# document_store.py
+# Content-addressed storage for uploaded documents. Files live at
+# <root>/ab/cd/<sha256> so identical uploads (in any course) share one copy;
+# Document rows reference it by content_hash, and the number of rows with a
+# given hash is its reference count: deleting a document calls release(),
+# which removes the file once nothing references it, and then its shard
+# directories if they're empty.
+#
+# An upload of the same content may have found the file already stored but
+# not yet committed its Document row when another request deletes the last
+# reference. So uploads go through stored(), which holds a per-digest file
+# lock from placing the file until the row is committed, and release()
+# takes the same lock before it counts references.
+import fcntl
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from models import db, Document
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class DocumentStore:
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def init_app(self, app):
+        self.root = app.config['DOCUMENT_STORE']
+        self.max_bytes = app.config.get('MAX_CONTENT_LENGTH')
+        os.makedirs(os.path.join(self.root, 'tmp'), exist_ok=True)
+        os.makedirs(os.path.join(self.root, 'locks'), exist_ok=True)
+
+    def path_for(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    @contextmanager
+    def _locked(self, digest):
+        # One lock file per first byte of the digest, shared by every process
+        with open(os.path.join(self.root, 'locks', digest[:2]), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write_temp(self, stream):
+        """Copy `stream` to a temp file in CHUNK_SIZE pieces while hashing it. Returns (path, digest, size)."""
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, 'tmp'))
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    # Chunked uploads carry no Content-Length, so MAX_CONTENT_LENGTH alone can't stop them
+                    if self.max_bytes and size > self.max_bytes:
+                        raise RequestEntityTooLarge()
+                    sha.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return tmp_path, sha.hexdigest(), size
+
+    def _place(self, tmp_path, digest):
+        final_path = self.path_for(digest)
+        if os.path.exists(final_path):
+            os.unlink(tmp_path)  # already stored: deduplicated
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+
+    def _remove(self, digest):
+        """Unlink the stored file and any shard directory it leaves empty. Hold the digest's lock."""
+        path = self.path_for(digest)
+        os.unlink(path)
+        # <root>/ab/cd, then <root>/ab: the lock covers every digest under ab/, so
+        # no _place() can be creating a file in them meanwhile
+        for shard in (os.path.dirname(path), os.path.dirname(os.path.dirname(path))):
+            try:
+                os.rmdir(shard)
+            except OSError:  # not empty
+                break
+
+    def save(self, stream):
+        """
+        Copy `stream` to its content address. Returns (sha256 hex digest, size
+        in bytes). Nothing stops release() from removing it again before a
+        Document references it; uploads use stored().
+        """
+        tmp_path, digest, size = self._write_temp(stream)
+        with self._locked(digest):
+            self._place(tmp_path, digest)
+        return digest, size
+
+    @contextmanager
+    def stored(self, stream):
+        """
+        save() for an upload: yields (digest, size) while holding the digest's
+        lock, so commit the Document row inside the block. If the block
+        fails, the file is removed again unless something else references it.
+        """
+        tmp_path, digest, size = self._write_temp(stream)
+        with self._locked(digest):
+            self._place(tmp_path, digest)
+            try:
+                yield digest, size
+            except BaseException:
+                db.session.rollback()
+                if not self.reference_count(digest):
+                    self._remove(digest)
+                raise
+
+    def reference_count(self, digest):
+        return Document.query.filter_by(content_hash=digest).count()
+
+    def release(self, digest, derived=()):
+        """
+        Delete the stored file, and `derived` files such as its thumbnail,
+        once no Document references it. Call after the delete has committed.
+        Returns whether the file was removed.
+        """
+        if not digest:
+            return False
+        with self._locked(digest):
+            if self.reference_count(digest):
+                return False
+            if os.path.exists(self.path_for(digest)):
+                self._remove(digest)
+            for path in derived:
+                if path and os.path.exists(path):
+                    os.unlink(path)
+        return True
+
+
+document_store = DocumentStore()
@@ -1,5 +1,9 @@
-from app import app, db
+from app import create_app
+from models import db
+from migrations import upgrade
 
+app = create_app()
 with app.app_context():
     db.create_all()
     print("Database tables created!")
+    print(f"Schema at version {upgrade(db.engine)}")
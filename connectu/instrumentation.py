@@ -0,0 +1,208 @@
+# instrumentation.py
+# Per-request latency and SQL metrics, served in Prometheus text format at /metrics.
+#
+#   connectu_request_duration_seconds   histogram by endpoint, method, status
+#   connectu_request_queries            histogram of SQL statements per request, by endpoint
+#   connectu_db_query_seconds_total     time spent in SQL, by endpoint
+#   connectu_slow_queries_total         statements slower than SLOW_QUERY_MS, by endpoint
+#   connectu_n_plus_one_total           requests that ran one statement more than N_PLUS_ONE_THRESHOLD times
+#   connectu_page_cache_* / connectu_user_cache_*   cache counters
+#
+# Slow statements and N+1 patterns are also logged with the offending SQL.
+# Metrics are per process; with several gunicorn workers, scrape each or
+# aggregate in Prometheus.
+#
+# Both outputs say how the site is used and where it is slow, so neither is
+# public: /metrics is a 404 unless METRICS_TOKEN is set, and then needs
+# "Authorization: Bearer <METRICS_TOKEN>" (Prometheus: authorization
+# credentials); the Server-Timing header (db time, query count) is only
+# added with SERVER_TIMING=1 or in debug mode.
+import hmac
+import threading
+import time
+from collections import Counter
+
+from flask import Response, abort, current_app, g, has_request_context, request
+from sqlalchemy import event
+from models import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+            for label_values, series in items:
+                labels = _labels(self.labels, label_values)
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]}')
+                lines.append(f"{self.name}_sum{{{labels}}} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{{{labels}}} {series[-1]}")
+        return lines
+
+
+class LabeledCounter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{{{_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+
+def _labels(names, values):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ",".join(f'{n}="{escape(v)}"' for n, v in zip(names, values))
+
+
+request_duration = Histogram("connectu_request_duration_seconds", "Request latency.",
+                             ("endpoint", "method", "status"), LATENCY_BUCKETS)
+request_queries = Histogram("connectu_request_queries", "SQL statements per request.",
+                            ("endpoint",), QUERY_BUCKETS)
+query_seconds = LabeledCounter("connectu_db_query_seconds_total", "Time spent in SQL.", ("endpoint",))
+slow_queries = LabeledCounter("connectu_slow_queries_total", "Statements slower than SLOW_QUERY_MS.",
+                              ("endpoint",))
+n_plus_one = LabeledCounter("connectu_n_plus_one_total",
+                            "Requests repeating one statement more than N_PLUS_ONE_THRESHOLD times.",
+                            ("endpoint",))
+
+
+# ===== SQLAlchemy listeners =====
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    if not has_request_context():
+        return  # workers, CLI commands
+    stats = g.get("sql_stats")
+    if stats is None:
+        stats = g.sql_stats = {"count": 0, "seconds": 0.0, "statements": Counter()}
+    stats["count"] += 1
+    stats["seconds"] += elapsed
+    stats["statements"][statement] += 1
+
+    slow_ms = current_app.config["SLOW_QUERY_MS"]
+    if elapsed * 1000 >= slow_ms:
+        slow_queries.inc((request.endpoint,))
+        current_app.logger.warning("Slow query (%.0f ms) in %s: %s", elapsed * 1000, request.endpoint,
+                                   " ".join(statement.split()))
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute doesn't fire for a failed statement; drop its start time
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+# ===== Request hooks =====
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+
+def _record_request(response):
+    start = g.get("request_start")
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    endpoint = request.endpoint or "unmatched"
+    request_duration.observe((endpoint, request.method, response.status_code), elapsed)
+
+    stats = g.get("sql_stats") or {"count": 0, "seconds": 0.0, "statements": Counter()}
+    request_queries.observe((endpoint,), stats["count"])
+    query_seconds.inc((endpoint,), stats["seconds"])
+
+    threshold = current_app.config["N_PLUS_ONE_THRESHOLD"]
+    repeated = [(s, n) for s, n in stats["statements"].items() if n > threshold]
+    if repeated:
+        n_plus_one.inc((endpoint,))
+        for statement, n in repeated:
+            current_app.logger.warning("Possible N+1 in %s: statement ran %d times: %s", endpoint, n,
+                                       " ".join(statement.split()))
+
+    if current_app.config["SERVER_TIMING"] or current_app.debug:
+        response.headers["Server-Timing"] = (f'db;dur={stats["seconds"] * 1000:.1f};'
+                                             f'desc="{stats["count"]} queries", app;dur={elapsed * 1000:.1f}')
+    return response
+
+
+def _scrape_allowed():
+    token = current_app.config["METRICS_TOKEN"]
+    if not token:
+        abort(404)  # off unless configured
+    supplied = request.headers.get("Authorization", "")
+    return hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode())
+
+
+def metrics():
+    from current_user import user_cache
+    from page_cache import page_cache
+
+    if not _scrape_allowed():
+        return Response("Bearer token required\n", 401, {"WWW-Authenticate": "Bearer"}, mimetype="text/plain")
+
+    lines = []
+    for metric in (request_duration, request_queries, query_seconds, slow_queries, n_plus_one):
+        lines += metric.render()
+    for prefix, stats in (("connectu_page_cache", page_cache.stats()), ("connectu_user_cache", user_cache.stats())):
+        for key, value in stats.items():
+            kind = "counter" if key in ("hits", "misses", "stale", "evictions") else "gauge"
+            name = f"{prefix}_{key}_total" if kind == "counter" else f"{prefix}_{key}"
+            lines += [f"# TYPE {name} {kind}", f"{name} {value}"]
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+def init_instrumentation(app):
+    """
+    Install the request hooks, SQL listeners and /metrics. SLOW_QUERY_MS
+    (default 100) and N_PLUS_ONE_THRESHOLD (default 10) tune the warnings;
+    METRICS_TOKEN and SERVER_TIMING expose the results (both off by default).
+    """
+    app.config.setdefault("SLOW_QUERY_MS", 100)
+    app.config.setdefault("N_PLUS_ONE_THRESHOLD", 10)
+    app.config.setdefault("METRICS_TOKEN", None)
+    app.config.setdefault("SERVER_TIMING", False)
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.add_url_rule("/metrics", "metrics", metrics)
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(db.engine, "handle_error", _handle_error)
@@ -0,0 +1,135 @@
+# jobs.py
+# Small database-backed job queue with a process-based worker pool.
+#   enqueue(kind, payload)            add a job in the caller's transaction
+#   python jobs.py worker [-c N]      run N worker processes (JOB_CONCURRENCY)
+# Jobs are retried with exponential backoff up to max_attempts; jobs left
+# 'running' by a crashed worker are picked up again after LEASE_SECONDS.
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, select, update
+from models import db, Job
+from document_processing import process_document, document_failed
+
+LEASE_SECONDS = 300
+BACKOFF_SECONDS = 5
+POLL_SECONDS = 1.0
+
+# kind -> (handler(payload), on_failure(payload, error) or None)
+HANDLERS = {
+    'process_document': (process_document, document_failed),
+}
+
+
+def enqueue(kind, payload, max_attempts=3):
+    """Add a job to the session; it becomes visible to workers when the caller commits."""
+    job = Job(kind=kind, payload=json.dumps(payload), max_attempts=max_attempts)
+    db.session.add(job)
+    return job
+
+
+def _runnable(now):
+    return or_(
+        and_(Job.status == 'queued', Job.run_after <= now),
+        and_(Job.status == 'running', Job.updated_at < now - timedelta(seconds=LEASE_SECONDS)),
+    )
+
+
+def claim():
+    """
+    Atomically mark the oldest runnable job as running and return it (or None).
+    Handlers leave their changes uncommitted; run() commits them together
+    with the job's final status.
+    """
+    now = datetime.utcnow()
+    next_id = select(Job.id).where(_runnable(now)).order_by(Job.id).limit(1).scalar_subquery()
+    stmt = (
+        update(Job)
+        # re-check the status so two workers racing on the same id can't both win
+        .where(Job.id == next_id, _runnable(now))
+        .values(status='running', attempts=Job.attempts + 1, updated_at=now)
+        .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+    )
+    row = db.session.execute(stmt).first()
+    db.session.commit()
+    return row
+
+
+def run(job):
+    handler, on_failure = HANDLERS[job.kind]
+    payload = json.loads(job.payload)
+    try:
+        handler(payload)
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            values = {'status': 'failed'}
+            if on_failure:
+                on_failure(payload, error)
+        else:
+            delay = BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            values = {'status': 'queued', 'run_after': datetime.utcnow() + timedelta(seconds=delay)}
+        db.session.execute(update(Job).where(Job.id == job.id)
+                           .values(last_error=error, updated_at=datetime.utcnow(), **values))
+    else:
+        db.session.execute(update(Job).where(Job.id == job.id)
+                           .values(status='done', updated_at=datetime.utcnow()))
+    db.session.commit()
+
+
+def work(app, stop_when_idle=False):
+    """Worker loop for one process."""
+    with app.app_context():
+        # Don't reuse connections inherited from the parent over fork()
+        db.engine.dispose(close=False)
+        while True:
+            job = claim()
+            if job is None:
+                if stop_when_idle:
+                    return
+                time.sleep(POLL_SECONDS)
+                continue
+            run(job)
+
+
+def run_pool(app, concurrency, stop_when_idle=False):
+    """Run `concurrency` worker processes and wait for them."""
+    ctx = multiprocessing.get_context('fork')
+    procs = [ctx.Process(target=work, args=(app, stop_when_idle), daemon=True) for _ in range(concurrency)]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
+
+
+def queue_stats():
+    rows = db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status).all()
+    return dict(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+    from app import create_app
+    app = create_app()
+
+    parser = argparse.ArgumentParser(description="ConnectU background jobs")
+    parser.add_argument("command", choices=["worker", "stats"])
+    parser.add_argument("-c", "--concurrency", type=int, default=int(os.getenv("JOB_CONCURRENCY", "2")))
+    parser.add_argument("--until-idle", action="store_true", help="exit once the queue is empty")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        with app.app_context():
+            print(queue_stats())
+    else:
+        print(f"Starting {args.concurrency} job workers")
+        run_pool(app, args.concurrency, stop_when_idle=args.until_idle)
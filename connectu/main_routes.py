@@ -0,0 +1,448 @@
+# main_routes.py
+# Pages: home, login, courses, Q&A (and its full-text search), profiles and document uploads.
+import os
+import secrets
+
+from flask import (Blueprint, current_app, redirect, url_for, session, render_template, request, flash,
+                   send_file, abort, jsonify)
+from werkzeug.utils import secure_filename
+from models import db, User, Course, Question, Answer, UserCourse, Document
+from course_search import current_course_index, CATALOGUE_TAG
+from course_queries import (load_course, load_questions, load_enrollments, load_dashboard, find_study_partners,
+                            courses_showing_user)
+from course_stats import record_activity, record_enrollment
+from current_user import get_current_user, invalidate_user
+from document_store import document_store
+from page_cache import cached_page, add_tags, invalidate
+from jobs import enqueue
+from post_search import search_posts
+
+main_bp = Blueprint('main', __name__)
+
+ALLOWED_EXTENSIONS = {'pdf', 'docx', 'pptx', 'txt'}
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def get_auth0():
+    """
+    The Auth0 OAuth client, registered on first use. authlib (and requests
+    under it) are only needed on the login path, so workers don't pay for
+    importing them at boot; the OpenID metadata is fetched on first login.
+    """
+    client = current_app.extensions.get("auth0")
+    if client is None:
+        from authlib.integrations.flask_client import OAuth
+        oauth = OAuth(current_app)
+        client = oauth.register(
+            "auth0",
+            client_id=os.getenv("AUTH0_CLIENT_ID"),
+            client_secret=os.getenv("AUTH0_CLIENT_SECRET"),
+            client_kwargs={"scope": "openid profile email"},
+            server_metadata_url=f'https://{os.getenv("AUTH0_DOMAIN")}/.well-known/openid-configuration'
+        )
+        current_app.extensions["auth0"] = client
+    return client
+
+
+# ===== Routes =====
+@main_bp.route("/")
+def index():
+    user_session = session.get("user")
+    user_obj = None
+    dashboard = []
+    if user_session:
+        user_obj = get_current_user()
+        if user_obj:
+            dashboard = load_dashboard(user_obj.id)
+    return render_template("index.html", user=user_obj, dashboard=dashboard)
+
+
+@main_bp.route("/login")
+def login():
+    session["nonce"] = secrets.token_urlsafe(16)
+    redirect_uri = os.getenv("AUTH0_CALLBACK_URL")
+    return get_auth0().authorize_redirect(redirect_uri=redirect_uri, nonce=session["nonce"])
+
+
+@main_bp.route("/callback")
+def callback():
+    auth0 = get_auth0()
+    token = auth0.authorize_access_token()
+    userinfo = auth0.parse_id_token(token, nonce=session.get("nonce"))
+
+    # Store user in session
+    session["user"] = {
+        "auth0_id": userinfo["sub"],
+        "name": userinfo["name"],
+        "email": userinfo["email"]
+    }
+
+    # Add to DB if user doesn't exist
+    existing = User.query.filter_by(auth0_id=userinfo["sub"]).first()
+    if not existing:
+        new_user = User(
+            auth0_id=userinfo["sub"],
+            username=userinfo["name"],
+            email=userinfo["email"],
+            bio="",
+        )
+        db.session.add(new_user)
+        db.session.commit()
+        invalidate_user(userinfo["sub"])
+
+    return redirect(url_for("main.index"))
+
+
+@main_bp.route("/logout")
+def logout():
+    session.clear()
+    return redirect(
+        f"https://{os.getenv('AUTH0_DOMAIN')}/v2/logout?"
+        f"returnTo={url_for('main.index', _external=True)}&"
+        f"client_id={os.getenv('AUTH0_CLIENT_ID')}"
+    )
+
+@main_bp.route("/course/<course_code>", methods=["GET", "POST"])
+@cached_page(lambda course_code: (course_code, request.args.get("before")))
+def course_detail(course_code):
+    course = load_course(course_code)
+    user_obj = None
+
+    if 'user' in session:
+        user_obj = get_current_user()
+
+    if request.method == "POST" and user_obj:
+        # Handle new question
+        if "question" in request.form:
+            content = request.form.get("content")
+            if content:
+                q = Question(course_id=course.id, user_id=user_obj.id, content=content)
+                db.session.add(q)
+                record_activity(course.id, questions=1)
+                invalidate(f"course:{course.id}")
+                db.session.commit()
+                flash("Question posted!", "success")
+                return redirect(url_for("main.course_detail", course_code=course.course_code))
+
+        # Handle new answer
+        if "answer" in request.form:
+            content = request.form.get("content")
+            question_id = request.form.get("question_id", type=int)
+            if content and question_id:
+                # The counters and cache tags below are this course's, so the question must be too
+                question = db.session.get(Question, question_id)
+                if not question or question.course_id != course.id:
+                    flash("That question isn't in this course.", "warning")
+                    return redirect(url_for("main.course_detail", course_code=course.course_code))
+                a = Answer(question_id=question.id, user_id=user_obj.id, content=content)
+                db.session.add(a)
+                record_activity(course.id, answers=1)
+                invalidate(f"course:{course.id}")
+                db.session.commit()
+                flash("Answer posted!", "success")
+                return redirect(url_for("main.course_detail", course_code=course.course_code))
+                
+    # Existing Q&A logic (one page, answers + authors eager-loaded)
+    questions, next_cursor = load_questions(course.id, before=request.args.get("before"))
+    # enrolled_users = [uc.user for uc in course.students]  # this is a list of UserCourse objects
+    enrolled_users = course.students
+
+    # One tag however big the course: a hit re-checks two tag versions. The
+    # usernames shown here are covered by edit_profile bumping this tag.
+    add_tags(f"course:{course.id}", CATALOGUE_TAG)
+
+    return render_template(
+        "course_detail.html",
+        course=course,
+        questions=questions,
+        next_cursor=next_cursor,
+        user=user_obj,
+        enrolled_users=enrolled_users,  # okay to keep, just use uc.user in template
+    )
+
+
+@main_bp.route("/course/<course_code>/partners")
+def study_partners(course_code):
+    # Course members ranked by how many weekly time slots they share with you
+    user_obj = get_current_user()
+    if not user_obj:
+        return jsonify(error="login required"), 401
+    course = Course.query.filter_by(course_code=course_code).first_or_404()
+    k = min(request.args.get("k", 10, type=int), 100)
+    return jsonify(course=course.course_code, partners=find_study_partners(course.id, user_obj, k))
+
+
+@main_bp.route("/remove_question/<int:question_id>", methods=["POST"])
+def remove_question(question_id):
+    # Make sure user is logged in
+    if "user" not in session:
+        flash("You must be logged in to remove a question.", "danger")
+        return redirect(request.referrer or "/")
+
+    question = Question.query.get_or_404(question_id)
+    user_obj = get_current_user()
+    if question.user_id != user_obj.id:
+        flash("You can only remove your own questions.", "danger")
+        return redirect(url_for('main.course_detail', course_code=question.course.course_code))
+    
+    course_code = question.course.course_code
+    
+    invalidate(f"course:{question.course_id}")
+    # Answers go with it (answer.question_id is NOT NULL); the search triggers drop both
+    answers = Answer.query.filter_by(question_id=question.id).delete(synchronize_session=False)
+    db.session.delete(question)
+    record_activity(question.course_id, questions=-1, answers=-answers)
+    db.session.commit()
+    flash("Your question has been removed.", "success")
+    return redirect(url_for('main.course_detail', course_code=course_code))
+
+@main_bp.route("/search")
+@cached_page(lambda: (request.args.get("q", "").strip(), request.args.get("page", 1, type=int)))
+def search():
+    query = request.args.get("q", "").strip()
+    page_num = request.args.get("page", 1, type=int)
+    page = current_course_index().search(query, page=page_num, per_page=25)
+    # Fetch only this page's rows, then restore the ranked order
+    by_id = {c.id: c for c in Course.query.filter(Course.id.in_(page.ids)).all()} if page.ids else {}
+    results = [by_id[i] for i in page.ids if i in by_id]
+    user_obj = None
+    if 'user' in session:
+        user_obj = get_current_user()
+    add_tags(CATALOGUE_TAG)
+    return render_template("search.html", query=query, results=results, page=page, user=user_obj)
+
+
+@main_bp.route("/search/posts")
+@main_bp.route("/course/<course_code>/search", endpoint="course_post_search")
+def post_search(course_code=None):
+    # Not page-cached: results change with every post anywhere
+    query = request.args.get("q", "").strip()
+    course = Course.query.filter_by(course_code=course_code).first_or_404() if course_code else None
+    page = search_posts(query, course_id=course.id if course else None,
+                        page=request.args.get("page", 1, type=int)) if query else None
+    user_obj = get_current_user() if 'user' in session else None
+    return render_template("post_search.html", query=query, course=course, page=page, user=user_obj,
+                           unavailable=bool(query) and page is None)
+
+
+@main_bp.route("/leave_course/<int:course_id>", methods=['POST'])
+def leave_course(course_id):
+    if 'user' not in session:
+        flash("You must be logged in to leave a course.", "warning")
+        return redirect(url_for('main.login'))
+
+    user = get_current_user()
+    course = Course.query.get_or_404(course_id)
+
+    uc = UserCourse.query.filter_by(user_id=user.id, course_id=course.id).first()
+    if uc:
+        db.session.delete(uc)
+        record_enrollment(course.id, uc.status, uc.term, -1)
+        invalidate(f"course:{course.id}", f"user:{user.id}")
+        db.session.commit()
+        flash(f"You have left {course.course_code}.", "info")
+    else:
+        flash("You are not enrolled in this course.", "warning")
+
+    return redirect(url_for('main.course_detail', course_code=course.course_code))
+
+
+@main_bp.route("/profile")
+def profile():
+    user_session = session.get("user")
+    if not user_session:
+        flash("Please sign in to view your profile.", "warning")
+        return redirect(url_for("main.login"))
+
+    user = get_current_user()
+    if not user:
+        flash("User not found.", "warning")
+        return redirect(url_for("main.index"))
+
+    return render_template("profile.html", user=user, user_courses=load_enrollments(user.id), current_user_id=user.id)
+
+
+@main_bp.route("/profile/<int:user_id>", endpoint="profile_view")
+@cached_page(lambda user_id: (user_id,))
+def profile_view(user_id):
+    user = User.query.get_or_404(user_id)
+    current_user_id = None
+    if "user" in session:
+        current_user = get_current_user()
+        if current_user:
+            current_user_id = current_user.id
+    add_tags(f"user:{user.id}")
+    return render_template("profile.html", user=user, user_courses=load_enrollments(user.id),
+                           current_user_id=current_user_id)
+
+
+@main_bp.route("/profile/edit", methods=["GET", "POST"])
+def edit_profile():
+    user_session = session.get("user")
+    if not user_session:
+        flash("Please sign in to edit your profile.", "warning")
+        return redirect(url_for("main.login"))
+
+    user = get_current_user()
+    if not user:
+        flash("User not found.", "warning")
+        return redirect(url_for("main.index"))
+    if request.method == "POST":
+        old_username = user.username
+        user.username = request.form.get("username", user.username)
+        user.bio = request.form.get("bio", user.bio)
+        available_times = {}
+        for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]:
+            available_times[day] = request.form.getlist(f"available_times[{day}][]") or []
+
+        user.available_times = available_times
+        user.personal_links = request.form.get("personal_links", user.personal_links)
+        user.avatar_url = request.form.get("avatar_url", user.avatar_url)
+        tags = [f"user:{user.id}"]
+        if user.username != old_username:
+            # Course pages show the name but are tagged by course only (see course_detail)
+            tags += [f"course:{course_id}" for course_id in courses_showing_user(user.id)]
+        invalidate(*tags)
+        db.session.commit()
+        invalidate_user(user.auth0_id)
+        session["user"]["name"] = user.username
+        session.modified = True  # nested change isn't seen by the session dict
+        flash("Profile updated successfully!", "success")
+        return redirect(url_for("main.profile"))
+
+    # For GET request, render the form
+    return render_template("edit_profile.html", user=user)
+
+
+
+@main_bp.route("/join_course/<int:course_id>", methods=['POST'])
+def join_course(course_id):
+    if 'user' not in session:
+        flash("You must be logged in to join a course.", "warning")
+        return redirect(url_for('main.login'))
+
+    # Get user and course
+    user = get_current_user()
+    course = Course.query.get_or_404(course_id)
+
+    # Get status and term from the form
+    status = request.form.get('status')
+    term = request.form.get('term')
+
+    if not status or not term:
+        flash("Please select both status and term.", "warning")
+        return redirect(request.referrer or url_for('main.course_detail', course_code=course.course_code))
+
+    # Check if user is already enrolled
+    existing = UserCourse.query.filter_by(user_id=user.id, course_id=course.id).first()
+    if existing:
+        flash("You have already joined this course.", "info")
+    else:
+        # Add the association object
+        uc = UserCourse(user_id=user.id, course_id=course.id, status=status, term=term)
+        db.session.add(uc)
+        record_enrollment(course.id, status, term, 1)
+        invalidate(f"course:{course.id}", f"user:{user.id}")
+        db.session.commit()
+        flash(f"You joined {course.course_code.replace('_', ' ')} as a {status} for {term}!", "success")
+
+    return redirect(request.referrer or url_for('main.course_detail', course_code=course.course_code))
+
+@main_bp.route('/course/<int:course_id>/upload', methods=['POST'])
+def upload_document(course_id):
+    # Before anything is stored: an unknown course must not leave a file or row behind
+    course = Course.query.get_or_404(course_id)
+
+    # 1️⃣ Ensure user is logged in
+    if 'user' not in session:
+        flash("You must be logged in to upload documents.", "warning")
+        return redirect(request.referrer or url_for('main.course_detail', course_code=course.course_code))
+
+    # 2️⃣ Get file from form
+    file = request.files.get('document')
+    if not file or file.filename == '':
+        flash('No file selected', 'warning')
+        return redirect(request.referrer)
+
+    # 3️⃣ Check allowed file types
+    if not allowed_file(file.filename):
+        flash('Invalid file type', 'warning')
+        return redirect(request.referrer)
+
+    # 4️⃣ Get user from session
+    user_obj = get_current_user()
+    if not user_obj:
+        flash("User not found in database.", "danger")
+        return redirect(request.referrer)
+
+    # 5️⃣ Stream to content-addressed storage (identical files are stored once)
+    filename = secure_filename(file.filename)
+    with document_store.stored(file.stream) as (content_hash, size):
+        # 6️⃣ Save document to DB (inside the block: a concurrent delete can't release the file meanwhile)
+        new_doc = Document(
+            filename=filename,
+            filepath=document_store.path_for(content_hash),
+            content_hash=content_hash,
+            size=size,
+            course_id=course.id,
+            user_id=user_obj.id
+        )
+        db.session.add(new_doc)
+        db.session.flush()
+        # Text extraction / thumbnail happen in the background workers (python jobs.py worker)
+        enqueue('process_document', {'document_id': new_doc.id})
+        record_activity(course.id, documents=1)
+        invalidate(f"course:{course.id}")
+        db.session.commit()
+
+    flash('Document uploaded successfully!', 'success')
+    return redirect(url_for('main.course_detail', course_code=course.course_code))
+
+
+@main_bp.route('/documents/<int:document_id>/delete', methods=['POST'])
+def delete_document(document_id):
+    doc = Document.query.get_or_404(document_id)
+    course_code = doc.course.course_code
+    user_obj = get_current_user() if 'user' in session else None
+    if not user_obj or doc.user_id != user_obj.id:
+        flash("You can only delete documents you uploaded.", "danger")
+        return redirect(url_for('main.course_detail', course_code=course_code))
+
+    content_hash, thumbnail = doc.content_hash, doc.thumbnail_path
+    invalidate(f"course:{doc.course_id}")
+    record_activity(doc.course_id, documents=-1)
+    db.session.delete(doc)  # the search trigger drops its index row
+    db.session.commit()
+    # The stored file (and its thumbnail, keyed by the same hash) goes once no other upload shares it
+    document_store.release(content_hash, derived=[thumbnail])
+    flash(f"{doc.filename} was deleted.", "success")
+    return redirect(url_for('main.course_detail', course_code=course_code))
+
+
+@main_bp.route('/documents/<int:document_id>/download')
+def download_document(document_id):
+    # Range/conditional requests are handled by send_file; with USE_X_SENDFILE
+    # the front-end server streams the file and Python never reads it
+    doc = Document.query.get_or_404(document_id)
+    if not os.path.exists(doc.filepath):
+        abort(404)
+    return send_file(doc.filepath, download_name=doc.filename, conditional=True,
+                     max_age=31536000 if doc.content_hash else None)
+
+
+@main_bp.route('/documents/<int:document_id>/thumbnail')
+def document_thumbnail(document_id):
+    doc = Document.query.get_or_404(document_id)
+    if not doc.thumbnail_path or not os.path.exists(doc.thumbnail_path):
+        return redirect(url_for('static', filename='doc.png'))
+    return send_file(doc.thumbnail_path, mimetype='image/png', conditional=True, max_age=86400)
+
+
+@main_bp.app_errorhandler(413)
+def upload_too_large(e):
+    limit_mb = current_app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    flash(f"That file is too large (limit {limit_mb} MB).", "warning")
+    return redirect(request.referrer or url_for('main.index'))
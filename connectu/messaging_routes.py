@@ -1,12 +1,17 @@
 # messaging_routes.py
-from flask import Blueprint, session, request, redirect, url_for, render_template
-from models import db, User, DirectMessage
+from flask import Blueprint, Response, session, request, redirect, url_for, render_template, jsonify
+from models import db, User
+from current_user import get_current_user
+from conversations import find_conversation, send_message, mark_read, load_messages, load_inbox
+from push_hub import hub
 
 messaging_bp = Blueprint('messaging', __name__)
 
 @messaging_bp.route('/messages/<int:recipient_id>', methods=['GET', 'POST'])
 def direct_message(recipient_id):
-    sender = User.query.filter_by(auth0_id=session['user']['auth0_id']).first()
+    sender = get_current_user()
+    if not sender:
+        return redirect(url_for('main.login'))
     recipient = User.query.get(recipient_id)
     if not recipient:
         return "Recipient not found", 404
@@ -14,31 +19,42 @@ def direct_message(recipient_id):
     # Handle sending a message
     if request.method == 'POST':
         content = request.form['content']
-        msg = DirectMessage(sender_id=sender.id, recipient_id=recipient.id, content=content)
-        db.session.add(msg)
+        msg = send_message(sender.id, recipient.id, content)
         db.session.commit()
+        hub.publish_message(msg)
+        # The page's fetch() send skips the redirect; the message arrives over /messages/stream
+        if request.headers.get('X-Requested-With') == 'fetch':
+            return jsonify(id=msg.id), 201
         return redirect(url_for('messaging.direct_message', recipient_id=recipient.id))
 
-    # Show chat history
-    messages = DirectMessage.query.filter(
-        ((DirectMessage.sender_id == sender.id) & (DirectMessage.recipient_id == recipient.id)) |
-        ((DirectMessage.sender_id == recipient.id) & (DirectMessage.recipient_id == sender.id))
-    ).order_by(DirectMessage.timestamp).all()
+    # Show chat history: latest page, or the page before ?before=<cursor>
+    messages, older_cursor = [], None
+    conversation = find_conversation(sender.id, recipient.id)
+    if conversation:
+        mark_read(conversation, sender.id)
+        messages, older_cursor = load_messages(conversation.id, before=request.args.get('before'))
     
-    return render_template('messages.html', messages=messages, recipient=recipient)
+    return render_template('messages.html', messages=messages, recipient=recipient,
+                           older_cursor=older_cursor)
 
 @messaging_bp.route('/messages', methods=['GET'])
 def inbox():
     if 'user' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
-    user = User.query.filter_by(auth0_id=session['user']['auth0_id']).first()
+    user = get_current_user()
 
-    # Get all user IDs this user has messaged with (as sender or recipient)
-    recipient_ids = db.session.query(DirectMessage.recipient_id).filter_by(sender_id=user.id).distinct().all()
-    sender_ids = db.session.query(DirectMessage.sender_id).filter_by(recipient_id=user.id).distinct().all()
-    contact_ids = set([x[0] for x in recipient_ids] + [x[0] for x in sender_ids if x[0]])
-    contact_ids.discard(user.id)
-    contacts = User.query.filter(User.id.in_(contact_ids)).all()
+    # One query over the per-conversation summaries, newest first
+    conversations, next_cursor = load_inbox(user.id, before=request.args.get('before'))
 
-    return render_template("inbox.html", contacts=contacts, current_user_id=user.id)
+    return render_template("inbox.html", conversations=conversations, next_cursor=next_cursor,
+                           current_user_id=user.id)
+
+@messaging_bp.route('/messages/stream', methods=['GET'])
+def stream():
+    # Server-Sent Events: new messages for the logged-in user, pushed as they are sent
+    user = get_current_user()
+    if not user:
+        return "Login required", 401
+    return Response(hub.stream(user.id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -0,0 +1,214 @@
+# migrations.py
+# Versioned, in-place schema upgrades. Usage: python migrations.py
+#
+# Each migration is (version, description, [sql statements or step(conn)
+# callables]) and runs in its own transaction; the applied version is
+# recorded in `schema_version`.
+# Statements must be safe on a database that db.create_all() already built
+# from the current models (hence IF NOT EXISTS), since init_db.py does both.
+# They must also run on Postgres as well as SQLite: new tables are created
+# from their models (create_table), so each dialect gets its own types and
+# id columns, and raw DDL sticks to portable types (TIMESTAMP, not DATETIME).
+from sqlalchemy import inspect, text
+
+
+def create_table(name):
+    """Migration step: CREATE TABLE (and its indexes) from the current model, unless it exists."""
+    def step(conn):
+        from models import db
+        db.metadata.tables[name].create(conn, checkfirst=True)
+    return step
+
+
+def add_column(table, column, ddl):
+    """Migration step: ALTER TABLE ADD COLUMN unless create_all already made it."""
+    def step(conn):
+        if column not in {c['name'] for c in inspect(conn).get_columns(table)}:
+            conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}'))
+    return step
+
+
+def set_not_null(table, column):
+    """Migration step: SET NOT NULL on Postgres. SQLite can't alter a column in place; new databases get it from the model."""
+    def step(conn):
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text(f'ALTER TABLE "{table}" ALTER COLUMN {column} SET NOT NULL'))
+    return step
+
+
+def backfill_oldest(table, column):
+    """Give NULL timestamps the table's oldest value (where newest-first pages already put them), else now."""
+    return (f'UPDATE "{table}" SET {column} = COALESCE((SELECT MIN({column}) FROM "{table}"), CURRENT_TIMESTAMP) '
+            f'WHERE {column} IS NULL')
+
+
+def convert_pickled_availability(conn):
+    """Migration step: user.available_times (pickled dict) -> user.availability_mask."""
+    import pickle
+    from availability import to_mask
+
+    if 'available_times' not in {c['name'] for c in inspect(conn).get_columns('user')}:
+        return  # fresh database, nothing to convert
+    rows = conn.execute(text('SELECT id, available_times FROM "user" WHERE available_times IS NOT NULL')).all()
+    updates = []
+    for user_id, blob in rows:
+        try:
+            mask = to_mask(pickle.loads(blob))
+        except Exception:
+            mask = 0  # unreadable pickle: treat as "not set"
+        if mask:
+            updates.append({"id": user_id, "mask": mask})
+    if updates:
+        conn.execute(text('UPDATE "user" SET availability_mask = :mask WHERE id = :id'), updates)
+
+
+def reconcile_course_stats(conn):
+    """Migration step: fill the course activity counters (see course_stats.py)."""
+    from course_stats import reconcile
+    reconcile(conn)
+
+
+def create_post_search(conn):
+    """Migration step: FTS5 table, sync triggers and backfill; skipped off SQLite (see post_search.py)."""
+    from post_search import install
+    install(conn)
+
+
+# Smaller/larger of a message's two participants, for conversation keys
+_LOW = "CASE WHEN sender_id < recipient_id THEN sender_id ELSE recipient_id END"
+_HIGH = "CASE WHEN sender_id < recipient_id THEN recipient_id ELSE sender_id END"
+
+MIGRATIONS = [
+    (1, "indexes for course_detail, direct_message and inbox", [
+        "CREATE INDEX IF NOT EXISTS ix_question_course_ts ON question (course_id, timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS ix_answer_question ON answer (question_id)",
+        "CREATE INDEX IF NOT EXISTS ix_document_course_uploaded ON document (course_id, uploaded_at)",
+        "CREATE INDEX IF NOT EXISTS ix_user_courses_course ON user_courses (course_id)",
+        "CREATE INDEX IF NOT EXISTS ix_direct_message_sender_recipient_ts "
+        "ON direct_message (sender_id, recipient_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_direct_message_recipient_sender "
+        "ON direct_message (recipient_id, sender_id)",
+    ]),
+    (2, "conversations keyed by (low_user_id, high_user_id)", [
+        create_table("conversation"),
+        "CREATE INDEX IF NOT EXISTS ix_conversation_high_user ON conversation (high_user_id)",
+        add_column("direct_message", "conversation_id", "INTEGER REFERENCES conversation (id)"),
+        f"INSERT INTO conversation (low_user_id, high_user_id, created_at) "
+        f"SELECT lo, hi, MIN(timestamp) FROM ("
+        f" SELECT {_LOW} AS lo, {_HIGH} AS hi, timestamp FROM direct_message"
+        f" WHERE conversation_id IS NULL) pairs "
+        f"WHERE NOT EXISTS (SELECT 1 FROM conversation c"
+        f" WHERE c.low_user_id = pairs.lo AND c.high_user_id = pairs.hi) "
+        f"GROUP BY lo, hi",
+        f"UPDATE direct_message SET conversation_id = (SELECT c.id FROM conversation c"
+        f" WHERE c.low_user_id = {_LOW} AND c.high_user_id = {_HIGH}) "
+        f"WHERE conversation_id IS NULL",
+        "CREATE INDEX IF NOT EXISTS ix_direct_message_conversation_ts "
+        "ON direct_message (conversation_id, timestamp, id)",
+    ]),
+    (3, "inbox summary columns on conversation", [
+        add_column("conversation", "last_message_id", "INTEGER"),
+        add_column("conversation", "last_message_at", "TIMESTAMP"),
+        add_column("conversation", "last_snippet", "VARCHAR(140)"),
+        add_column("conversation", "low_unread", "INTEGER NOT NULL DEFAULT 0"),
+        add_column("conversation", "high_unread", "INTEGER NOT NULL DEFAULT 0"),
+        "UPDATE conversation SET last_message_id = (SELECT m.id FROM direct_message m"
+        " WHERE m.conversation_id = conversation.id ORDER BY m.timestamp DESC, m.id DESC LIMIT 1) "
+        "WHERE last_message_id IS NULL",
+        "UPDATE conversation SET"
+        " last_message_at = (SELECT m.timestamp FROM direct_message m WHERE m.id = conversation.last_message_id),"
+        " last_snippet = (SELECT SUBSTR(m.content, 1, 140) FROM direct_message m"
+        " WHERE m.id = conversation.last_message_id) "
+        "WHERE last_message_id IS NOT NULL AND last_message_at IS NULL",
+        "CREATE INDEX IF NOT EXISTS ix_conversation_low_recent ON conversation (low_user_id, last_message_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_conversation_high_recent ON conversation (high_user_id, last_message_at, id)",
+    ]),
+    (4, "content-addressed document storage", [
+        add_column("document", "content_hash", "VARCHAR(64)"),
+        add_column("document", "size", "INTEGER"),
+        "CREATE INDEX IF NOT EXISTS ix_document_content_hash ON document (content_hash)",
+    ]),
+    (5, "background job queue and document processing status", [
+        create_table("job"),
+        "CREATE INDEX IF NOT EXISTS ix_job_status_run_after ON job (status, run_after)",
+        add_column("document", "status", "VARCHAR(20) NOT NULL DEFAULT 'pending'"),
+        add_column("document", "page_count", "INTEGER"),
+        add_column("document", "text_content", "TEXT"),
+        add_column("document", "thumbnail_path", "VARCHAR(300)"),
+        add_column("document", "processed_at", "TIMESTAMP"),
+        # Queue every existing document once
+        "INSERT INTO job (kind, payload, status, attempts, max_attempts, run_after, created_at, updated_at) "
+        "SELECT 'process_document', '{\"document_id\": ' || id || '}', 'queued', 0, 3,"
+        " CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP "
+        "FROM document WHERE status = 'pending'",
+    ]),
+    (6, "availability as a (day, period) bitmask", [
+        add_column("user", "availability_mask", "INTEGER NOT NULL DEFAULT 0"),
+        convert_pickled_availability,
+    ]),
+    (7, "page cache invalidation tags", [
+        create_table("cache_tag"),
+    ]),
+    (8, "import fingerprints for `flask courses import`", [
+        create_table("import_state"),
+    ]),
+    (9, "full-text index over questions, answers and document text (SQLite)", [
+        create_post_search,
+    ]),
+    (10, "course activity counters", [
+        add_column("course", "member_count", "INTEGER NOT NULL DEFAULT 0"),
+        add_column("course", "question_count", "INTEGER NOT NULL DEFAULT 0"),
+        add_column("course", "answer_count", "INTEGER NOT NULL DEFAULT 0"),
+        add_column("course", "document_count", "INTEGER NOT NULL DEFAULT 0"),
+        add_column("course", "last_activity_at", "TIMESTAMP"),
+        create_table("course_enrollment_count"),
+        reconcile_course_stats,
+    ]),
+    (11, "keyset pagination timestamps are never NULL", [
+        backfill_oldest("question", "timestamp"),
+        set_not_null("question", "timestamp"),
+        backfill_oldest("direct_message", "timestamp"),
+        set_not_null("direct_message", "timestamp"),
+        backfill_oldest("document", "uploaded_at"),
+        set_not_null("document", "uploaded_at"),
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    return version or 0
+
+
+def upgrade(engine, target=None):
+    """Apply every migration newer than the database's version, up to `target`. Returns the new version."""
+    target = LATEST_VERSION if target is None else target
+    with engine.begin() as conn:
+        version = current_version(conn)
+
+    for number, description, statements in MIGRATIONS:
+        if number <= version or number > target:
+            continue
+        with engine.begin() as conn:
+            for stmt in statements:
+                if callable(stmt):
+                    stmt(conn)
+                else:
+                    conn.execute(text(stmt))
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": number})
+        print(f"Applied migration {number}: {description}")
+        version = number
+    return version
+
+
+if __name__ == "__main__":
+    from app import create_app
+    from models import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        print(f"Schema at version {upgrade(db.engine)}")
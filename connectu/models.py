@@ -1,5 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import deferred
 from datetime import datetime
+from availability import to_mask, from_mask
 
 db = SQLAlchemy()
 #35rUlj6WjkJKWT79AR8OR907AGg_36o9L39otApbaHZRsiJ8V GROK
@@ -20,18 +22,69 @@ class User(db.Model):
     username = db.Column(db.String(80))
     email = db.Column(db.String(120))
     bio = db.Column(db.Text)
-    available_times = db.Column(db.PickleType)  # dict of day -> list of periods
+    availability_mask = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # see availability.py
     personal_links = db.Column(db.Text)  # Can store multiple links, separated by commas or newlines
     avatar_url = db.Column(db.String(200))  # <-- This stores the selected avatar
     user_courses = db.relationship('UserCourse', back_populates='user', lazy=True)
 
+    # dict of day -> list of periods, backed by the bitmask
+    @property
+    def available_times(self):
+        return from_mask(self.availability_mask)
+
+    @available_times.setter
+    def available_times(self, value):
+        self.availability_mask = to_mask(value)
+
+
+# One row per pair of users; (low_user_id, high_user_id) is the pair sorted by id
+class Conversation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    low_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    high_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Inbox summary, kept in step with every DirectMessage insert (see conversations.send_message)
+    last_message_id = db.Column(db.Integer)
+    last_message_at = db.Column(db.DateTime)
+    last_snippet = db.Column(db.String(140))
+    low_unread = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    high_unread = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # inbox: a user's conversations by recency, from either side of the pair
+    __table_args__ = (
+        db.UniqueConstraint('low_user_id', 'high_user_id', name='uq_conversation_pair'),
+        db.Index('ix_conversation_high_user', 'high_user_id'),
+        db.Index('ix_conversation_low_recent', 'low_user_id', 'last_message_at', 'id'),
+        db.Index('ix_conversation_high_recent', 'high_user_id', 'last_message_at', 'id'),
+    )
+
+    @staticmethod
+    def key(user_a_id, user_b_id):
+        return (min(user_a_id, user_b_id), max(user_a_id, user_b_id))
+
+    def other_user_id(self, user_id):
+        return self.high_user_id if user_id == self.low_user_id else self.low_user_id
+
+    def unread_for(self, user_id):
+        return self.low_unread if user_id == self.low_user_id else self.high_unread
+
 
 class DirectMessage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'))
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # keyset column: never NULL
+
+    # direct_message: one range scan per page of a conversation
+    # inbox: "who did I write to" / "who wrote to me"
+    __table_args__ = (
+        db.Index('ix_direct_message_conversation_ts', 'conversation_id', 'timestamp', 'id'),
+        db.Index('ix_direct_message_sender_recipient_ts', 'sender_id', 'recipient_id', 'timestamp'),
+        db.Index('ix_direct_message_recipient_sender', 'recipient_id', 'sender_id'),
+    )
 
 class Course(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -41,16 +94,28 @@ class Course(db.Model):
     students = db.relationship('UserCourse', back_populates='course', lazy=True)
     documents = db.relationship('Document', back_populates='course')
 
+    # Activity counters, kept in step by the write routes (see course_stats.py)
+    member_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    question_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    answer_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    document_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_activity_at = db.Column(db.DateTime)
+
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # keyset column: never NULL
 
     course = db.relationship('Course', backref='questions', lazy=True)
     user = db.relationship('User', backref='questions', lazy=True)
 
+    # course_detail: newest-first keyset pagination within a course
+    __table_args__ = (
+        db.Index('ix_question_course_ts', 'course_id', 'timestamp', 'id'),
+    )
+
 
 class Answer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -62,6 +127,10 @@ class Answer(db.Model):
     question = db.relationship('Question', backref='answers', lazy=True)
     user = db.relationship('User', backref='answers', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_answer_question', 'question_id'),
+    )
+
 class UserCourse(db.Model):
     __tablename__ = 'user_courses'
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
@@ -72,13 +141,76 @@ class UserCourse(db.Model):
     user = db.relationship('User', back_populates='user_courses')
     course = db.relationship('Course', back_populates='students')
 
+    # The (user_id, course_id) primary key already covers lookups by user
+    __table_args__ = (
+        db.Index('ix_user_courses_course', 'course_id'),
+    )
+
 class Document(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(200), nullable=False)
     filepath = db.Column(db.String(300), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    uploaded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # keyset column: never NULL
+    content_hash = db.Column(db.String(64))  # sha256 of the stored file; NULL for legacy flat uploads
+    size = db.Column(db.Integer)
+
+    # Filled in by the background worker (see jobs.py / document_processing.py)
+    status = db.Column(db.String(20), nullable=False, default='pending', server_default='pending')
+    page_count = db.Column(db.Integer)
+    text_content = deferred(db.Column(db.Text))  # can be large; only loaded when asked for
+    thumbnail_path = db.Column(db.String(300))
+    processed_at = db.Column(db.DateTime)
 
     course = db.relationship('Course', back_populates='documents')
     user = db.relationship('User')
+
+    # content_hash: reference counting for deduplicated files
+    __table_args__ = (
+        db.Index('ix_document_course_uploaded', 'course_id', 'uploaded_at'),
+        db.Index('ix_document_content_hash', 'content_hash'),
+    )
+
+
+# Background job queue (see jobs.py)
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued/running/done/failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # workers claim the oldest runnable job
+    __table_args__ = (
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+    )
+
+
+# Invalidation counters for the rendered-page cache (see page_cache.py)
+class CacheTag(db.Model):
+    __tablename__ = 'cache_tag'
+    tag = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+
+# Enrollments per course by (status, term), next to Course.member_count (see course_stats.py)
+class CourseEnrollmentCount(db.Model):
+    __tablename__ = 'course_enrollment_count'
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    term = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Fingerprint of the last imported data file, so imports can skip unchanged input (see cli.py)
+class ImportState(db.Model):
+    __tablename__ = 'import_state'
+    source = db.Column(db.String(100), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    imported_at = db.Column(db.DateTime, default=datetime.utcnow)
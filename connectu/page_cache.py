@@ -0,0 +1,235 @@
+# page_cache.py
+# Rendered-page cache for read-heavy GET routes, with ETag / If-None-Match.
+#
+# Each entry is tagged ("course:12", "user:7", "courses"). Writes call
+# invalidate(*tags) before committing: that drops matching local entries and
+# bumps the tags' versions in the cache_tag table in the same transaction,
+# so other worker processes (and the job workers) invalidate too. A hit
+# re-checks its tags' versions with one small indexed query, which is still
+# far cheaper than re-querying and re-rendering the page.
+#
+# A page's tags are only known once it has rendered (views call add_tags()
+# as they go), so a render can read rows from before a write and tag
+# versions from after it. Every invalidate() therefore also bumps one global
+# version, GLOBAL_TAG, and bumps everything again once the write has
+# committed; a miss reads the global version before the view runs and only
+# stores the page if it hasn't moved by the end of the render.
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, request, session, make_response
+from sqlalchemy import event
+from models import db, CacheTag
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_AGE = 600
+GLOBAL_TAG = "*"
+
+
+class PageCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (body, etag, mimetype, {tag: version}, stored_at)
+        self._by_tag = {}              # tag -> set of keys
+        self._lock = threading.Lock()
+
+    # ===== Local storage =====
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() - entry[4] > self.max_age:
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, body, etag, mimetype, tag_versions):
+        if len(body) > self.max_bytes // 8:
+            return  # one huge page shouldn't flush everything else
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (body, etag, mimetype, tag_versions, time.time())
+            self.bytes += len(body)
+            for tag in tag_versions:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def discard(self, key, stale=False):
+        with self._lock:
+            self._drop(key)
+            if stale:
+                self.stale += 1
+
+    def drop_tags(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._by_tag.get(tag, ())):
+                    self._drop(key)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= len(entry[0])
+        for tag in entry[3]:
+            keys = self._by_tag.get(tag)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_tag.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+page_cache = PageCache()
+
+
+# ===== Tag versions (shared across processes through the database) =====
+def tag_versions(tags):
+    if not tags:
+        return {}
+    rows = db.session.query(CacheTag.tag, CacheTag.version).filter(CacheTag.tag.in_(list(tags))).all()
+    versions = dict.fromkeys(tags, 0)
+    versions.update(rows)
+    return versions
+
+
+def _bump_stmt():
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(CacheTag.__table__)
+    return stmt.on_conflict_do_update(index_elements=['tag'], set_={'version': CacheTag.__table__.c.version + 1})
+
+
+def _bump_rows(tags):
+    return [{"tag": t, "version": 1} for t in sorted(set(tags) | {GLOBAL_TAG})]
+
+
+def invalidate(*tags):
+    """
+    Invalidate every cached page carrying any of `tags`. Call before the
+    write's commit so the version bump lands in the same transaction; the
+    tags are bumped once more after the commit (see _bump_after_commit).
+    """
+    tags = [t for t in tags if t]
+    if not tags:
+        return
+    page_cache.drop_tags(tags)
+    db.session.execute(_bump_stmt(), _bump_rows(tags))
+    db.session.info.setdefault("page_cache_tags", set()).update(tags)
+
+
+@event.listens_for(db.session, "after_commit")
+def _bump_after_commit(session):
+    # Renders that read the old rows may have stored them under the versions
+    # the commit just published; this bump makes those entries stale.
+    tags = session.info.pop("page_cache_tags", None)
+    if tags:
+        page_cache.drop_tags(tags)
+        with db.engine.begin() as conn:
+            conn.execute(_bump_stmt(), _bump_rows(tags))
+
+
+@event.listens_for(db.session, "after_rollback")
+def _forget_tags(session):
+    session.info.pop("page_cache_tags", None)
+
+
+def add_tags(*tags):
+    """Called from a cached view to tag the page it is rendering."""
+    g.setdefault("cache_tags", set()).update(t for t in tags if t)
+
+
+# ===== View decorator =====
+def cached_page(key_func):
+    """
+    Cache a view's GET responses under key_func(**view_args) plus the viewer.
+    The view declares what it shows with add_tags(). Requests that have
+    pending flash messages bypass the cache in both directions.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET" or session.get("_flashes"):
+                return view(*args, **kwargs)
+
+            viewer = (session.get("user") or {}).get("auth0_id", "")
+            key = (view.__name__, viewer) + tuple(key_func(**kwargs))
+
+            entry = page_cache.get(key)
+            if entry is not None:
+                body, etag, mimetype, versions, _ = entry
+                if tag_versions(versions) == versions:
+                    page_cache.hit()
+                    return _respond(body, etag, mimetype)
+                page_cache.discard(key, stale=True)
+
+            started_at = tag_versions([GLOBAL_TAG])[GLOBAL_TAG]  # before the view reads anything
+            response = make_response(view(*args, **kwargs))
+            tags = g.pop("cache_tags", None)
+            if response.status_code == 200 and not response.direct_passthrough and tags:
+                body = response.get_data()
+                etag = hashlib.sha1(body).hexdigest()[:20]
+                versions = tag_versions(set(tags) | {GLOBAL_TAG})
+                if versions.pop(GLOBAL_TAG) == started_at:  # else a write landed mid-render: don't store
+                    page_cache.put(key, body, etag, response.mimetype, versions)
+                response.set_etag(etag)
+                _private(response)
+                return response.make_conditional(request)
+            return response
+        return wrapper
+    return decorator
+
+
+def _private(response):
+    # Per-viewer pages: browsers may keep them but must revalidate via ETag
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Cookie")
+
+
+def _respond(body, etag, mimetype):
+    response = make_response(body)
+    response.mimetype = mimetype
+    response.set_etag(etag)
+    _private(response)
+    return response.make_conditional(request)
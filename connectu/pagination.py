@@ -0,0 +1,45 @@
+# pagination.py
+from datetime import datetime
+
+
+def make_cursor(ts, row_id):
+    return f"{ts.isoformat()}_{row_id}"
+
+
+def encode_cursor(row):
+    """Keyset cursor for a row with `timestamp` and `id` columns."""
+    return make_cursor(row.timestamp, row.id)
+
+
+def decode_cursor(cursor):
+    """Parse a `before` cursor; returns (timestamp, id) or None if it is missing/garbled."""
+    if not cursor:
+        return None
+    try:
+        ts, row_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(ts), int(row_id)
+    except ValueError:
+        return None
+
+
+def before_clause(ts_col, id_col, before):
+    """Filter for rows strictly older than the `before` cursor in (ts_col, id_col) order, or None."""
+    position = decode_cursor(before)
+    if not position:
+        return None
+    ts, row_id = position
+    return (ts_col < ts) | ((ts_col == ts) & (id_col < row_id))
+
+
+def page_before(query, model, before, limit):
+    """
+    Newest-first keyset page of `query` over (model.timestamp, model.id), starting
+    just before the `before` cursor. Returns (rows, next_cursor); next_cursor is
+    None on the last page.
+    """
+    clause = before_clause(model.timestamp, model.id, before)
+    if clause is not None:
+        query = query.filter(clause)
+    rows = query.order_by(model.timestamp.desc(), model.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
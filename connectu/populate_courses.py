@@ -1,44 +1,115 @@
 # populate_courses.py
+import time
 import xml.etree.ElementTree as ET
+from sqlalchemy import func
 from models import Course, db
-import os
+from course_search import CATALOGUE_TAG
+from page_cache import invalidate
 
-def populate_courses(app, xml_file):
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+BATCH_SIZE = 1000
+
+
+def iter_sitemap_courses(xml_file):
+    """
+    Stream course rows out of the sitemap without building the whole tree.
+    Each <url> element is cleared from the root once read, so memory stays flat.
     """
-    Populate the database with courses from an XML sitemap.
+    context = ET.iterparse(xml_file, events=('start', 'end'))
+    _, root = next(context)
+    for event, elem in context:
+        if event != 'end' or elem.tag != SITEMAP_NS + 'url':
+            continue
+        loc = elem.findtext(SITEMAP_NS + 'loc')
+        if loc:
+            yield {
+                'course_code': loc.strip().split('/')[-1],  # get last part of URL
+                'title': '',         # optional: fill in if you have titles
+                'description': ''    # optional: fill in if you have descriptions
+            }
+        root.clear()
+
+
+def _insert_stmt():
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"populate_courses: no upsert support for {dialect}")
+    stmt = insert(Course.__table__)
+    # Blank fields keep the stored value, also for a row another import wrote since _flush_batch read it
+    return stmt.on_conflict_do_update(
+        index_elements=['course_code'],
+        set_={column: func.coalesce(func.nullif(stmt.excluded[column], ''), Course.__table__.c[column])
+              for column in ('title', 'description')},
+    )
+
+
+def _is_changed(row, existing):
+    # The sitemap has no titles/descriptions yet; blanks never overwrite real data
+    title, description = existing
+    return bool((row['title'] and row['title'] != title) or
+                (row['description'] and row['description'] != description))
+
+
+def _flush_batch(batch, upsert, stats):
+    codes = [r['course_code'] for r in batch]
+    existing = dict(
+        (code, (title or '', description or ''))
+        for code, title, description in db.session.query(
+            Course.course_code, Course.title, Course.description
+        ).filter(Course.course_code.in_(codes))
+    )
+
+    pending = []
+    for row in batch:
+        if row['course_code'] not in existing:
+            stats['inserted'] += 1
+            pending.append(row)
+        elif _is_changed(row, existing[row['course_code']]):
+            stats['updated'] += 1
+            pending.append(row)
+        else:
+            stats['skipped'] += 1
+
+    if pending:
+        db.session.execute(upsert, pending)  # executemany
+        # Cached search and course pages, and every web process's search index (see current_course_index)
+        invalidate(CATALOGUE_TAG)
+        db.session.commit()
+
+
+def populate_courses(app, xml_file, batch_size=BATCH_SIZE):
+    """
+    Incrementally import courses from an XML sitemap.
     Requires the Flask app context to be passed in.
+
+    Existing Course rows are kept (so Question/Document/UserCourse ids stay
+    valid); only new or changed courses are upserted, in executemany batches.
+    Returns a dict of inserted/updated/skipped counts and throughput.
     """
-    tree = ET.parse(xml_file)
-    root = tree.getroot()
-    courses_data = []
-    ns = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-
-    # Extract course codes from XML
-    for url in root.findall('ns:url', ns):
-        loc = url.find('ns:loc', ns).text
-        course_code = loc.split('/')[-1]  # get last part of URL
-        courses_data.append({
-            'course_code': course_code,
-            'title': '',         # optional: fill in if you have titles
-            'description': ''    # optional: fill in if you have descriptions
-        })
+    stats = {'inserted': 0, 'updated': 0, 'skipped': 0}
+    start = time.perf_counter()
 
     # Use Flask app context for database operations
     with app.app_context():
-        # Delete old courses
-        print("Deleting existing courses...")
-        db.session.query(Course).delete()
-        db.session.commit()
+        upsert = _insert_stmt()
+        batch = []
+        # Sitemaps can list a course twice; keep the last occurrence per batch
+        for row in iter_sitemap_courses(xml_file):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _flush_batch(list({r['course_code']: r for r in batch}.values()), upsert, stats)
+                batch = []
+        if batch:
+            _flush_batch(list({r['course_code']: r for r in batch}.values()), upsert, stats)
 
-        # Add new courses
-        print(f"Adding {len(courses_data)} courses...")
-        for c in courses_data:
-            course = Course(
-                course_code=c['course_code'],
-                title=c.get('title', ''),
-                description=c.get('description', '')
-            )
-            db.session.add(course)
-
-        db.session.commit()
-        print("Courses repopulated successfully!")
+    elapsed = time.perf_counter() - start
+    total = stats['inserted'] + stats['updated'] + stats['skipped']
+    stats['seconds'] = elapsed
+    stats['rows_per_sec'] = total / elapsed if elapsed else 0.0
+    print(f"Courses imported: {stats['inserted']} inserted, {stats['updated']} updated, "
+          f"{stats['skipped']} skipped in {elapsed:.2f}s ({stats['rows_per_sec']:.0f} rows/s)")
+    return stats
@@ -0,0 +1,205 @@
+# post_search.py
+# Full-text search over questions, answers and extracted document text, on
+# one SQLite FTS5 table (created by migration 9):
+#
+#   post_search(body, course)    rowid = source id * 4 + kind
+#
+# kind 1 = question, 2 = answer, 3 = document (filename + text_content).
+# Triggers on question, answer and document keep it in sync on every insert,
+# update and delete, whoever the writer is (routes, the job worker, bulk
+# loads). `course` holds one token, "c<course_id>", so a course-scoped search
+# is an FTS intersection rather than a filter over every global match.
+# Results are ranked by bm25 on the body, with highlighted snippet()s.
+# bm25 has to score every match before it can sort, so a query matching more
+# than RANK_WINDOW posts (a near-stopword) is ranked among the newest
+# RANK_WINDOW of them only: rowids grow with time, and FTS5 walks a rowid
+# range cheaply. That keeps the worst case flat as the forum grows.
+#
+# The table keeps its own copy of the text rather than being an external-
+# content table: the three sources share one rowid space, and FTS5 could only
+# fetch snippet text by key from a single content table.
+#
+# SQLite only; on other databases the migration skips it and search_posts()
+# reports it unavailable.
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import text
+from models import db, Course, Answer, Document
+
+QUESTION, ANSWER, DOCUMENT = 1, 2, 3
+KINDS = {QUESTION: "question", ANSWER: "answer", DOCUMENT: "document"}
+
+MAX_TERMS = 8
+RANK_WINDOW = 10000
+MAX_PAGE = 50          # deeper OFFSETs aren't worth their cost; refine the query instead
+SNIPPET_TOKENS = 16
+_MARK_START, _MARK_END = "\x02", "\x03"
+
+_word_re = re.compile(r"\w+")
+
+CREATE_TABLE = ("CREATE VIRTUAL TABLE IF NOT EXISTS post_search "
+                "USING fts5(body, course, tokenize = 'porter unicode61')")
+
+_DOCUMENT_BODY = "new.filename || char(10) || coalesce(new.text_content, '')"
+_ANSWER_COURSE = "(SELECT 'c' || course_id FROM question WHERE id = new.question_id)"
+
+TRIGGERS = [
+    # Questions
+    "CREATE TRIGGER IF NOT EXISTS question_search_insert AFTER INSERT ON question BEGIN"
+    " INSERT INTO post_search (rowid, body, course) VALUES (new.id * 4 + 1, new.content, 'c' || new.course_id);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS question_search_update AFTER UPDATE OF content, course_id ON question BEGIN"
+    " UPDATE post_search SET body = new.content, course = 'c' || new.course_id WHERE rowid = old.id * 4 + 1;"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS question_search_delete AFTER DELETE ON question BEGIN"
+    " DELETE FROM post_search WHERE rowid = old.id * 4 + 1;"
+    " END",
+    # Answers
+    "CREATE TRIGGER IF NOT EXISTS answer_search_insert AFTER INSERT ON answer BEGIN"
+    f" INSERT INTO post_search (rowid, body, course) VALUES (new.id * 4 + 2, new.content, {_ANSWER_COURSE});"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS answer_search_update AFTER UPDATE OF content, question_id ON answer BEGIN"
+    f" UPDATE post_search SET body = new.content, course = {_ANSWER_COURSE} WHERE rowid = old.id * 4 + 2;"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS answer_search_delete AFTER DELETE ON answer BEGIN"
+    " DELETE FROM post_search WHERE rowid = old.id * 4 + 2;"
+    " END",
+    # Documents: text_content arrives later, from the process_document job
+    "CREATE TRIGGER IF NOT EXISTS document_search_insert AFTER INSERT ON document BEGIN"
+    f" INSERT INTO post_search (rowid, body, course) VALUES (new.id * 4 + 3, {_DOCUMENT_BODY}, 'c' || new.course_id);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS document_search_update AFTER UPDATE OF filename, text_content, course_id"
+    " ON document BEGIN"
+    f" UPDATE post_search SET body = {_DOCUMENT_BODY}, course = 'c' || new.course_id WHERE rowid = old.id * 4 + 3;"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS document_search_delete AFTER DELETE ON document BEGIN"
+    " DELETE FROM post_search WHERE rowid = old.id * 4 + 3;"
+    " END",
+]
+
+BACKFILL = [
+    "INSERT INTO post_search (rowid, body, course) SELECT id * 4 + 1, content, 'c' || course_id FROM question",
+    "INSERT INTO post_search (rowid, body, course) SELECT a.id * 4 + 2, a.content, 'c' || q.course_id "
+    "FROM answer a JOIN question q ON q.id = a.question_id",
+    "INSERT INTO post_search (rowid, body, course) "
+    "SELECT id * 4 + 3, filename || char(10) || coalesce(text_content, ''), 'c' || course_id FROM document",
+    "INSERT INTO post_search (post_search) VALUES ('optimize')",
+]
+
+
+# ===== Schema =====
+def is_supported(conn):
+    return conn.dialect.name == "sqlite"
+
+
+def install(conn):
+    """Create the index and its triggers and fill it from the existing rows. No-op off SQLite."""
+    if not is_supported(conn):
+        return
+    exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'post_search'")).first()
+    conn.execute(text(CREATE_TABLE))
+    for stmt in TRIGGERS:
+        conn.execute(text(stmt))
+    if not exists:
+        for stmt in BACKFILL:
+            conn.execute(text(stmt))
+
+
+def rebuild(conn):
+    """Drop and refill the index from the source tables. Returns the number of rows indexed."""
+    conn.execute(text("DROP TABLE IF EXISTS post_search"))
+    install(conn)
+    return conn.execute(text("SELECT count(*) FROM post_search")).scalar()
+
+
+# ===== Queries =====
+class SearchHit:
+    def __init__(self, kind, id, course_id, snippet, score):
+        self.kind = kind
+        self.id = id
+        self.course_id = course_id
+        self.snippet = snippet  # Markup: escaped text with <mark> around the matches
+        self.score = score
+        self.course_code = None
+        self.question_id = id if kind == "question" else None
+        self.filename = None
+
+
+class PostSearchPage:
+    def __init__(self, hits, page, has_next):
+        self.hits = hits
+        self.page = page
+        self.has_next = has_next
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+
+def match_expression(query, course_id=None):
+    """
+    FTS5 MATCH string for free text: every word must appear in the body
+    (each quoted, so user input can't inject FTS syntax). None if no words.
+    """
+    words = _word_re.findall(query.lower())[:MAX_TERMS]
+    if not words:
+        return None
+    expression = "body : (" + " ".join(f'"{w}"' for w in words) + ")"
+    if course_id is not None:
+        expression = f'course : "c{int(course_id)}" AND {expression}'
+    return expression
+
+
+def highlight(raw):
+    return Markup(str(escape(raw)).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>"))
+
+
+def search_posts(query, course_id=None, page=1, per_page=20):
+    """
+    One page of ranked hits for `query`, optionally within one course.
+    Returns None when full-text search isn't available on this database.
+    """
+    if not is_supported(db.session.connection()):
+        return None
+    page = max(1, min(page, MAX_PAGE))
+    expression = match_expression(query, course_id)
+    if expression is None:
+        return PostSearchPage([], page, False)
+
+    floor = db.session.execute(text(
+        "SELECT rowid FROM post_search WHERE post_search MATCH :expression "
+        "ORDER BY rowid DESC LIMIT 1 OFFSET :window"
+    ), {"expression": expression, "window": RANK_WINDOW}).scalar()
+    rows = db.session.execute(text(
+        "SELECT rowid, course, snippet(post_search, 0, char(2), char(3), '…', :tokens), "
+        "bm25(post_search, 1.0, 0.0) AS score "
+        "FROM post_search WHERE post_search MATCH :expression AND rowid > :floor "
+        "ORDER BY score LIMIT :limit OFFSET :offset"
+    ), {"expression": expression, "floor": floor or 0, "tokens": SNIPPET_TOKENS,
+        "limit": per_page + 1, "offset": (page - 1) * per_page}).all()
+
+    hits = [SearchHit(KINDS[rowid % 4], rowid // 4, int(course[1:]), highlight(snippet), score)
+            for rowid, course, snippet, score in rows[:per_page]]
+    _attach_details(hits)
+    return PostSearchPage(hits, page, len(rows) > per_page and page < MAX_PAGE)
+
+
+def _attach_details(hits):
+    """Course codes, answers' question ids and document filenames for linking: one query each."""
+    if not hits:
+        return
+    codes = dict(db.session.query(Course.id, Course.course_code)
+                 .filter(Course.id.in_({h.course_id for h in hits})))
+    answer_ids = [h.id for h in hits if h.kind == "answer"]
+    questions = dict(db.session.query(Answer.id, Answer.question_id)
+                     .filter(Answer.id.in_(answer_ids))) if answer_ids else {}
+    document_ids = [h.id for h in hits if h.kind == "document"]
+    filenames = dict(db.session.query(Document.id, Document.filename)
+                     .filter(Document.id.in_(document_ids))) if document_ids else {}
+    for hit in hits:
+        hit.course_code = codes.get(hit.course_id)
+        if hit.kind == "answer":
+            hit.question_id = questions.get(hit.id)
+        elif hit.kind == "document":
+            hit.filename = filenames.get(hit.id)
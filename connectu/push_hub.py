@@ -0,0 +1,133 @@
+# push_hub.py
+# In-process pub/sub for pushing new DirectMessages to connected browsers
+# over Server-Sent Events. The backend is pluggable: MemoryBackend fans out
+# inside one process; RedisBackend lets several gunicorn workers share it.
+import json
+import queue
+import threading
+
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, backend, channel):
+        self.backend = backend
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def get(self, timeout):
+        """Next payload, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+
+class MemoryBackend:
+    def __init__(self):
+        self._channels = {}  # channel -> set of Subscriptions
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        sub = Subscription(self, channel)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._channels.get(sub.channel)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._channels[sub.channel]
+
+    def publish(self, channel, payload):
+        with self._lock:
+            subs = list(self._channels.get(channel, ()))
+        for sub in subs:
+            try:
+                sub.queue.put_nowait(payload)
+            except queue.Full:
+                pass  # slow client; it will catch up from the page history on reload
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(subs) for subs in self._channels.values())
+
+
+class RedisBackend(MemoryBackend):
+    """
+    Cross-process fan-out through Redis pub/sub: publishes go to Redis, and one
+    listener thread per process feeds the local subscriber queues.
+    Needs the `redis` package.
+    """
+
+    def __init__(self, url):
+        super().__init__()
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.psubscribe("connectu:*")
+        threading.Thread(target=self._listen, daemon=True).start()
+
+    def publish(self, channel, payload):
+        self._redis.publish(f"connectu:{channel}", payload)
+
+    def _listen(self):
+        prefix = len("connectu:")
+        for message in self._pubsub.listen():
+            channel = message["channel"].decode()[prefix:]
+            super().publish(channel, message["data"].decode())
+
+
+class PushHub:
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+
+    @staticmethod
+    def user_channel(user_id):
+        return f"user:{user_id}"
+
+    def subscribe(self, user_id):
+        return self.backend.subscribe(self.user_channel(user_id))
+
+    def publish_message(self, msg):
+        """Send a committed DirectMessage to both participants (other tabs of the sender too)."""
+        payload = json.dumps({
+            "id": msg.id,
+            "conversation_id": msg.conversation_id,
+            "sender_id": msg.sender_id,
+            "recipient_id": msg.recipient_id,
+            "content": msg.content,
+            "timestamp": msg.timestamp.isoformat() + "Z",
+        })
+        for user_id in {msg.sender_id, msg.recipient_id}:
+            self.backend.publish(self.user_channel(user_id), payload)
+
+    def stream(self, user_id, heartbeat=HEARTBEAT_SECONDS):
+        """Generator of SSE frames for one connected user; unsubscribes when the client goes away."""
+        sub = self.subscribe(user_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                payload = sub.get(timeout=heartbeat)
+                if payload is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"event: message\ndata: {payload}\n\n"
+        finally:
+            sub.close()
+
+
+hub = PushHub()
+
+
+def configure_hub(url=None):
+    """Pick the backend from a PUSH_BACKEND_URL-style setting: unset -> in-process, redis://... -> Redis."""
+    hub.backend = RedisBackend(url) if url else MemoryBackend()
+    return hub
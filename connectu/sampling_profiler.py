@@ -0,0 +1,103 @@
+# sampling_profiler.py
+# Opt-in statistical profiler: a background thread samples the stacks of
+# threads that are handling requests every PROFILER_INTERVAL_MS and counts
+# them per endpoint. Every PROFILER_DUMP_SECONDS (and at exit) the counts are
+# written as folded stacks, one file per endpoint:
+#   <PROFILER_DIR>/<endpoint>.<pid>.folded    "frame;frame;frame <samples>"
+# which flamegraph.pl, speedscope or inferno render directly.
+# Enable with PROFILER=1; the cost when off is nothing.
+import atexit
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import request
+
+MAX_DEPTH = 128
+
+
+class SamplingProfiler:
+    def __init__(self, out_dir, interval=0.005, dump_every=30.0):
+        self.out_dir = out_dir
+        self.interval = interval
+        self.dump_every = dump_every
+        self.samples = defaultdict(Counter)  # endpoint -> folded stack -> count
+        self._active = {}                    # thread id -> endpoint
+        self._lock = threading.Lock()
+        self._started_pid = None
+
+    # ===== Request hooks =====
+    def enter(self):
+        self._ensure_started()
+        self._active[threading.get_ident()] = request.endpoint or "unmatched"
+
+    def leave(self, exc=None):
+        self._active.pop(threading.get_ident(), None)
+
+    # ===== Sampling =====
+    def _ensure_started(self):
+        # Started lazily so each forked worker gets its own sampler thread
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self.samples.clear()
+            os.makedirs(self.out_dir, exist_ok=True)
+            threading.Thread(target=self._run, daemon=True, name="sampling-profiler").start()
+            atexit.register(self.dump)
+
+    def _run(self):
+        last_dump = time.monotonic()
+        while True:
+            time.sleep(self.interval)
+            self.sample()
+            if time.monotonic() - last_dump >= self.dump_every:
+                self.dump()
+                last_dump = time.monotonic()
+
+    def sample(self):
+        frames = sys._current_frames()
+        with self._lock:
+            for thread_id, endpoint in list(self._active.items()):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.samples[endpoint][fold(frame)] += 1
+
+    def dump(self):
+        with self._lock:
+            snapshot = {endpoint: dict(stacks) for endpoint, stacks in self.samples.items()}
+        for endpoint, stacks in snapshot.items():
+            path = os.path.join(self.out_dir, f"{endpoint}.{os.getpid()}.folded")
+            with open(path + ".tmp", "w") as f:
+                for stack, count in sorted(stacks.items()):
+                    f.write(f"{stack} {count}\n")
+            os.replace(path + ".tmp", path)
+
+
+def fold(frame):
+    """Root-first 'func (file:line);...' string for one stack."""
+    parts = []
+    while frame is not None and len(parts) < MAX_DEPTH:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+def init_profiler(app):
+    """PROFILER=1 turns it on; PROFILER_DIR, PROFILER_INTERVAL_MS, PROFILER_DUMP_SECONDS tune it."""
+    if not app.config.get("PROFILER"):
+        return None
+    profiler = SamplingProfiler(
+        app.config.get("PROFILER_DIR") or os.path.join(app.instance_path, "profiles"),
+        interval=app.config.get("PROFILER_INTERVAL_MS", 5) / 1000,
+        dump_every=app.config.get("PROFILER_DUMP_SECONDS", 30),
+    )
+    app.before_request(profiler.enter)
+    app.teardown_request(profiler.leave)
+    app.extensions["sampling_profiler"] = profiler
+    return profiler
@@ -0,0 +1,265 @@
+# session_store.py
+# Server-side sessions: the cookie carries only a signed session id, and the
+# session dict (in practice just `user`, the login nonce and flashes) is kept
+# as compact JSON in a pluggable backend with TTL expiry:
+#   SQLiteSessionBackend  one WAL-mode table, expired rows swept in the background
+#   RedisSessionBackend   SETEX keys, Redis expires them itself
+# LRUSessionCache sits in front of either so repeat requests skip the store.
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+DEFAULT_TTL = int(timedelta(days=7).total_seconds())
+SWEEP_INTERVAL = 300
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class SQLiteSessionBackend:
+    def __init__(self, path, sweep_interval=SWEEP_INTERVAL):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+
+    def _conn(self):
+        # One connection per thread; WAL lets readers and the writer run concurrently
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            self._start()
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _start(self):
+        # Deferred to first use in each process: creating the app stays cheap, and
+        # the sweeper runs in the forked worker rather than a pre-fork parent
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            with sqlite3.connect(self.path, timeout=5) as conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS sessions "
+                             "(sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL) WITHOUT ROWID")
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires)")
+            conn.close()
+            if self.sweep_interval:
+                threading.Thread(target=self._sweep_forever, args=(self.sweep_interval,), daemon=True).start()
+
+    def get(self, sid):
+        row = self._conn().execute("SELECT data, expires FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0], row[1]
+
+    def set(self, sid, data, ttl):
+        expires = time.time() + ttl
+        self._conn().execute("INSERT OR REPLACE INTO sessions (sid, data, expires) VALUES (?, ?, ?)",
+                             (sid, data, expires))
+        return expires
+
+    def delete(self, sid):
+        self._conn().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def sweep(self):
+        return self._conn().execute("DELETE FROM sessions WHERE expires < ?", (time.time(),)).rowcount
+
+    def _sweep_forever(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.sweep()
+            except sqlite3.Error:
+                pass  # locked or gone; try again next round
+
+
+class RedisSessionBackend:
+    """Needs the `redis` package; Redis handles expiry, so there is nothing to sweep."""
+
+    def __init__(self, url, prefix="session:"):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, sid):
+        pipe = self._redis.pipeline()
+        pipe.get(self.prefix + sid)
+        pipe.ttl(self.prefix + sid)
+        data, ttl = pipe.execute()
+        if data is None:
+            return None
+        return data.decode(), time.time() + max(ttl, 0)
+
+    def set(self, sid, data, ttl):
+        self._redis.setex(self.prefix + sid, ttl, data)
+        return time.time() + ttl
+
+    def delete(self, sid):
+        self._redis.delete(self.prefix + sid)
+
+    def sweep(self):
+        return 0
+
+
+class LRUSessionCache:
+    """
+    Bounded in-memory tier in front of a backend; writes go through to the backend.
+
+    Every save gets a new version, which is also put in the cookie, and entries
+    are only served when the request's cookie carries the same version. So a
+    session changed by another worker process (login, logout, flash) is never
+    read stale from this process's cache. `max_age` additionally bounds how
+    long an entry is trusted without going back to the backend.
+    """
+
+    def __init__(self, backend, maxsize=10_000, max_age=60):
+        self.backend = backend
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # sid -> (version, data, expires, cached_at)
+        self._lock = threading.Lock()
+
+    def get(self, sid, version):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is not None and entry[0] == version and entry[2] >= now and now - entry[3] < self.max_age:
+                self._data.move_to_end(sid)
+                self.hits += 1
+                return entry[1], entry[2]
+            self._data.pop(sid, None)
+            self.misses += 1
+        found = self.backend.get(sid)
+        if found is not None:
+            self._remember(sid, version, *found)
+        return found
+
+    def set(self, sid, data, ttl):
+        """Write through; returns (version, expires) for the new contents."""
+        version = secrets.token_hex(4)
+        expires = self.backend.set(sid, data, ttl)
+        self._remember(sid, version, data, expires)
+        return version, expires
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+        self.backend.delete(sid)
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            for sid in [sid for sid, entry in self._data.items() if entry[2] < now]:
+                del self._data[sid]
+        return self.backend.sweep()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data),
+                "hit_ratio": self.hits / lookups if lookups else 0.0}
+
+    def _remember(self, sid, version, data, expires):
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._data[sid] = (version, data, expires, time.time())
+            self._data.move_to_end(sid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, ttl=DEFAULT_TTL):
+        self.store = store
+        self.ttl = ttl
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt="connectu-session")
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid, _, version = self._signer(app).unsign(cookie).decode().partition(".")
+            except BadSignature:
+                sid = None
+            if sid:
+                entry = self.store.get(sid, version)
+                if entry is not None:
+                    session = ServerSideSession(self.serializer.loads(entry[0]), sid=sid)
+                    session.expires = entry[1]
+                    return session
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        # Write only when something changed, or to slide the expiry once half the TTL is gone
+        expires = getattr(session, "expires", None)
+        refresh = expires is not None and expires - time.time() < self.ttl / 2
+        if not (session.modified or refresh):
+            return
+
+        version, _ = self.store.set(session.sid, self.serializer.dumps(dict(session)), self.ttl)
+        response.vary.add("Cookie")
+        response.set_cookie(
+            name,
+            self._signer(app).sign(f"{session.sid}.{version}".encode()).decode(),
+            max_age=self.ttl if session.permanent else None,
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def init_sessions(app):
+    """
+    SESSION_BACKEND: unset/'sqlite' -> SQLite file at SESSION_SQLITE_PATH,
+    'redis://...' -> Redis. SESSION_TTL in seconds, SESSION_LRU_SIZE for the
+    in-memory tier (0 disables it).
+    """
+    backend_url = app.config.get("SESSION_BACKEND") or "sqlite"
+    if backend_url.startswith("redis://") or backend_url.startswith("rediss://"):
+        backend = RedisSessionBackend(backend_url)
+    else:
+        path = app.config["SESSION_SQLITE_PATH"]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        backend = SQLiteSessionBackend(path)
+
+    store = LRUSessionCache(backend, app.config.get("SESSION_LRU_SIZE", 10_000))
+    app.session_interface = ServerSideSessionInterface(store, app.config.get("SESSION_TTL", DEFAULT_TTL))
+    return store
@@ -0,0 +1,223 @@
+# static_assets.py
+# Fingerprinted, precompressed static files. `flask assets build` copies
+# everything under static/ (but not uploads) into ASSET_DIR as
+# name.<hash>.ext, writes .gz and, with brotli installed, .br siblings for
+# text assets, and (with Pillow) cuts each avatar into square WebP and PNG
+# variants at AVATAR_SIZES. manifest.json there maps source names to outputs.
+#
+# init_assets(app) reads the manifest once at startup and:
+#   - rewrites url_for('static', filename='styles.css') to
+#     /static/dist/styles.<hash>.css (a url_defaults hook; templates are
+#     unchanged). Pass fingerprint=False for a URL that is stored, e.g.
+#     User.avatar_url, so it survives the next build;
+#   - serves /static/dist/ files as immutable for a year, choosing the .br or
+#     .gz sibling the client accepts. A changed file gets a new name, so
+#     nothing ever needs revalidating or purging, and old names keep working
+#     until the directory is cleaned;
+#   - gives templates avatar_sources(url, size) for <picture> srcsets.
+# Without a build (no manifest) every URL is the original file's, so a fresh
+# checkout works as before. Restart the app after a build.
+import fnmatch
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DIST = "dist"  # URL prefix under static/
+SKIP = {"uploads", "uploadsdontuse", DIST}  # top-level entries that aren't site assets
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt"}
+AVATAR_PATTERN = "avatar*.png"
+AVATAR_SIZES = (80, 100)  # CSS px: edit-profile choices, profile header; 2x variants are built too
+ONE_YEAR = 365 * 24 * 3600
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+# ===== Build =====
+def _fingerprinted(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def _write(out_dir, name, data):
+    path = os.path.join(out_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not os.path.exists(path):  # same name, same bytes
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+def _compressed(data):
+    """{encoding: bytes} for the encodings that actually shrink `data`."""
+    out = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli:
+        out["br"] = brotli.compress(data, quality=11)
+    return {encoding: body for encoding, body in out.items() if len(body) < len(data)}
+
+
+def _optimized_png(data, Image):
+    """The same image re-encoded losslessly with zlib's best effort, if that's smaller."""
+    buf = io.BytesIO()
+    with Image.open(io.BytesIO(data)) as img:
+        img.save(buf, "PNG", optimize=True)
+    return buf.getvalue() if buf.tell() < len(data) else data
+
+
+def _avatar_variants(data, Image):
+    """
+    {pixels: {"png": bytes, "webp": bytes}}: centre-cropped squares, as the
+    CSS shows them. WebP only where it beats the PNG.
+    """
+    variants = {}
+    with Image.open(io.BytesIO(data)) as img:
+        palette = img.mode == "P"  # keep palette PNGs palette PNGs, or the small sizes come out bigger
+        img = img.convert("RGBA")
+        side = min(img.size)
+        left, top = (img.width - side) // 2, (img.height - side) // 2
+        square = img.crop((left, top, left + side, top + side))
+        for pixels in sorted({s * density for s in AVATAR_SIZES for density in (1, 2)}):
+            resized = square.resize((pixels, pixels), Image.LANCZOS) if pixels < side else square
+            webp, png = io.BytesIO(), io.BytesIO()
+            resized.save(webp, "WEBP", quality=82, method=6)
+            (resized.quantize(256, method=Image.Quantize.FASTOCTREE) if palette else resized).save(
+                png, "PNG", optimize=True)
+            variants[pixels] = {"png": png.getvalue()}
+            if webp.tell() < png.tell():  # flat-colour art is often smaller as a palette PNG
+                variants[pixels]["webp"] = webp.getvalue()
+    return variants
+
+
+def build(static_dir, out_dir):
+    """
+    Fingerprint, compress and resize everything under static_dir into
+    out_dir and write its manifest. Returns the manifest. Image steps are
+    skipped without Pillow, .br files without brotli.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+
+    manifest = {"files": {}, "variants": {}, "pillow": Image is not None, "brotli": brotli is not None}
+    for root, dirs, files in os.walk(static_dir):
+        top = root == static_dir
+        dirs[:] = sorted(d for d in dirs if not (top and d in SKIP))
+        for filename in sorted(f for f in files if not (top and f in SKIP) and not f.startswith(".")):
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, static_dir).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                data = f.read()
+            ext = os.path.splitext(name)[1].lower()
+            if ext == ".png" and Image:
+                data = _optimized_png(data, Image)
+
+            hashed = _fingerprinted(name, data)
+            _write(out_dir, hashed, data)
+            entry = {"path": hashed, "bytes": len(data), "encodings": {}}
+            if ext in COMPRESSIBLE:
+                for encoding, body in _compressed(data).items():
+                    _write(out_dir, hashed + dict(ENCODINGS)[encoding], body)
+                    entry["encodings"][encoding] = len(body)
+            manifest["files"][name] = entry
+
+            if Image and fnmatch.fnmatch(name, AVATAR_PATTERN):
+                variants = manifest["variants"][name] = {}
+                for pixels, formats in _avatar_variants(data, Image).items():
+                    stem = os.path.splitext(name)[0]
+                    variants[str(pixels)] = {}
+                    for fmt, body in formats.items():
+                        variant = _fingerprinted(f"{stem}.{pixels}.{fmt}", body)
+                        _write(out_dir, variant, body)
+                        variants[str(pixels)][fmt] = variant
+
+    tmp = os.path.join(out_dir, "manifest.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(out_dir, "manifest.json"))
+    return manifest
+
+
+# ===== Serving =====
+class AssetManifest:
+    def __init__(self, asset_dir):
+        self.asset_dir = asset_dir
+        try:
+            with open(os.path.join(asset_dir, "manifest.json")) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        self.paths = {name: entry["path"] for name, entry in manifest.get("files", {}).items()}
+        self.variants = manifest.get("variants", {})
+        # Siblings on disk, not just this build's: pages rendered before a
+        # deploy still link the previous names
+        self.on_disk = set(os.listdir(asset_dir)) if self.paths else set()
+
+    def encodings(self, name):
+        return [encoding for encoding, suffix in ENCODINGS if name + suffix in self.on_disk]
+
+
+def avatar_sources(url, size):
+    """
+    {"src", "png", "webp"} for an avatar shown at `size` CSS px: `src` is
+    the 1x image and the others are 1x/2x srcsets (absent if the avatar has
+    no such variants). `url` is a stored /static/... URL; anything else is
+    passed through as `src`.
+    """
+    assets = current_app.extensions["static_assets"]
+    prefix = f"{request.script_root}{current_app.static_url_path}/"
+    name = url[len(prefix):] if url and url.startswith(prefix) else None
+    variants = assets.variants.get(name)
+    if not variants:
+        return {"src": url_for("static", filename=name) if name in assets.paths else url}
+
+    def chosen(pixels):
+        # Smallest variant at least `pixels` wide, else the largest there is
+        fits = [int(p) for p in variants if int(p) >= pixels]
+        return str(min(fits)) if fits else max(variants, key=int)
+
+    def pick(pixels, fmt):
+        return url_for("static", filename=f"{DIST}/{variants[chosen(pixels)][fmt]}", fingerprint=False)
+
+    sources = {"src": pick(size, "png"), "png": f"{pick(size, 'png')} 1x, {pick(size * 2, 'png')} 2x"}
+    if all("webp" in variants[chosen(p)] for p in (size, size * 2)):
+        sources["webp"] = f"{pick(size, 'webp')} 1x, {pick(size * 2, 'webp')} 2x"
+    return sources
+
+
+def init_assets(app):
+    asset_dir = app.config["ASSET_DIR"]
+    assets = app.extensions["static_assets"] = AssetManifest(asset_dir)
+    send_original = app.view_functions["static"]
+
+    @app.url_defaults
+    def fingerprint(endpoint, values):
+        if endpoint == "static" and values.pop("fingerprint", True):
+            hashed = assets.paths.get(values.get("filename"))
+            if hashed:
+                values["filename"] = f"{DIST}/{hashed}"
+
+    def static(filename):
+        if not filename.startswith(DIST + "/"):
+            return send_original(filename=filename)
+        name = filename[len(DIST) + 1:]
+        encoding = request.accept_encodings.best_match(assets.encodings(name))
+        mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        response = send_from_directory(asset_dir, name + dict(ENCODINGS).get(encoding, ""),
+                                       mimetype=mimetype, max_age=ONE_YEAR, conditional=True)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    app.view_functions["static"] = static
+    app.jinja_env.globals["avatar_sources"] = avatar_sources
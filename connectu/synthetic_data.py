@@ -0,0 +1,208 @@
+# synthetic_data.py
+# Deterministic synthetic dataset for benchmarks: users, courses from the
+# sitemap, Zipf-distributed enrollments and Q&A (a few courses are very busy,
+# most are quiet), and direct-message threads with their inbox summaries.
+# Rows are generated with explicit ids and bulk-inserted with executemany, so
+# it expects empty tables (a fresh database); on Postgres the id sequences are
+# moved past them afterwards. The course activity counters are filled in
+# afterwards by course_stats.reconcile().
+#
+#   python synthetic_data.py [sqlite path]   (default: instance/synthetic.db)
+import itertools
+import os
+import random
+import time
+from bisect import bisect
+from datetime import datetime, timedelta
+
+from models import db, User, Course, UserCourse, Question, Answer, Conversation, DirectMessage
+from populate_courses import iter_sitemap_courses
+from availability import SLOT_BITS
+from course_stats import reconcile
+
+BATCH_SIZE = 5000
+START = datetime(2025, 1, 6, 8, 0)
+WORDS = ("exam midterm lecture homework proof induction graph tree heap dynamic programming recursion "
+         "pointer memory cache thread lock deadlock matrix vector eigenvalue integral limit series "
+         "office hours study group notes slides project deadline grading curve").split()
+STATUSES = ("Student", "Student", "Student", "Tutor")
+TERMS = ("Fall 2025", "Spring 2025", "Fall 2024", "Spring 2024")
+
+SYLLABLES = "ba be bi bo bu da de di do du ka ke ki ko ku la le li lo lu ma me mi mo mu na ne ni no nu".split()
+
+DEFAULT_SIZES = {
+    "users": 2000,
+    "courses": 2000,
+    "enrollments_per_user": 4,
+    "questions": 20000,
+    "answers_per_question": 2,
+    "threads": 3000,
+    "messages_per_thread": 20,
+}
+
+
+class Zipf:
+    """Sample ranks 0..n-1 with P(k) proportional to 1 / (k + 1) ** s."""
+
+    def __init__(self, n, s=1.1):
+        weights = [1 / (k + 1) ** s for k in range(n)]
+        self.cumulative = list(itertools.accumulate(weights))
+        self.total = self.cumulative[-1]
+
+    def sample(self, rng):
+        return min(bisect(self.cumulative, rng.random() * self.total), len(self.cumulative) - 1)
+
+
+def sentence(rng, n_words):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + "?"
+
+
+def pseudo_word(rank):
+    """A distinct pronounceable word per rank: 0 -> "bebe", 1 -> "bibe"..."""
+    syllables = []
+    rank += len(SYLLABLES) + 1  # at least two syllables
+    while rank:
+        rank, digit = divmod(rank, len(SYLLABLES))
+        syllables.append(SYLLABLES[digit])
+    return "".join(syllables)
+
+
+class Vocabulary:
+    """Post text with a long Zipf tail of rarer words mixed into WORDS, as real Q&A has."""
+
+    def __init__(self, size, share=0.3):
+        self.words = [pseudo_word(k) for k in range(size)]
+        self.zipf = Zipf(size)
+        self.share = share
+
+    def sentence(self, rng, n_words):
+        return " ".join(self.words[self.zipf.sample(rng)] if rng.random() < self.share else rng.choice(WORDS)
+                        for _ in range(n_words)).capitalize() + "?"
+
+
+def _insert(model, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(model.__table__.insert(), rows[start:start + BATCH_SIZE])
+
+
+def _advance_sequences(*models):
+    # Explicit ids don't touch a serial column's sequence, so the app's next
+    # INSERT would get id 1 again. SQLite takes max(rowid) + 1 by itself.
+    if db.engine.dialect.name != "postgresql":
+        return
+    for model in models:
+        table = model.__tablename__
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+            f"(SELECT coalesce(max(id), 0) + 1 FROM \"{table}\"), false)"))
+
+
+def generate(sitemap, seed=42, vocabulary=0, **sizes):
+    """
+    Fill the (empty) database in the current app context. Returns a summary
+    dict with the row counts, the seconds taken and the course codes ordered
+    most-popular first (handy for picking benchmark targets).
+    vocabulary > 0 mixes that many Zipf-distributed extra words into
+    questions and answers (for full-text search benchmarks).
+    """
+    sizes = dict(DEFAULT_SIZES, **sizes)
+    rng = random.Random(seed)
+    post = Vocabulary(vocabulary).sentence if vocabulary else sentence
+    started = time.perf_counter()
+    counts = {}
+
+    # ===== Users =====
+    users = [{
+        "id": i, "auth0_id": f"synthetic|{i}", "username": f"student{i}", "email": f"student{i}@example.edu",
+        "bio": sentence(rng, 8), "availability_mask": rng.getrandbits(SLOT_BITS) & rng.getrandbits(SLOT_BITS),
+    } for i in range(1, sizes["users"] + 1)]
+    _insert(User, users)
+    counts["users"] = len(users)
+
+    # ===== Courses (from the sitemap, popularity in random order) =====
+    codes = [row["course_code"] for row in itertools.islice(iter_sitemap_courses(sitemap), sizes["courses"])]
+    courses = [{"id": i, "course_code": code, "title": code.replace("_", " "), "description": sentence(rng, 12)}
+               for i, code in enumerate(codes, start=1)]
+    _insert(Course, courses)
+    counts["courses"] = len(courses)
+    by_popularity = [c["id"] for c in courses]
+    rng.shuffle(by_popularity)  # rank k -> course id
+    course_zipf = Zipf(len(by_popularity))
+
+    # ===== Enrollments: each user joins a few courses, popular ones far more often =====
+    enrollments = []
+    for user in users:
+        joined = set()
+        for _ in range(max(1, int(rng.expovariate(1 / sizes["enrollments_per_user"])))):
+            joined.add(by_popularity[course_zipf.sample(rng)])
+        enrollments += [{"user_id": user["id"], "course_id": cid, "status": rng.choice(STATUSES),
+                         "term": rng.choice(TERMS)} for cid in joined]
+    _insert(UserCourse, enrollments)
+    counts["enrollments"] = len(enrollments)
+
+    # ===== Questions and answers, Zipf over courses =====
+    questions, answers = [], []
+    answer_id = itertools.count(1)
+    for qid in range(1, sizes["questions"] + 1):
+        asked = START + timedelta(minutes=qid * 7 + rng.randrange(7))
+        questions.append({"id": qid, "course_id": by_popularity[course_zipf.sample(rng)],
+                          "user_id": rng.randrange(1, len(users) + 1), "content": post(rng, 14),
+                          "timestamp": asked})
+        for n in range(int(rng.expovariate(1 / sizes["answers_per_question"]))):
+            answers.append({"id": next(answer_id), "question_id": qid, "user_id": rng.randrange(1, len(users) + 1),
+                            "content": post(rng, 20), "timestamp": asked + timedelta(minutes=30 * (n + 1))})
+    _insert(Question, questions)
+    _insert(Answer, answers)
+    counts["questions"], counts["answers"] = len(questions), len(answers)
+
+    # ===== Message threads with consistent inbox summaries =====
+    user_zipf = Zipf(len(users), s=0.8)
+    conversations, messages, pairs = [], [], set()
+    message_id = itertools.count(1)
+    while len(conversations) < sizes["threads"]:
+        a, b = user_zipf.sample(rng) + 1, rng.randrange(1, len(users) + 1)
+        low, high = Conversation.key(a, b)
+        if a == b or (low, high) in pairs:
+            continue
+        pairs.add((low, high))
+        cid = len(conversations) + 1
+        at = START + timedelta(minutes=rng.randrange(60 * 24 * 300))
+        unread = {low: 0, high: 0}
+        for _ in range(max(1, int(rng.expovariate(1 / sizes["messages_per_thread"])))):
+            sender = rng.choice((low, high))
+            recipient = high if sender == low else low
+            at += timedelta(minutes=rng.randrange(1, 240))
+            last = {"id": next(message_id), "conversation_id": cid, "sender_id": sender,
+                    "recipient_id": recipient, "content": sentence(rng, 10), "timestamp": at}
+            messages.append(last)
+            unread[recipient] += 1
+            unread[sender] = 0  # replying means you've read the thread
+        conversations.append({"id": cid, "low_user_id": low, "high_user_id": high, "created_at": START,
+                              "last_message_id": last["id"], "last_message_at": last["timestamp"],
+                              "last_snippet": last["content"][:140],
+                              "low_unread": unread[low], "high_unread": unread[high]})
+    _insert(Conversation, conversations)
+    _insert(DirectMessage, messages)
+    counts["conversations"], counts["messages"] = len(conversations), len(messages)
+
+    _advance_sequences(User, Course, Question, Answer, Conversation, DirectMessage)
+    reconcile(db.session.connection())
+    db.session.commit()
+    elapsed = time.perf_counter() - started
+    rows = sum(counts.values())
+    return {"counts": counts, "seconds": elapsed, "rows_per_sec": rows / elapsed,
+            "popular_courses": [codes[cid - 1] for cid in by_popularity]}
+
+
+if __name__ == "__main__":
+    import sys
+    from app import create_app
+    from migrations import upgrade
+
+    path = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else os.path.join("instance", "synthetic.db"))
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + path})
+    with app.app_context():
+        db.create_all()
+        upgrade(db.engine)
+        summary = generate(app.config["COURSES_SITEMAP"])
+    print(f"{summary['counts']} in {summary['seconds']:.1f}s ({summary['rows_per_sec']:.0f} rows/s) -> {path}")
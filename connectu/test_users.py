@@ -1,17 +1,24 @@
-from test_messaging_app import app, db
-from app import User  # or wherever User is defined
+from app import create_app
+from models import db, User
 
-with app.app_context():
-    # Create tables (if not already done)
-    db.create_all()
+# Run directly (python test_users.py); guarded so pytest collection doesn't write to the database
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        # Create tables (if not already done)
+        db.create_all()
 
-    # Create test users
-    user1 = User(auth0_id='test_auth0_user1', username="Student1", email="student1@example.com", role="student")
-    user2 = User(auth0_id='test_auth0_user2', username="Tutor1", email="tutor1@example.com", role="tutor")
-    db.session.add(user1)
-    db.session.add(user2)
-    db.session.commit()
+        # Create test users (once; re-running just prints them)
+        user1 = User.query.filter_by(auth0_id='test_auth0_user1').first()
+        user2 = User.query.filter_by(auth0_id='test_auth0_user2').first()
+        if not user1:
+            user1 = User(auth0_id='test_auth0_user1', username="Student1", email="student1@example.com")
+            db.session.add(user1)
+        if not user2:
+            user2 = User(auth0_id='test_auth0_user2', username="Tutor1", email="tutor1@example.com")
+            db.session.add(user2)
+        db.session.commit()
 
-    # Check their IDs and usernames
-    print(user1.id, user2.id)
-    print(user1.username, user2.username)
+        # Check their IDs and usernames
+        print(user1.id, user2.id)
+        print(user1.username, user2.username)